@@ -1,10 +1,16 @@
 import logging
 
 from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from prometheus_client import start_http_server
+
+from bot.metrics import ERRORS, LAST_POLL, POLLS, UPDATE_DB_QUERIES, UPDATE_LATENCY, UPDATES
 from bot.models import TgUser
 from bot.tg.client import TgClient
-from bot.tg.dc import Message
-from goals.models import Goal, GoalCategory
+from bot.tg.dc import Message, UpdateOdj
+from core.metrics import metrics_registry
+from core.profiling import profiled
+from goals.models import Goal, GoalCategory, BoardParticipant
 from todolist import settings
 
 
@@ -25,20 +31,43 @@ class Command(BaseCommand):
             return self.__tg_user
         raise RuntimeError('Пользователь не существует')
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=settings.BOT_METRICS_PORT,
+            help='Порт HTTP-сервера метрик Prometheus, 0 - не запускать',
+        )
+
     def handle(self, *args, **options):
+        if options['metrics_port']:
+            start_http_server(options['metrics_port'], registry=metrics_registry())
         offset = 0
         while True:
-            res = self.tg_client.get_updates(offset=offset)
+            with ERRORS.labels('poll').count_exceptions():
+                res = self.tg_client.get_updates(offset=offset)
+            POLLS.inc()
+            LAST_POLL.set_to_current_time()
             for item in res.result:
                 offset = item.update_id + 1
-                self.__tg_user, _ = TgUser.objects.get_or_create(
-                    chat_id=item.message.chat.id,
-                    defaults={'username': item.message.from_.username}
-                )
-                if self.tg_user.user:
-                    self._handle_verified_user(item.message)
-                else:
-                    self._handle_unverified_user(item.message)
+                with ERRORS.labels('update').count_exceptions(), UPDATE_LATENCY.time(), profiled() as profile:
+                    self._handle_update(item)
+                UPDATE_DB_QUERIES.inc(profile.queries)
+            # как в конце запроса Django: на время ожидания обновлений соединение возвращается в пул,
+            # следующая пачка получит проверенное соединение
+            close_old_connections()
+
+    def _handle_update(self, item: UpdateOdj):
+        self.__tg_user, _ = TgUser.objects.get_or_create(
+            chat_id=item.message.chat.id,
+            defaults={'username': item.message.from_.username}
+        )
+        if self.tg_user.user:
+            UPDATES.labels('verified').inc()
+            self._handle_verified_user(item.message)
+        else:
+            UPDATES.labels('unverified').inc()
+            self._handle_unverified_user(item.message)
 
     def _handle_unverified_user(self, message: Message):
         verification_code: str = self.tg_user.set_verification_code()
@@ -79,7 +108,9 @@ class Command(BaseCommand):
 
     def _handle_goals_command(self, message: Message):
         goals: list[str] = list(
-            Goal.objects.filter(user_id=self.tg_user.user).exclude(status=Goal.Status.archived).values_list(
+            Goal.objects.visible_to(self.tg_user.user_id).filter(
+                user_id=self.tg_user.user_id,
+            ).exclude(status=Goal.Status.archived).values_list(
                 'title',
                 flat=True
             )
@@ -94,7 +125,7 @@ class Command(BaseCommand):
     def _handle_category_list(self, message: Message):
         self._state = 'get_category'
         category: list[str] = list(
-            GoalCategory.objects.filter(user_id=self.tg_user.user).exclude(is_deleted=True).values_list(
+            self._writable_categories().values_list(
                 'title',
                 flat=True
             )
@@ -124,8 +155,7 @@ class Command(BaseCommand):
         self._state = None
 
     def _handle_get_category(self, message):
-        categories = list(
-            GoalCategory.objects.filter(user_id=self.tg_user.user).exclude(is_deleted=True).values_list('title'))
+        categories = list(self._writable_categories().values_list('title'))
         cat = list(map(lambda x: x[0], categories))
         if len(cat) == 0:
             self._state = None
@@ -136,8 +166,13 @@ class Command(BaseCommand):
             self.tg_client.send_message(message.chat.id, 'Неверно выбрана категория.')
 
     def _handle_save_category(self, message: Message):
-        try:
-            self._category = GoalCategory.objects.get(title=message.text)
-        except GoalCategory.DoesNotExist:
-            self._category = None
+        self._category = self._writable_categories().filter(title=message.text).first()
         self._handle_get_category(message)
+
+    def _writable_categories(self):
+        """
+        Категории пользователя на досках, где он может создавать цели
+        """
+        return GoalCategory.objects.visible_to(self.tg_user.user_id, min_role=BoardParticipant.Role.writer).filter(
+            user_id=self.tg_user.user_id,
+        )
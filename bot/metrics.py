@@ -0,0 +1,11 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+POLLS = Counter('bot_polls_total', 'Запросы обновлений у Telegram')
+LAST_POLL = Gauge('bot_last_poll_timestamp_seconds', 'Время последнего ответа Telegram', multiprocess_mode='max')
+UPDATES = Counter('bot_updates_total', 'Обработанные обновления', ('user',))
+UPDATE_LATENCY = Histogram(
+    'bot_update_duration_seconds', 'Время обработки обновления',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+UPDATE_DB_QUERIES = Counter('bot_update_db_queries_total', 'SQL-запросы обработки обновлений')
+ERRORS = Counter('bot_errors_total', 'Исключения цикла бота', ('stage',))
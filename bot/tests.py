@@ -1 +1,65 @@
-# Create your tests here.
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APITestCase
+
+from bot.management.commands.runbot import Command
+from bot.models import TgUser
+from bot.tg.dc import GetUpdatesResponse
+from core.models import User
+from core.testing import QueryBudgetTestMixin
+
+
+class QueryBudgetTest(QueryBudgetTestMixin, APITestCase):
+    """
+    Бюджет SQL-запросов эндпоинтов bot
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='budget')
+        cls.tg_user = TgUser.objects.create(chat_id='100', username='budget', verification_code='code')
+
+    def test_verification(self):
+        self.client.force_authenticate(self.user)
+        with mock.patch('bot.views.TgClient.send_message') as send_message:
+            with self.assertQueryBudget(2, 'PATCH bot-verification'):
+                response = self.client.patch(reverse('bot-verification'), {'verification_code': 'code'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        send_message.assert_called_once()
+
+
+class RunBotMetricsTest(TestCase):
+    """
+    Счетчики цикла runbot
+    """
+
+    @staticmethod
+    def sample(name: str, **labels) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_loop_counters(self):
+        updates = GetUpdatesResponse(ok=True, result=[{
+            'update_id': 1,
+            'message': {'message_id': 1, 'from': {'id': 5, 'username': 'newbie'}, 'chat': {'id': 5}, 'text': '/goals'},
+        }])
+        before = {
+            'polls': self.sample('bot_polls_total'),
+            'unverified': self.sample('bot_updates_total', user='unverified'),
+            'db_queries': self.sample('bot_update_db_queries_total'),
+            'poll_errors': self.sample('bot_errors_total', stage='poll'),
+        }
+        command = Command()
+        with mock.patch.object(command.tg_client, 'get_updates', side_effect=[updates, ConnectionError]), \
+                mock.patch.object(command.tg_client, 'send_message') as send_message:
+            with self.assertRaises(ConnectionError):
+                command.handle(metrics_port=0)
+        send_message.assert_called_once()
+
+        self.assertEqual(self.sample('bot_polls_total'), before['polls'] + 1)
+        self.assertEqual(self.sample('bot_updates_total', user='unverified'), before['unverified'] + 1)
+        self.assertGreater(self.sample('bot_update_db_queries_total'), before['db_queries'])
+        self.assertEqual(self.sample('bot_errors_total', stage='poll'), before['poll_errors'] + 1)
+        self.assertGreater(self.sample('bot_last_poll_timestamp_seconds'), 0)
@@ -0,0 +1,56 @@
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+
+_end = object()
+
+
+def _next_part(iterator):
+    return next(iterator, _end)
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    ASGIHandler, который читает потоковые ответы в потоке запроса, а не в цикле событий.
+
+    В Django 4.1 тело StreamingHttpResponse перебирается прямо в цикле событий, и ленивые выборки ORM
+    (например, выгрузка доски серверным курсором) падают с SynchronousOnlyOperation. Здесь каждая часть
+    берется через sync_to_async в том же потоке, где выполнялось представление, поэтому курсор и соединение
+    остаются прежними, а в клиент части уходят по мере чтения.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': self.response_headers(response),
+        })
+        iterator = iter(response)
+        next_part = sync_to_async(_next_part, thread_sensitive=True)
+        while (part := await next_part(iterator)) is not _end:
+            for chunk, _ in self.chunk_bytes(part):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+    @staticmethod
+    def response_headers(response) -> list[tuple[bytes, bytes]]:
+        headers = [
+            (header.encode('ascii') if isinstance(header, str) else bytes(header),
+             value.encode('latin1') if isinstance(value, str) else bytes(value))
+            for header, value in response.items()
+        ]
+        headers += [
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip()) for cookie in response.cookies.values()
+        ]
+        return headers
+
+
+def get_asgi_application() -> StreamingASGIHandler:
+    """
+    Аналог django.core.asgi.get_asgi_application с потоковыми ответами вне цикла событий
+    """
+    django.setup(set_prefix=False)
+    return StreamingASGIHandler()
@@ -0,0 +1,53 @@
+from django.db.backends.postgresql import base, creation
+
+from core.db.pool import PooledConnection, close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """
+    PostgreSQL не удаляет и не копирует базу с открытыми подключениями,
+    поэтому перед этим закрываются свободные соединения пулов
+    """
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        close_pools()
+        super()._clone_test_db(suffix, verbosity, keepdb)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL с пулом соединений процесса (core.db.pool).
+
+    Django по-прежнему закрывает соединение в конце запроса (CONN_MAX_AGE = 0), но закрытие возвращает
+    его в пул, а следующее подключение берет готовое соединение из пула. Параметры пула - ключ POOL
+    настроек базы, без него или с MAX_SIZE 0 соединения открываются и закрываются как обычно.
+    """
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pooled: PooledConnection | None = None
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, self.settings_dict, conn_params)
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        def connect():
+            connection = super(DatabaseWrapper, self).get_new_connection(conn_params)
+            return connection, self.isolation_level
+
+        self.pooled = pool.checkout(connect)
+        self.isolation_level = self.pooled.isolation_level
+        return self.pooled.connection
+
+    def _close(self):
+        pooled, self.pooled = self.pooled, None
+        if pooled is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pooled.pool.checkin(pooled)
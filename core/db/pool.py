@@ -0,0 +1,207 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+from core.metrics import POOL_CHECKOUT_WAIT, POOL_CONNECTS, POOL_TIMEOUTS
+
+
+@dataclass
+class PooledConnection:
+    """
+    Соединение psycopg2 в пуле вместе с уровнем изоляции, который Django определил при подключении
+    """
+    pool: 'ConnectionPool'
+    connection: psycopg2.extensions.connection
+    isolation_level: int | None
+    created: float = field(default_factory=time.monotonic)
+    released: float = field(default_factory=time.monotonic)
+
+
+class ConnectionPool:
+    """
+    Пул соединений процесса к одной базе.
+
+    Свободные соединения выдаются в порядке LIFO, чтобы редко нужные соединения доживали до MAX_LIFETIME
+    и закрывались. Соединение, простоявшее дольше CHECK_AFTER, при выдаче проверяется запросом,
+    разорванные и устаревшие соединения заменяются новыми. Открытых соединений не больше MAX_SIZE,
+    при исчерпании запрос ждет свободное соединение до TIMEOUT.
+    """
+
+    def __init__(self, label: str, max_size: int, max_lifetime: float, timeout: float, check_after: float):
+        self.label = label
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check_after = check_after
+        self.condition = threading.Condition()
+        self.idle: list[PooledConnection] = []
+        self.size = 0
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.connects = 0
+        self.reconnects = 0
+        self.timeouts = 0
+
+    def checkout(self, connect: Callable[[], tuple[psycopg2.extensions.connection, int | None]]) -> PooledConnection:
+        """
+        Выдает свободное соединение или открывает новое через connect
+        """
+        started = time.monotonic()
+        with self.condition:
+            while not self.idle and self.size >= self.max_size:
+                remaining = started + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    POOL_TIMEOUTS.labels(self.label).inc()
+                    self.record_wait(time.monotonic() - started)
+                    raise psycopg2.OperationalError(
+                        f'Нет свободного соединения в пуле {self.label} за {self.timeout} с ({self.max_size} занято)'
+                    )
+                self.condition.wait(remaining)
+            pooled = self.idle.pop() if self.idle else None
+            if pooled is None:
+                self.size += 1
+            self.checkouts += 1
+            self.record_wait(time.monotonic() - started)
+
+        replaced = pooled is not None and not self.is_usable(pooled)
+        if pooled is not None and not replaced:
+            return pooled
+        if replaced:
+            self.close_connection(pooled.connection)
+        try:
+            pooled = PooledConnection(self, *connect())
+        except BaseException:
+            self.release_slot()
+            raise
+        with self.condition:
+            self.connects += 1
+            self.reconnects += replaced
+        POOL_CONNECTS.labels(self.label, 'reconnect' if replaced else 'new').inc()
+        return pooled
+
+    def checkin(self, pooled: PooledConnection) -> None:
+        """
+        Возвращает соединение в пул. Незавершенная транзакция откатывается, соединение
+        с ошибкой или отслужившее MAX_LIFETIME закрывается.
+        """
+        connection = pooled.connection
+        try:
+            if not connection.closed and connection.info.transaction_status not in (
+                TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN,
+            ):
+                connection.rollback()
+        except psycopg2.Error:
+            pass
+        broken = connection.closed or connection.info.transaction_status != TRANSACTION_STATUS_IDLE
+        if broken or self.is_expired(pooled):
+            self.close_connection(connection)
+            self.release_slot()
+            return
+        pooled.released = time.monotonic()
+        with self.condition:
+            self.idle.append(pooled)
+            self.condition.notify()
+
+    def record_wait(self, waited: float) -> None:
+        # вызывается под self.condition
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        POOL_CHECKOUT_WAIT.labels(self.label).observe(waited)
+
+    def is_expired(self, pooled: PooledConnection) -> bool:
+        return time.monotonic() - pooled.created >= self.max_lifetime
+
+    def is_usable(self, pooled: PooledConnection) -> bool:
+        if pooled.connection.closed or self.is_expired(pooled):
+            return False
+        if time.monotonic() - pooled.released < self.check_after:
+            return True
+        try:
+            with pooled.connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except psycopg2.Error:
+            return False
+
+    def release_slot(self) -> None:
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    @staticmethod
+    def close_connection(connection) -> None:
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def close_idle(self) -> None:
+        with self.condition:
+            idle, self.idle = self.idle, []
+            self.size -= len(idle)
+            self.condition.notify_all()
+        for pooled in idle:
+            self.close_connection(pooled.connection)
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                'pool': self.label,
+                'max_size': self.max_size,
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': self.size - len(self.idle),
+                'checkouts': self.checkouts,
+                'wait_seconds_total': round(self.wait_seconds, 6),
+                'wait_seconds_max': round(self.max_wait_seconds, 6),
+                'connects': self.connects,
+                'reconnects': self.reconnects,
+                'timeouts': self.timeouts,
+            }
+
+
+_pools: dict[tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias: str, settings_dict: dict, conn_params: dict) -> ConnectionPool | None:
+    """
+    Пул процесса для параметров подключения, None - если пул выключен (MAX_SIZE 0)
+    """
+    options = settings_dict.get('POOL') or {}
+    if not options.get('MAX_SIZE'):
+        return None
+    key = (alias, tuple(sorted((name, str(value)) for name, value in conn_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                label=f'{alias}:{conn_params.get("database", "")}',
+                max_size=options['MAX_SIZE'],
+                max_lifetime=options.get('MAX_LIFETIME', 600),
+                timeout=options.get('TIMEOUT', 10),
+                check_after=options.get('CHECK_AFTER', 5),
+            )
+        return pool
+
+
+def close_pools() -> None:
+    """
+    Закрывает свободные соединения всех пулов процесса
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_idle()
+
+
+def pool_stats() -> list[dict]:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
@@ -0,0 +1,81 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess
+
+from core.profiling import finish_profile, start_profile
+
+# Метрики пишутся в общий каталог PROMETHEUS_MULTIPROC_DIR, если он задан до запуска процессов:
+# тогда /metrics любого воркера gunicorn отдает сумму по всем воркерам. Каталог очищает entrypoint.sh.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUESTS = Counter('http_requests_total', 'Запросы по представлению, методу и статусу', ('view', 'method', 'status'))
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Время ответа по представлению и методу', ('view', 'method'),
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_EXCEPTIONS = Counter(
+    'http_request_exceptions_total', 'Необработанные исключения представлений', ('view', 'exception'),
+)
+REQUEST_DB_QUERIES = Counter('http_request_db_queries_total', 'SQL-запросы по представлению', ('view',))
+REQUEST_DB_SECONDS = Counter('http_request_db_seconds_total', 'Время SQL-запросов по представлению', ('view',))
+
+POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Ожидание соединения из пула', ('pool',),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+POOL_CONNECTS = Counter('db_pool_connects_total', 'Новые соединения пула', ('pool', 'reason'))
+POOL_TIMEOUTS = Counter('db_pool_timeouts_total', 'Отказы пула по таймауту ожидания', ('pool',))
+
+UNMATCHED_VIEW = '<unmatched>'
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    Реестр для выдачи метрик: в режиме нескольких процессов собирает значения всех процессов из каталога
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def view_label(request) -> str:
+    """
+    Имя URL вместо пути, чтобы число рядов не зависело от идентификаторов в адресах
+    """
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match and match.view_name else UNMATCHED_VIEW
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Число запросов, время ответа, исключения и SQL-запросы по имени URL представления.
+    Счетчики SQL общие с ProfilingMiddleware (core.profiling).
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        start_profile(request)
+
+    def process_exception(self, request, exception):
+        REQUEST_EXCEPTIONS.labels(view_label(request), type(exception).__name__).inc()
+
+    def process_response(self, request, response):
+        profile = finish_profile(request)
+        if profile is None:
+            return response
+        view = view_label(request)
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        REQUEST_LATENCY.labels(view, request.method).observe(time.perf_counter() - profile.started)
+        REQUEST_DB_QUERIES.labels(view).inc(profile.queries)
+        REQUEST_DB_SECONDS.labels(view).inc(profile.sql_time)
+        return response
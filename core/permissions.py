@@ -0,0 +1,17 @@
+import hmac
+
+from django.conf import settings
+from rest_framework import permissions
+
+
+class MetricsPermission(permissions.BasePermission):
+    """
+    Сборщик метрик передает METRICS_TOKEN в заголовке Authorization: Bearer, без токена в настройках
+    метрики доступны только администраторам
+    """
+
+    def has_permission(self, request, view):
+        if not settings.METRICS_TOKEN:
+            return bool(request.user and request.user.is_staff)
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode())
@@ -0,0 +1,173 @@
+import heapq
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+_profile: ContextVar['RequestProfile | None'] = ContextVar('request_profile', default=None)
+
+
+@dataclass
+class RequestProfile:
+    """
+    Замеры одного запроса. Тексты SQL собираются только для запросов, попавших в выборку
+    журнала медленных запросов, и только top_queries самых долгих.
+    """
+    top_queries: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    sql_time: float = 0.0
+    phases: dict[str, float] = field(default_factory=dict)
+    slowest: list[tuple[float, int, str]] = field(default_factory=list)
+
+    def add_query(self, sql: str, duration: float) -> None:
+        self.queries += 1
+        self.sql_time += duration
+        if self.top_queries:
+            # номер запроса разводит одинаковые длительности, чтобы heapq не сравнивал тексты
+            item = (duration, self.queries, sql)
+            if len(self.slowest) < self.top_queries:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heappushpop(self.slowest, item)
+
+    def add_phase(self, name: str, duration: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    def timings(self) -> dict[str, float]:
+        """
+        Длительности в миллисекундах: SQL, отрисовка ответа, остальное время представления
+        (права, сериализаторы, бизнес-логика) и весь запрос
+        """
+        total = time.perf_counter() - self.started
+        phases = sum(self.phases.values())
+        return {
+            'sql': self.sql_time * 1000,
+            **{name: duration * 1000 for name, duration in self.phases.items()},
+            'app': max(total - self.sql_time - phases, 0) * 1000,
+            'total': total * 1000,
+        }
+
+
+def start_profile(request, top_queries: int = 0) -> RequestProfile:
+    """
+    Замеры запроса, общие для ProfilingMiddleware и MetricsMiddleware: создает их первая из них
+    """
+    if getattr(request, 'profile', None) is None:
+        request.profile = RequestProfile(top_queries=top_queries)
+    _profile.set(request.profile)
+    return request.profile
+
+
+def finish_profile(request) -> RequestProfile | None:
+    _profile.set(None)
+    return getattr(request, 'profile', None)
+
+
+@contextmanager
+def profiled(top_queries: int = 0):
+    """
+    Замеры блока вне HTTP-запроса, например обработки обновления ботом
+    """
+    profile = RequestProfile(top_queries=top_queries)
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+@contextmanager
+def profile_phase(name: str):
+    """
+    Добавляет время блока к этапу name текущего запроса
+    """
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_phase(name, time.perf_counter() - started)
+
+
+def profile_queries(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_profiler(sender, connection, **kwargs):
+    """
+    Подключает замер SQL к каждому соединению: в асинхронных представлениях запросы идут
+    из других потоков и соединений, чем у middleware
+    """
+    if profile_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profile_queries)
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """
+    Замеряет число и время SQL-запросов, отрисовку ответа и общее время запроса.
+
+    Замеры отдаются заголовком Server-Timing (PROFILING_SERVER_TIMING). Запросы дольше
+    PROFILING_SLOW_REQUEST_MS пишутся в журнал с самыми долгими SQL; тексты SQL собираются только
+    для доли PROFILING_SLOW_SAMPLE_RATE запросов, остальные обходятся счетчиками.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        sampled = random.random() < settings.PROFILING_SLOW_SAMPLE_RATE
+        start_profile(request, settings.PROFILING_SLOW_TOP_QUERIES if sampled else 0)
+
+    def process_response(self, request, response):
+        profile = finish_profile(request)
+        if profile is None:
+            return response
+        timings = profile.timings()
+        if settings.PROFILING_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(timings, profile.queries)
+        if profile.top_queries and timings['total'] >= settings.PROFILING_SLOW_REQUEST_MS:
+            log_slow_request(request, response, profile, timings)
+        return response
+
+
+def server_timing(timings: dict[str, float], queries: int) -> str:
+    metrics = [f'sql;dur={timings["sql"]:.1f};desc="{queries} queries"']
+    metrics += [f'{name};dur={duration:.1f}' for name, duration in timings.items() if name != 'sql']
+    return ', '.join(metrics)
+
+
+def log_slow_request(request, response, profile: RequestProfile, timings: dict[str, float]) -> None:
+    match = request.resolver_match
+    lines = [
+        f'Медленный запрос {request.method} {request.path} ({match.view_name if match else "-"}) '
+        f'{response.status_code}: ' + ', '.join(f'{name} {duration:.0f} мс' for name, duration in timings.items())
+        + f', SQL-запросов {profile.queries}',
+    ]
+    lines += [
+        f'  {duration * 1000:.1f} мс: {sql}' for duration, _, sql in sorted(profile.slowest, reverse=True)
+    ]
+    logger.warning('\n'.join(lines))
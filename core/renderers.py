@@ -0,0 +1,42 @@
+from rest_framework.renderers import JSONRenderer
+
+from core.profiling import profile_phase
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON рендерер на orjson с тем же выводом, что и JSONRenderer DRF.
+
+    Строки дат уже отформатированы сериализаторами по DATETIME_FORMAT, IntegerChoices выводятся числами.
+    Объекты datetime и типы, которые orjson не знает, форматирует JSONEncoder DRF.
+    Без orjson, с отступами или нестандартными COMPACT_JSON/UNICODE_JSON/STRICT_JSON
+    и при ошибке orjson (например, нестроковые ключи) используется стандартный рендерер.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with profile_phase('render'):
+            return self.render_json(data, accepted_media_type, renderer_context)
+
+    def render_json(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None
+            or not self.compact
+            or self.ensure_ascii
+            or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # как и JSONRenderer, экранируем \u2028 и \u2029
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
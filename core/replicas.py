@@ -0,0 +1,163 @@
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'db_primary_until'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_read_alias: ContextVar[str | None] = ContextVar('read_alias', default=None)
+
+REPLICA_LAG_SQL = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+'''
+
+
+def replica_lag(alias: str) -> float:
+    """
+    Отставание реплики в секундах. Реплика, применившая все полученные изменения, не отстает,
+    даже если на основной базе давно не было записи.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(REPLICA_LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def reading_replica() -> bool:
+    """
+    Читает ли текущий запрос с реплики
+    """
+    return _read_alias.get() is not None
+
+
+class ReplicaPool:
+    """
+    Состояние реплик в процессе.
+
+    Реплика проверяется при выборе: соединение открывается заранее, а раз в DATABASE_REPLICA_CHECK_INTERVAL
+    дополнительно измеряется отставание. Недоступная или отстающая больше DATABASE_REPLICA_MAX_LAG реплика
+    пропускается до конца интервала, без здоровых реплик чтение идет с основной базы.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked: dict[str, float] = {}
+        self.down_until: dict[str, float] = {}
+
+    def choose(self) -> str | None:
+        now = time.monotonic()
+        with self.lock:
+            aliases = [alias for alias in settings.DATABASE_REPLICAS if self.down_until.get(alias, 0) <= now]
+        random.shuffle(aliases)
+        for alias in aliases:
+            if self.is_healthy(alias, now):
+                return alias
+        return None
+
+    def is_healthy(self, alias: str, now: float) -> bool:
+        with self.lock:
+            check_lag = now - self.checked.get(alias, -float('inf')) >= settings.DATABASE_REPLICA_CHECK_INTERVAL
+            if check_lag:
+                self.checked[alias] = now
+        try:
+            connections[alias].ensure_connection()
+            lag = replica_lag(alias) if check_lag else 0
+        except DatabaseError:
+            logger.warning('Реплика %s недоступна, чтение с основной базы', alias, exc_info=True)
+            self.mark_down(alias, now)
+            return False
+        if lag > settings.DATABASE_REPLICA_MAX_LAG:
+            logger.warning('Реплика %s отстает на %.1f с, чтение с основной базы', alias, lag)
+            self.mark_down(alias, now)
+            return False
+        return True
+
+    def mark_down(self, alias: str, now: float) -> None:
+        with self.lock:
+            self.down_until[alias] = now + settings.DATABASE_REPLICA_CHECK_INTERVAL
+            self.checked.pop(alias, None)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.checked.clear()
+            self.down_until.clear()
+
+
+replicas = ReplicaPool()
+
+
+class ReplicaRouter:
+    """
+    Чтение с реплики, выбранной ReplicaMiddleware для текущего запроса, запись - всегда в основную базу.
+    Чтение внутри транзакции основной базы остается на ней, чтобы видеть свои же изменения.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # объекты, прочитанные с реплики, сохраняются в основную базу
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """
+    Направляет чтение GET/HEAD запросов к путям DATABASE_REPLICA_PATHS на реплику.
+
+    После записи клиент получает cookie, и DATABASE_REPLICA_PIN_SECONDS его запросы читают основную базу,
+    чтобы видеть свои изменения до того, как они дойдут до реплики. Представления с use_replica = False
+    всегда читают основную базу.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if settings.DATABASE_REPLICAS:
+            _read_alias.set(replicas.choose() if self.use_replica(request, view_func) else None)
+
+    def process_response(self, request, response):
+        if not settings.DATABASE_REPLICAS:
+            return response
+        _read_alias.set(None)
+        if request.method not in SAFE_METHODS:
+            seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+            response.set_cookie(
+                PIN_COOKIE, str(int(time.time()) + seconds), max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def use_replica(request, view_func) -> bool:
+        return all((
+            request.method in SAFE_METHODS,
+            request.path.startswith(tuple(settings.DATABASE_REPLICA_PATHS)),
+            getattr(getattr(view_func, 'view_class', None), 'use_replica', True),
+            not is_pinned(request),
+        ))
+
+
+def is_pinned(request) -> bool:
+    try:
+        return int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
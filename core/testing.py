@@ -0,0 +1,59 @@
+import re
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_IN_LISTS = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Приводит запрос к шаблону без значений параметров, чтобы находить повторы (N+1)
+    """
+    return _SQL_IN_LISTS.sub('(...)', _SQL_LITERALS.sub('?', sql))
+
+
+class QueryBudget(CaptureQueriesContext):
+    """
+    Контекстный менеджер, проверяющий, что блок выполнил не больше max_queries SQL-запросов.
+    При превышении бросает AssertionError со списком повторяющихся запросов.
+    """
+
+    def __init__(self, max_queries: int, label: str = '', using: str = DEFAULT_DB_ALIAS):
+        super().__init__(connections[using])
+        self.max_queries = max_queries
+        self.label = label
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and len(self) > self.max_queries:
+            raise AssertionError(self.report())
+
+    def report(self) -> str:
+        lines = [f'{self.label or "Блок"}: выполнено {len(self)} запросов при бюджете {self.max_queries}']
+        repeated = [
+            (count, sql) for sql, count in Counter(
+                normalize_sql(query['sql']) for query in self.captured_queries
+            ).most_common() if count > 1
+        ]
+        if repeated:
+            lines.append('Повторяющиеся запросы:')
+            lines.extend(f'  {count}x {sql}' for count, sql in repeated)
+        else:
+            lines.append('Запросы:')
+            lines.extend(f'  {query["sql"]}' for query in self.captured_queries)
+        return '\n'.join(lines)
+
+
+class QueryBudgetTestMixin:
+    """
+    Миксин TestCase для проверки бюджета запросов:
+
+        with self.assertQueryBudget(3, 'goal-list'):
+            self.client.get(...)
+    """
+
+    def assertQueryBudget(self, max_queries: int, label: str = '', using: str = DEFAULT_DB_ALIAS) -> QueryBudget:
+        return QueryBudget(max_queries, label, using)
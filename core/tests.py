@@ -0,0 +1,376 @@
+import io
+import os
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+import psycopg2
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from prometheus_client import REGISTRY, Counter, generate_latest, values
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from core.db.pool import ConnectionPool
+from core.metrics import metrics_registry
+from core.models import User
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from core.replicas import PIN_COOKIE, replicas
+from core.testing import QueryBudgetTestMixin
+from goals.models import Board, BoardParticipant, Goal
+
+
+class QueryBudgetTest(QueryBudgetTestMixin, APITestCase):
+    """
+    Бюджет SQL-запросов эндпоинтов core с учетом чтения и записи сессии
+    """
+    password = 'Sup3r-secret-pass'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='budget', password=cls.password)
+
+    def call(self, budget: int, method: str, url_name: str, data=None, status: int = 200):
+        with self.assertQueryBudget(budget, f'{method.upper()} {url_name}'):
+            response = getattr(self.client, method)(reverse(url_name), data, format='json')
+        self.assertEqual(response.status_code, status, response.content)
+        return response
+
+    def test_signup(self):
+        self.call(2, 'post', 'signup', {
+            'username': 'new_user',
+            'password': self.password,
+            'password_repeat': self.password,
+        }, status=201)
+
+    def test_login(self):
+        self.call(9, 'post', 'login', {'username': self.user.username, 'password': self.password})
+
+    def test_profile(self):
+        self.client.login(username=self.user.username, password=self.password)
+        self.call(2, 'get', 'profile')
+        # доски пользователя: профиль входит в закешированные ответы их списков
+        self.call(4, 'patch', 'profile', {'first_name': 'Иван'})
+        self.call(4, 'delete', 'profile', status=204)
+
+    def test_update_password(self):
+        self.client.login(username=self.user.username, password=self.password)
+        self.call(3, 'put', 'update_password', {'old_password': self.password, 'new_password': 'An0ther-secret'})
+
+
+class FastJSONTest(SimpleTestCase):
+    """
+    FastJSONRenderer и FastJSONParser дают тот же результат, что и стандартные классы DRF
+    """
+    data = {
+        'id': 1,
+        'created': '2023-01-15 10:20:30',
+        'status': Goal.Status.in_progress,
+        'priority': Goal.Priority.critical,
+        'title': 'Цель \u2028 с "кавычками"\u2029',
+        'raw_datetime': datetime(2023, 1, 15, 10, 20, 30, 123456, tzinfo=timezone.utc),
+        'decimal': Decimal('1.50'),
+        'lazy': gettext_lazy('Недостаточно прав'),
+        'nested': [{'a': None, 'b': True}, (1, 2)],
+    }
+
+    def test_render_matches_drf(self):
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(FastJSONRenderer().render(self.data), expected)
+        self.assertEqual(FastJSONRenderer().render([self.data]), JSONRenderer().render([self.data]))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        self.assertEqual(FastJSONRenderer().render({1: 'ключ'}), JSONRenderer().render({1: 'ключ'}))
+        indented = 'application/json; indent=4'
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, indented), JSONRenderer().render(self.data, indented),
+        )
+
+    def test_render_without_orjson(self):
+        with mock.patch('core.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_parse_matches_drf(self):
+        body = JSONRenderer().render({'title': 'Цель', 'ids': [1, 2], 'nested': {'a': None}})
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        with mock.patch('core.parsers.orjson', None):
+            self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+    def test_parse_errors(self):
+        for body in (b'{"a": NaN}', b'{"a": ', '{"a": "б"}'.encode('cp1251')):
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError):
+                    FastJSONParser().parse(io.BytesIO(body))
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica'],
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class ReplicaRoutingTest(APITransactionTestCase):
+    """
+    Чтение GET идет на реплику, запись и чтение после записи - на основную базу, недоступная реплика пропускается.
+    Реплика - второе соединение к той же тестовой базе.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # после проверки databases тестом: алиаса нет в настройках проекта
+        default = connections['default'].settings_dict
+        connections.settings['replica'] = {**default, 'TEST': {**default['TEST'], 'MIRROR': 'default'}}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        replicas.reset()
+        self.addCleanup(replicas.reset)
+        self.user = User.objects.create(username='replica')
+        self.board = Board.objects.create(title='Доска')
+        BoardParticipant.objects.create(board=self.board, user=self.user, role=BoardParticipant.Role.owner)
+        self.client.force_login(self.user)
+
+    def read_board_list(self) -> tuple[CaptureQueriesContext, CaptureQueriesContext]:
+        # без кеша списков ответ всегда читается из базы
+        cache.clear()
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(reverse('board-list'))
+        self.assertIn(self.board.pk, [board['id'] for board in response.json()])
+        return primary, replica
+
+    @staticmethod
+    def board_queries(queries: CaptureQueriesContext) -> list[str]:
+        return [query['sql'] for query in queries if 'FROM "goals_board"' in query['sql']]
+
+    def test_reads_from_replica(self):
+        primary, replica = self.read_board_list()
+        self.assertTrue(self.board_queries(replica))
+        self.assertFalse(self.board_queries(primary))
+
+    def test_async_view_reads_from_replica(self):
+        # асинхронный ORM выполняет запросы в потоке с копией контекста запроса
+        self.async_client.force_login(self.user)
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = async_to_sync(self.async_client.get)(reverse('board-view', kwargs={'pk': self.board.pk}))
+        self.assertEqual(response.json()['id'], self.board.pk)
+        self.assertTrue(self.board_queries(replica))
+        self.assertFalse(self.board_queries(primary))
+
+    def test_read_after_write(self):
+        response = self.client.post(reverse('board-create'), {'title': 'Новая'}, format='json')
+        self.assertIn(PIN_COOKIE, response.cookies)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(len(self.client.get(reverse('board-list')).json()), 2)
+        self.assertFalse(self.board_queries(replica))
+
+        # окно чтения с основной базы истекло
+        self.client.cookies[PIN_COOKIE] = '0'
+        _, replica = self.read_board_list()
+        self.assertTrue(self.board_queries(replica))
+
+    def test_sync_reads_primary(self):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(self.client.get(reverse('sync')).status_code, 200)
+        self.assertFalse(replica.captured_queries)
+
+    def test_failover(self):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                mock.patch.object(connections['replica'], 'ensure_connection', side_effect=OperationalError) as connect:
+            self.client.get(reverse('board-list'))
+            self.assertTrue(self.board_queries(primary))
+            # недоступная реплика пропускается до следующей проверки
+            self.client.get(reverse('board-list'))
+        self.assertEqual(connect.call_count, 1)
+
+        replicas.reset()
+        with mock.patch('core.replicas.replica_lag', return_value=60):
+            primary, _ = self.read_board_list()
+        self.assertTrue(self.board_queries(primary))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Пул соединений только для PostgreSQL')
+class ConnectionPoolTest(SimpleTestCase):
+    """
+    Пул переиспользует соединения, заменяет разорванные и устаревшие и ограничивает число открытых
+    """
+
+    def setUp(self):
+        params = connection.get_connection_params()
+        self.connect = lambda: (psycopg2.connect(**params), None)
+
+    def make_pool(self, **options) -> ConnectionPool:
+        pool = ConnectionPool(**{'label': 'test', 'max_size': 2, 'max_lifetime': 60, 'timeout': 1, 'check_after': 5,
+                                 **options})
+        self.addCleanup(pool.close_idle)
+        return pool
+
+    def test_reuse(self):
+        pool = self.make_pool()
+        pooled = pool.checkout(self.connect)
+        pool.checkin(pooled)
+        self.assertIs(pool.checkout(self.connect).connection, pooled.connection)
+        self.assertEqual(pool.stats()['connects'], 1)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_health_check_and_lifetime(self):
+        pool = self.make_pool(check_after=0)
+        pooled = pool.checkout(self.connect)
+        pool.checkin(pooled)
+        with psycopg2.connect(**connection.get_connection_params()) as other, other.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pooled.connection.get_backend_pid()])
+        replaced = pool.checkout(self.connect)
+        self.assertIsNot(replaced.connection, pooled.connection)
+        self.assertEqual(pool.stats()['reconnects'], 1)
+
+        pool.max_lifetime = 0
+        pool.checkin(replaced)
+        self.assertTrue(replaced.connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_timeout(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pooled = pool.checkout(self.connect)
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.checkout(self.connect)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        self.assertGreaterEqual(pool.stats()['wait_seconds_max'], 0.05)
+        pool.checkin(pooled)
+
+
+class DatabasePoolStatsTest(APITestCase):
+    def test_stats(self):
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        response = self.client.get(reverse('db-pool-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('pools', response.json())
+        self.client.force_authenticate(User.objects.create(username='user'))
+        self.assertEqual(self.client.get(reverse('db-pool-stats')).status_code, 403)
+
+
+@override_settings(
+    PROFILING_SLOW_SAMPLE_RATE=0,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class ProfilingMiddlewareTest(APITestCase):
+    """
+    Заголовок Server-Timing с замерами SQL и журнал медленных запросов
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='profiled')
+        cls.board = Board.objects.create(title='Доска')
+        BoardParticipant.objects.create(board=cls.board, user=cls.user, role=BoardParticipant.Role.owner)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def assertServerTiming(self, response, queries: CaptureQueriesContext):
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        for metric in ('sql', 'render', 'app', 'total'):
+            self.assertIn(f'{metric};dur=', timing)
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('board-list'))
+        self.assertGreater(len(queries), 0)
+        self.assertServerTiming(response, queries)
+
+    def test_async_view(self):
+        # запросы асинхронного представления идут не из потока middleware
+        self.async_client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = async_to_sync(self.async_client.get)(reverse('board-view', kwargs={'pk': self.board.pk}))
+        self.assertServerTiming(response, queries)
+
+    @override_settings(PROFILING_SLOW_REQUEST_MS=0, PROFILING_SLOW_SAMPLE_RATE=1, PROFILING_SLOW_TOP_QUERIES=2)
+    def test_slow_request_log(self):
+        with self.assertLogs('core.profiling', 'WARNING') as logs:
+            self.client.get(reverse('board-list'))
+        message, = logs.output
+        self.assertIn('GET /goals/board/list (board-list) 200', message)
+        self.assertEqual(len(message.splitlines()), 3)
+        self.assertIn('SELECT', message.splitlines()[-1])
+
+    @override_settings(PROFILING_SLOW_REQUEST_MS=0, PROFILING_SERVER_TIMING=False)
+    def test_not_sampled(self):
+        with self.assertNoLogs('core.profiling', 'WARNING'):
+            response = self.client.get(reverse('board-list'))
+        self.assertNotIn('Server-Timing', response)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MetricsTest(APITestCase):
+    """
+    Метрики запросов по имени URL и выдача в формате Prometheus
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='metrics')
+
+    @staticmethod
+    def sample(name: str, **labels) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_metrics(self):
+        labels = {'view': 'board-list', 'method': 'GET'}
+        requests = self.sample('http_requests_total', status='200', **labels)
+        latency = self.sample('http_request_duration_seconds_count', **labels)
+        db_queries = self.sample('http_request_db_queries_total', view='board-list')
+        unmatched = self.sample('http_requests_total', view='<unmatched>', method='GET', status='404')
+
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('board-list'))
+        # следующий запрос очищает журнал запросов соединения
+        db_queries += len(queries)
+        self.client.get('/goals/board/unknown')
+
+        self.assertEqual(self.sample('http_requests_total', status='200', **labels), requests + 1)
+        self.assertEqual(self.sample('http_request_duration_seconds_count', **labels), latency + 1)
+        self.assertEqual(self.sample('http_request_db_queries_total', view='board-list'), db_queries)
+        self.assertEqual(
+            self.sample('http_requests_total', view='<unmatched>', method='GET', status='404'), unmatched + 1,
+        )
+
+    def test_endpoint(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'http_request_duration_seconds_bucket', response.content)
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    def test_multiprocess(self):
+        # два воркера пишут счетчик в общий каталог, выдача любого из них - сумма
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+            for pid in (101, 102):
+                with mock.patch.object(values, 'ValueClass', values.MultiProcessValue(lambda: pid)):
+                    Counter('worker_requests_total', 'Запросы воркера', registry=None).inc()
+            self.assertIn(b'worker_requests_total 2.0', generate_latest(metrics_registry()))
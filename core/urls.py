@@ -1,9 +1,10 @@
 from django.urls import path
-from core.views import SignupView, LoginView, ProfileView, UpdatePasswordView
+from core.views import SignupView, LoginView, ProfileView, UpdatePasswordView, DatabasePoolStatsView
 
 urlpatterns = [
     path('signup', SignupView.as_view(), name='signup'),
     path('login', LoginView.as_view(), name='login'),
     path('profile', ProfileView.as_view(), name='profile'),
     path('update_password', UpdatePasswordView.as_view(), name='update_password'),
+    path('db_pool/stats', DatabasePoolStatsView.as_view(), name='db-pool-stats'),
 ]
@@ -1,8 +1,15 @@
+import os
+
 from rest_framework import generics, status, permissions
 from django.contrib.auth import login, logout
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from rest_framework.response import Response
 
+from core.db.pool import pool_stats
+from core.metrics import metrics_registry
 from core.models import User
+from core.permissions import MetricsPermission
 from core.serializers import CreateUserSerializer, LoginSerializer, ProfileSerializer, UpdatePasswordSerializer
 
 
@@ -55,3 +62,24 @@ class UpdatePasswordView(generics.UpdateAPIView):
 
     def get_object(self):
         return self.request.user
+
+
+class DatabasePoolStatsView(generics.GenericAPIView):
+    """
+    Метрики пулов соединений процесса, обслужившего запрос
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response({'pid': os.getpid(), 'pools': pool_stats()})
+
+
+class MetricsView(generics.GenericAPIView):
+    """
+    Метрики в текстовом формате Prometheus. С общим каталогом PROMETHEUS_MULTIPROC_DIR -
+    сумма по всем процессам, иначе - только процесса, обслужившего запрос.
+    """
+    permission_classes = (MetricsPermission,)
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -1,7 +1,14 @@
 #!/bin/bash
+if [[ -n $PROMETHEUS_MULTIPROC_DIR ]]; then
+  # метрики прошлого запуска не должны суммироваться с метриками новых процессов
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
 python manage.py migrate --check
 status=$?
 if [[ $status != 0 ]]; then
   python manage.py migrate
 fi
+# таблица общего кеша для DatabaseCache, для остальных бэкендов команда ничего не делает
+python manage.py createcachetable
 exec "$@"
@@ -0,0 +1,172 @@
+from datetime import datetime
+
+from django.db import connection, transaction
+
+from goals.models import ArchivedGoal, Goal, GoalComment
+from goals.signals import send_bulk_write
+
+# Перенос идет запросами INSERT ... SELECT и DELETE без загрузки строк в Python. Триггеры горячих таблиц
+# срабатывают как при обычном удалении: журнал изменений получает удаление целей и комментариев,
+# сводная статистика уменьшается. Счетчики активных целей не меняются - архивные цели в них не входят,
+# а comments_count целей учитывает и комментарии в архиве.
+SELECT_BATCH_SQL = '''
+    SELECT g.id, c.board_id
+    FROM goals_goal AS g
+    JOIN goals_goalcategory AS c ON c.id = g.category_id
+    WHERE g.status = %s AND g.updated < %s
+    ORDER BY g.id
+    LIMIT %s
+    FOR UPDATE OF g SKIP LOCKED
+'''
+
+ARCHIVE_GOALS_SQL = '''
+    INSERT INTO goals_archivedgoal (
+        id, title, description, category_id, priority, due_date, user_id, comments_count, created, updated, archived
+    )
+    SELECT id, title, description, category_id, priority, due_date, user_id, comments_count, created, updated,
+        statement_timestamp()
+    FROM goals_goal
+    WHERE id = ANY(%s)
+'''
+
+ARCHIVE_COMMENTS_SQL = '''
+    INSERT INTO goals_archivedcomment (id, goal_id, text, user_id, created, updated)
+    SELECT id, goal_id, text, user_id, created, updated
+    FROM goals_goalcomment
+    WHERE goal_id = ANY(%s)
+'''
+
+DELETE_COMMENTS_SQL = 'DELETE FROM goals_goalcomment WHERE goal_id = ANY(%s)'
+
+# старые комментарии, перенесенные раньше цели, переходят к ее архивной копии
+ATTACH_COMMENTS_SQL = '''
+    UPDATE goals_archivedcomment SET goal_id = active_goal_id, active_goal_id = NULL
+    WHERE active_goal_id = ANY(%s)
+'''
+
+# Цели, которые сейчас переносит archive_batch (FOR UPDATE), пропускаются: ссылка на удаляемую цель
+# не прошла бы проверку внешнего ключа. KEY SHARE не мешает обычным изменениям целей.
+SELECT_COMMENTS_BATCH_SQL = '''
+    SELECT cm.id, c.board_id
+    FROM goals_goalcomment AS cm
+    JOIN goals_goal AS g ON g.id = cm.goal_id
+    JOIN goals_goalcategory AS c ON c.id = g.category_id
+    WHERE cm.updated < %s
+    ORDER BY cm.id
+    LIMIT %s
+    FOR UPDATE OF cm SKIP LOCKED
+    FOR KEY SHARE OF g SKIP LOCKED
+'''
+
+ARCHIVE_OLD_COMMENTS_SQL = '''
+    INSERT INTO goals_archivedcomment (id, active_goal_id, text, user_id, created, updated)
+    SELECT id, goal_id, text, user_id, created, updated
+    FROM goals_goalcomment
+    WHERE id = ANY(%s)
+'''
+
+DELETE_OLD_COMMENTS_SQL = 'DELETE FROM goals_goalcomment WHERE id = ANY(%s)'
+
+DELETE_GOALS_SQL = 'DELETE FROM goals_goal WHERE id = ANY(%s)'
+
+REHYDRATE_COMMENTS_SQL = '''
+    INSERT INTO goals_goalcomment (id, goal_id, text, user_id, created, updated)
+    SELECT id, goal_id, text, user_id, created, updated
+    FROM goals_archivedcomment
+    WHERE goal_id = %s
+'''
+
+
+def archive_batch(cutoff: datetime, batch_size: int) -> tuple[int, int]:
+    """
+    Переносит в архив до batch_size архивных целей, не менявшихся с cutoff, вместе с комментариями.
+    Цели, заблокированные другими транзакциями, пропускаются до следующего запуска.
+    Возвращает число перенесенных целей и комментариев.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(SELECT_BATCH_SQL, [Goal.Status.archived, cutoff, batch_size])
+        rows = cursor.fetchall()
+        if not rows:
+            return 0, 0
+        goal_ids = [goal_id for goal_id, _ in rows]
+        cursor.execute(ARCHIVE_GOALS_SQL, [goal_ids])
+        cursor.execute(ARCHIVE_COMMENTS_SQL, [goal_ids])
+        comments = cursor.rowcount
+        cursor.execute(DELETE_COMMENTS_SQL, [goal_ids])
+        cursor.execute(ATTACH_COMMENTS_SQL, [goal_ids])
+        cursor.execute(DELETE_GOALS_SQL, [goal_ids])
+        send_bulk_write(Goal, {board_id for _, board_id in rows})
+        return len(goal_ids), comments
+
+
+def archive_goals(cutoff: datetime, batch_size: int) -> tuple[int, int]:
+    """
+    Переносит в архив все архивные цели, не менявшиеся с cutoff, пакетами по batch_size в отдельных
+    транзакциях, чтобы не держать блокировки на время всего переноса
+    """
+    goals = comments = 0
+    while True:
+        moved_goals, moved_comments = archive_batch(cutoff, batch_size)
+        goals += moved_goals
+        comments += moved_comments
+        if moved_goals < batch_size:
+            return goals, comments
+
+
+def archive_comments_batch(cutoff: datetime, batch_size: int) -> int:
+    """
+    Переносит в архив до batch_size комментариев рабочих целей, не менявшихся с cutoff.
+    Возвращает число перенесенных комментариев.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(SELECT_COMMENTS_BATCH_SQL, [cutoff, batch_size])
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+        comment_ids = [comment_id for comment_id, _ in rows]
+        cursor.execute(ARCHIVE_OLD_COMMENTS_SQL, [comment_ids])
+        cursor.execute(DELETE_OLD_COMMENTS_SQL, [comment_ids])
+        send_bulk_write(GoalComment, {board_id for _, board_id in rows})
+        return len(comment_ids)
+
+
+def archive_comments(cutoff: datetime, batch_size: int) -> int:
+    """
+    Переносит в архив все комментарии рабочих целей, не менявшиеся с cutoff, пакетами по batch_size.
+    Цели остаются в рабочих таблицах, их comments_count не меняется.
+    """
+    comments = 0
+    while True:
+        moved = archive_comments_batch(cutoff, batch_size)
+        comments += moved
+        if moved < batch_size:
+            return comments
+
+
+def rehydrate_goal(goal_id: int, status: int = Goal.Status.to_do) -> Goal:
+    """
+    Возвращает цель из архива в рабочие таблицы с прежними id и датами создания, вместе с комментариями
+    """
+    with transaction.atomic():
+        archived = ArchivedGoal.objects.select_for_update().select_related('category').get(pk=goal_id)
+        goal = Goal(
+            id=archived.id,
+            title=archived.title,
+            description=archived.description,
+            category=archived.category,
+            status=status,
+            priority=archived.priority,
+            due_date=archived.due_date,
+            user_id=archived.user_id,
+            comments_count=archived.comments_count,
+        )
+        # сохранение обновляет счетчик активных целей категории и оповещает клиентов доски
+        goal.save(force_insert=True)
+        Goal.objects.filter(pk=goal.pk).update(created=archived.created)
+        goal.created = archived.created
+        with connection.cursor() as cursor:
+            cursor.execute(REHYDRATE_COMMENTS_SQL, [archived.id])
+            if cursor.rowcount:
+                send_bulk_write(GoalComment, {archived.category.board_id})
+        archived.delete()
+    return goal
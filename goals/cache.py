@@ -0,0 +1,79 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def board_version_key(board_id: int) -> str:
+    return f'goals:board_version:{board_id}'
+
+
+def list_cache_counter_key(name: str, counter: str) -> str:
+    return f'goals:list_cache:{name}:{counter}'
+
+
+def get_board_versions(board_ids) -> dict[int, int]:
+    """
+    Версии досок одним обращением к кешу.
+    Отсутствующая (вытесненная) версия заводится заново от текущего времени,
+    чтобы не совпасть с версией, под которой уже лежат старые ответы.
+    """
+    keys = {board_version_key(board_id): board_id for board_id in board_ids}
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys.keys() - versions.keys()}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def bump_board_versions(*board_ids: int) -> None:
+    """
+    Увеличивает версии досок после коммита транзакции: закешированные ответы по старой версии
+    перестают использоваться без перебора ключей. До коммита версию не меняем, иначе параллельный
+    запрос успел бы закешировать незакоммиченное состояние под новой версией.
+    """
+    board_ids = {board_id for board_id in board_ids if board_id is not None}
+    if board_ids:
+        transaction.on_commit(lambda: _incr_board_versions(board_ids))
+
+
+def _incr_board_versions(board_ids: set[int]) -> None:
+    for board_id in board_ids:
+        key = board_version_key(board_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def count_list_cache(name: str, counter: str) -> None:
+    key = list_cache_counter_key(name, counter)
+    if not cache.add(key, 1, timeout=None):
+        cache.incr(key)
+
+
+def list_cache_stats(names) -> dict[str, dict[str, int]]:
+    """
+    Счетчики попаданий и промахов кеша списков по именам представлений
+    """
+    names = list(names)
+    keys = {
+        list_cache_counter_key(name, counter): (name, counter)
+        for name in names for counter in ('hits', 'misses')
+    }
+    values = cache.get_many(keys)
+    stats = {name: {'hits': 0, 'misses': 0} for name in names}
+    for key, (name, counter) in keys.items():
+        stats[name][counter] = values.get(key, 0)
+    return stats
+
+
+def list_cache_key(name: str, roles: dict[int, int], versions: dict[int, int], params: str) -> str:
+    """
+    Ключ ответа: набор досок с ролями пользователя, их версии и нормализованные параметры запроса
+    """
+    state = ','.join(f'{board_id}:{roles[board_id]}:{versions[board_id]}' for board_id in sorted(roles))
+    digest = hashlib.md5(f'{state}|{params}'.encode(), usedforsecurity=False).hexdigest()
+    return f'goals:list:{name}:{digest}'
@@ -0,0 +1,100 @@
+from collections import Counter
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from goals.models import GoalCategory, Goal, GoalComment, ArchivedComment
+
+
+def is_active(status: int | None) -> bool:
+    return status is not None and status != Goal.Status.archived
+
+
+def lock_goals(ids: Iterable[int]) -> None:
+    """
+    Блокирует строки целей в порядке id до чтения статуса и категории, от которых считаются счетчики.
+    Блокировка берется отдельным запросом без соединений: перепроверяя заблокированную строку, Postgres
+    не пересоединяет остальные таблицы, и перенесенная в другую категорию цель выпала бы из выборки.
+    """
+    list(Goal.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', flat=True))
+
+
+def _adjust(model, field: str, deltas: dict[int, int]) -> None:
+    """
+    Изменяет счетчик строк на заданные приращения одним UPDATE с F(), без чтения текущих значений.
+    Поле updated не меняется: это время правки пользователем. Кеш списков и ETag сбрасываются
+    по версии доски, которую увеличивает сама запись, изменившая счетчик (goals.signals).
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and delta}
+    if not deltas:
+        return
+    if len(deltas) == 1:
+        (pk, delta), = deltas.items()
+        increment = Value(delta)
+    else:
+        increment = Case(*(When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()), output_field=IntegerField())
+    model.objects.filter(pk__in=deltas).update(**{field: F(field) + increment})
+
+
+def adjust_active_goals(deltas: dict[int, int]) -> None:
+    """
+    Приращения числа активных целей по категориям
+    """
+    _adjust(GoalCategory, 'active_goals_count', deltas)
+
+
+def adjust_comments(deltas: dict[int, int]) -> None:
+    """
+    Приращения числа комментариев по целям
+    """
+    _adjust(Goal, 'comments_count', deltas)
+
+
+def count_active_goals(goals: Iterable[Goal]) -> Counter:
+    """
+    Приращения активных целей по категориям для созданных целей
+    """
+    return Counter(goal.category_id for goal in goals if is_active(goal.status))
+
+
+def _expected_counters():
+    active_goals = Goal.objects.filter(category=OuterRef('pk')).exclude(status=Goal.Status.archived)
+    comments = GoalComment.objects.filter(goal=OuterRef('pk'))
+    archived_comments = ArchivedComment.objects.filter(active_goal=OuterRef('pk'))
+    return (
+        (GoalCategory, 'active_goals_count', _count_subquery(active_goals.values('category'))),
+        # старые комментарии, перенесенные в архив, остаются в счетчике цели
+        (Goal, 'comments_count', (
+            _count_subquery(comments.values('goal')) + _count_subquery(archived_comments.values('active_goal'))
+        )),
+    )
+
+
+def _count_subquery(grouped) -> Coalesce:
+    return Coalesce(Subquery(grouped.order_by().annotate(count=Count('pk')).values('count')), 0)
+
+
+def check_counters(board_id: int | None = None, repair: bool = False) -> list[str]:
+    """
+    Сверяет счетчики с фактическим числом строк и при repair исправляет расхождения.
+    Возвращает описание найденных расхождений.
+    """
+    drift = []
+    with transaction.atomic():
+        for model, field, expected in _expected_counters():
+            rows = model.objects.all()
+            if board_id is not None:
+                rows = rows.filter(board_id=board_id) if model is GoalCategory else rows.filter(
+                    category__board_id=board_id,
+                )
+            rows = rows.annotate(expected=expected).exclude(**{field: F('expected')})
+            mismatched = []
+            for pk, stored, count in rows.values_list('pk', field, 'expected').order_by('pk'):
+                drift.append(f'{model.__name__} {pk} {field}: {stored} -> {count}')
+                mismatched.append(pk)
+            if repair and mismatched:
+                # пересчет в самом UPDATE, чтобы не записать значение, прочитанное до параллельного изменения
+                model.objects.filter(pk__in=mismatched).update(**{field: expected})
+    return drift
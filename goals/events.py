@@ -0,0 +1,129 @@
+import asyncio
+import json
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http import HttpRequest
+from django.http.cookie import parse_cookie
+
+from goals.models import Board
+from goals.push import board_topic, get_broker, user_topic
+
+
+@sync_to_async
+def authenticate(scope: dict) -> int | None:
+    """
+    Пользователь по cookie сессии, как в AuthenticationMiddleware
+    """
+    headers = dict(scope['headers'])
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    request = HttpRequest()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+    try:
+        user = get_user(request)
+        return user.pk if user.is_authenticated else None
+    finally:
+        close_old_connections()
+
+
+@sync_to_async
+def member_boards(user_id: int, requested: set[int]) -> set[int]:
+    """
+    Доски, где пользователь участник; при requested - только из запрошенных
+    """
+    try:
+        boards = Board.objects.visible_to(user_id)
+        if requested:
+            boards = boards.filter(pk__in=requested)
+        return set(boards.values_list('id', flat=True))
+    finally:
+        close_old_connections()
+
+
+def subscription_topics(user_id: int, boards: set[int]) -> set[str]:
+    return {user_topic(user_id), *(board_topic(board_id) for board_id in boards)}
+
+
+def format_event(event: dict) -> bytes:
+    return f'event: {event["type"]}\ndata: {json.dumps(event, separators=(",", ":"))}\n\n'.encode()
+
+
+async def wait_disconnect(receive) -> None:
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class BoardEventsApp:
+    """
+    ASGI-приложение потока событий досок (Server-Sent Events).
+
+    Подписка на доски пользователя (или на доски из параметров board, где он участник) через брокер
+    из GOALS_PUSH_BROKER. События - подсказки об изменениях без данных: клиент забирает сами изменения
+    через sync по своему курсору. Соединение держится в цикле событий без потока на подключение.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            return await self.respond(send, 405, {'detail': f'Метод "{scope["method"]}" не разрешен.'})
+        user_id = await authenticate(scope)
+        if user_id is None:
+            return await self.respond(send, 403, {'detail': 'Учетные данные не были предоставлены.'})
+        try:
+            requested = {int(value) for value in parse_qs(scope['query_string'].decode()).get('board', ())}
+        except ValueError:
+            return await self.respond(send, 400, {'board': 'Ожидается id доски'})
+        boards = await member_boards(user_id, requested)
+        if requested - boards:
+            return await self.respond(send, 404, {'detail': 'Страница не найдена.'})
+
+        subscription = get_broker().subscribe(subscription_topics(user_id, boards))
+        disconnect = asyncio.ensure_future(wait_disconnect(receive))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': b'retry: 1000\n\n', 'more_body': True})
+            while True:
+                event = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait(
+                    {event, disconnect}, timeout=settings.GOALS_PUSH_HEARTBEAT, return_when=asyncio.FIRST_COMPLETED,
+                )
+                if event not in done:
+                    event.cancel()
+                    if disconnect in done:
+                        break
+                    await send({'type': 'http.response.body', 'body': b': ping\n\n', 'more_body': True})
+                    continue
+
+                event = event.result()
+                if event['type'] == 'membership':
+                    joined = event['board'] not in boards
+                    boards = await member_boards(user_id, requested)
+                    subscription.update(subscription_topics(user_id, boards))
+                    # об уходе с доски клиент уже узнал из события самой доски
+                    if not joined or event['board'] not in boards:
+                        continue
+                    event = {**event, 'type': 'change'}
+                await send({'type': 'http.response.body', 'body': format_event(event), 'more_body': True})
+        finally:
+            subscription.close()
+            disconnect.cancel()
+
+    @staticmethod
+    async def respond(send, status: int, data: dict) -> None:
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({'type': 'http.response.body', 'body': json.dumps(data, ensure_ascii=False).encode()})
@@ -0,0 +1,88 @@
+import csv
+from typing import Iterator
+
+from django.conf import settings
+from django.db.models import F
+from rest_framework import serializers
+
+from core.renderers import FastJSONRenderer
+from goals.models import Board, GoalCategory, Goal, GoalComment
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+CSV_COLUMNS = (
+    'type', 'id', 'parent_id', 'title', 'description', 'text', 'status', 'priority', 'due_date', 'author', 'created',
+    'updated',
+)
+
+
+class _LineBuffer:
+    """
+    Буфер для csv.writer, который сразу возвращает записанную строку
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def board_rows(board: Board, chunk_size: int | None = None) -> Iterator[dict]:
+    """
+    Категории, цели и комментарии доски по одной строке.
+    Каждая таблица читается серверным курсором порциями по chunk_size, поэтому память не зависит от размера доски.
+    """
+    chunk_size = chunk_size or settings.GOALS_EXPORT_CHUNK_SIZE
+    datetime_field = serializers.DateTimeField()
+    date_field = serializers.DateField()
+
+    def dates(row: dict) -> dict:
+        row['created'] = datetime_field.to_representation(row['created'])
+        row['updated'] = datetime_field.to_representation(row['updated'])
+        return row
+
+    categories = GoalCategory.objects.filter(board=board, is_deleted=False).order_by('id').values(
+        'id', 'title', 'created', 'updated', author=F('user__username'),
+    )
+    for row in categories.iterator(chunk_size=chunk_size):
+        yield {'type': 'category', 'parent_id': board.id, **dates(row)}
+
+    goals = Goal.objects.filter(category__board=board, category__is_deleted=False).order_by('id').values(
+        'id', 'title', 'description', 'status', 'priority', 'due_date', 'created', 'updated',
+        parent_id=F('category_id'), author=F('user__username'),
+    )
+    for row in goals.iterator(chunk_size=chunk_size):
+        row['due_date'] = date_field.to_representation(row['due_date'])
+        yield {'type': 'goal', **dates(row)}
+
+    comments = GoalComment.objects.filter(
+        goal__category__board=board,
+        goal__category__is_deleted=False,
+    ).order_by('id').values(
+        'id', 'text', 'created', 'updated', parent_id=F('goal_id'), author=F('user__username'),
+    )
+    for row in comments.iterator(chunk_size=chunk_size):
+        yield {'type': 'comment', **dates(row)}
+
+
+def export_board(board: Board, export_format: str, chunk_size: int | None = None) -> Iterator[bytes]:
+    """
+    Построчная выгрузка доски в NDJSON или CSV
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Неизвестный формат выгрузки: {export_format}')
+    rows = board_rows(board, chunk_size)
+    return _ndjson_lines(rows) if export_format == 'ndjson' else _csv_lines(rows)
+
+
+def _ndjson_lines(rows: Iterator[dict]) -> Iterator[bytes]:
+    renderer = FastJSONRenderer()
+    for row in rows:
+        yield renderer.render(row) + b'\n'
+
+
+def _csv_lines(rows: Iterator[dict]) -> Iterator[bytes]:
+    writer = csv.DictWriter(_LineBuffer(), fieldnames=CSV_COLUMNS, restval='')
+    yield writer.writeheader().encode()
+    for row in rows:
+        yield writer.writerow(row).encode()
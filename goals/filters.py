@@ -1,8 +1,36 @@
+import operator
+import re
+from functools import reduce
+
 import django_filters
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
 from django.db import models
 from django_filters import rest_framework
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
 from goals.models import Goal
 
+SEARCH_CONFIGS = ('russian', 'english')
+# последнее слово строки поиска без кавычек и минуса: его ищем и как начало слова
+LAST_WORD_RE = re.compile(r'(?:^|\s)([^\W_]+)$')
+
+
+def search_query(search: str, config: str) -> SearchQuery:
+    """
+    Запрос websearch, где последнее слово ищется и по префиксу: "прод" находит "продукты", как при вводе
+    с подсказками. Кавычки, OR и минус работают как в websearch_to_tsquery.
+    """
+    query = SearchQuery(search, config=config, search_type='websearch')
+    match = LAST_WORD_RE.search(search)
+    if match is None or search.count('"') % 2:
+        return query
+    prefix = SearchQuery(f'{match.group(1)}:*', config=config, search_type='raw')
+    head = search[:match.start(1)].strip()
+    if head:
+        prefix = SearchQuery(head, config=config, search_type='websearch') & prefix
+    return query | prefix
+
 
 class GoalDateFilter(rest_framework.FilterSet):
     """
@@ -20,3 +48,37 @@ class GoalDateFilter(rest_framework.FilterSet):
         filter_overrides = {
             models.DateField: {'filter_class': django_filters.IsoDateTimeFilter}
         }
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Полнотекстовый поиск Postgres по параметру search= вместо ILIKE.
+
+    Если у представления задан search_vector_field, поиск идет по хранимому tsvector
+    с GIN-индексом, иначе вектор строится по search_fields. Запрос разбирается
+    с русской и английской морфологией, последнее слово ищется и по префиксу (search_query).
+    Подстроки внутри слова, в отличие от ILIKE, не находятся. Без параметра ordering
+    результаты сортируются по релевантности.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search = request.query_params.get(self.search_param, '').strip()
+        if not search:
+            return queryset
+
+        query = reduce(operator.or_, (search_query(search, config) for config in SEARCH_CONFIGS))
+        if vector_field := getattr(view, 'search_vector_field', None):
+            queryset = queryset.filter(**{vector_field: query})
+            vector = models.F(vector_field)
+        else:
+            vector = reduce(operator.add, (
+                SearchVector(field, config=config)
+                for field in self.get_search_fields(view, request)
+                for config in SEARCH_CONFIGS
+            ))
+            queryset = queryset.annotate(search_document=vector).filter(search_document=query)
+
+        queryset = queryset.annotate(search_rank=SearchRank(vector, query))
+        if api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
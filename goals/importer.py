@@ -0,0 +1,143 @@
+import csv
+import io
+import json
+from itertools import islice
+from typing import IO, Iterable, Iterator
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from core.models import User
+from goals.counters import adjust_active_goals, count_active_goals
+from goals.models import Board, GoalCategory, Goal
+from goals.signals import send_bulk_write
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+class GoalImportRowSerializer(serializers.Serializer):
+    """
+    Строка импорта цели. Категория указывается названием на целевой доске.
+    """
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    category = serializers.CharField(max_length=255)
+    status = serializers.ChoiceField(choices=Goal.Status.choices, default=Goal.Status.to_do)
+    priority = serializers.ChoiceField(choices=Goal.Priority.choices, default=Goal.Priority.medium)
+    due_date = serializers.DateField(required=False, allow_null=True)
+
+    def to_internal_value(self, data):
+        # пустые ячейки CSV означают отсутствие значения
+        if isinstance(data, dict):
+            data = {key: value for key, value in data.items() if value not in ('', None)}
+        return super().to_internal_value(data)
+
+
+class ImportFileError(ValueError):
+    """
+    Файл не читается дальше строки row: неверная кодировка или структура CSV
+    """
+
+    def __init__(self, row: int, message: str):
+        super().__init__(message)
+        self.row = row
+
+
+def read_rows(file: IO[bytes], import_format: str) -> Iterator[dict | str]:
+    """
+    Читает строки файла по одной. Невалидная строка NDJSON возвращается текстом ошибки,
+    нечитаемый файл прерывает чтение ImportFileError.
+    """
+    if import_format not in IMPORT_FORMATS:
+        raise ValueError(f'Неизвестный формат импорта: {import_format}')
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    rows = csv.DictReader(text) if import_format == 'csv' else read_ndjson(text)
+    number = 0
+    try:
+        for number, row in enumerate(rows, start=1):
+            yield row
+    except UnicodeDecodeError:
+        raise ImportFileError(number + 1, 'Файл должен быть в кодировке UTF-8')
+    except csv.Error as exc:
+        raise ImportFileError(number + 1, f'Некорректный CSV: {exc}')
+
+
+def read_ndjson(text: IO[str]) -> Iterator[dict | str]:
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield f'Некорректный JSON: {exc}'
+            continue
+        yield row if isinstance(row, dict) else 'Ожидается JSON-объект'
+
+
+class GoalImporter:
+    """
+    Импорт целей на доску.
+
+    Категории доски загружаются одним запросом и сопоставляются по названию, строки проверяются
+    и вставляются порциями по chunk_size через bulk_create. Ошибки возвращаются по номерам строк,
+    корректные строки импортируются. Если файл не дочитан (ImportFileError), импорт отменяется целиком.
+    """
+
+    def __init__(self, board: Board, user: User, create_categories: bool = False, chunk_size: int | None = None):
+        self.board = board
+        self.user = user
+        self.create_categories = create_categories
+        self.chunk_size = chunk_size or settings.GOALS_IMPORT_CHUNK_SIZE
+        # при одинаковых названиях используется самая старая категория
+        self.categories = {
+            category.title: category
+            for category in GoalCategory.objects.filter(board=board, is_deleted=False).order_by('-id')
+        }
+        # один экземпляр на весь импорт: поля сериализатора не копируются для каждой строки
+        self.row_serializer = GoalImportRowSerializer()
+        self.created = 0
+        self.errors: list[dict] = []
+
+    def run(self, rows: Iterable[dict | str]) -> dict:
+        numbered = enumerate(rows, start=1)
+        with transaction.atomic():
+            while chunk := list(islice(numbered, self.chunk_size)):
+                self.import_chunk(chunk)
+            if self.created:
+                send_bulk_write(Goal, {self.board.id})
+        return {'created': self.created, 'errors': self.errors}
+
+    def import_chunk(self, chunk: list[tuple[int, dict | str]]) -> None:
+        valid = []
+        for number, row in chunk:
+            if isinstance(row, str):
+                self.errors.append({'row': number, 'errors': {'non_field_errors': [row]}})
+                continue
+            try:
+                valid.append((number, self.row_serializer.run_validation(row)))
+            except serializers.ValidationError as exc:
+                self.errors.append({'row': number, 'errors': exc.detail})
+
+        if self.create_categories:
+            self.add_categories({attrs['category'] for _, attrs in valid} - self.categories.keys())
+
+        goals = []
+        for number, attrs in valid:
+            category = self.categories.get(attrs.pop('category'))
+            if category is None:
+                self.errors.append({'row': number, 'errors': {'category': ['Категория не найдена на доске']}})
+                continue
+            goals.append(Goal(category=category, user=self.user, **attrs))
+        Goal.objects.bulk_create(goals)
+        adjust_active_goals(count_active_goals(goals))
+        self.created += len(goals)
+
+    def add_categories(self, titles: set[str]) -> None:
+        if not titles:
+            return
+        created = GoalCategory.objects.bulk_create(
+            GoalCategory(board=self.board, user=self.user, title=title) for title in sorted(titles)
+        )
+        send_bulk_write(GoalCategory, {self.board.id})
+        self.categories.update((category.title, category) for category in created)
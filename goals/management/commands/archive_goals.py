@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from goals.archive import archive_comments, archive_goals
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит архивные цели, не менявшиеся дольше срока, с их комментариями и старые комментарии '
+        'рабочих целей в архивные таблицы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.GOALS_ARCHIVE_AFTER_DAYS,
+            help='Сколько дней цель должна пробыть в статусе архива без изменений',
+        )
+        parser.add_argument(
+            '--comment-days',
+            type=int,
+            default=settings.GOALS_ARCHIVE_COMMENTS_AFTER_DAYS,
+            help='Сколько дней комментарий рабочей цели должен пробыть без изменений',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.GOALS_ARCHIVE_BATCH_SIZE,
+            help='Целей в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['comment_days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('Срок не может быть отрицательным, размер пакета - меньше 1')
+        now = timezone.now()
+        goals, comments = archive_goals(now - timedelta(days=options['days']), options['batch_size'])
+        comments += archive_comments(now - timedelta(days=options['comment_days']), options['batch_size'])
+        self.stdout.write(f'Перенесено в архив целей: {goals}, комментариев: {comments}')
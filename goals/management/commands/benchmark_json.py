@@ -0,0 +1,71 @@
+import io
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+from goals.models import Goal
+from goals.serializers import GoalSerializer
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость JSON рендереров и парсеров на странице целей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--goals', type=int, default=1000, help='Целей на странице')
+        parser.add_argument('--iterations', type=int, default=50, help='Повторов каждого замера')
+
+    def handle(self, *args, **options):
+        page = self.build_page(options['goals'])
+        iterations = options['iterations']
+
+        expected = JSONRenderer().render(page)
+        if FastJSONRenderer().render(page) != expected:
+            raise CommandError('Вывод FastJSONRenderer отличается от JSONRenderer')
+
+        self.stdout.write(f'orjson: {"да" if orjson else "нет, стандартный json"}')
+        self.stdout.write(f'Страница: {options["goals"]} целей, {len(expected) / 1024:.1f} КБ')
+        for name, renderer, parser in (
+            ('DRF', JSONRenderer(), JSONParser()),
+            ('Fast', FastJSONRenderer(), FastJSONParser()),
+        ):
+            render = self.measure(iterations, lambda: renderer.render(page))
+            parse = self.measure(iterations, lambda: parser.parse(io.BytesIO(expected)))
+            self.stdout.write(
+                f'{name:>5}: render {iterations / render:8.1f} стр/с, parse {iterations / parse:8.1f} стр/с'
+            )
+
+    @staticmethod
+    def build_page(size: int) -> dict:
+        """
+        Страница целей в том виде, в каком ее отдает goal/list, без обращений к базе
+        """
+        now = timezone.now()
+        goals = [
+            Goal(
+                id=pk,
+                title=f'Цель {pk}',
+                description='Описание цели ' * 5,
+                category_id=pk % 20 + 1,
+                user_id=1,
+                status=pk % 4 + 1,
+                priority=pk % 4 + 1,
+                due_date=(now + timedelta(days=pk % 30)).date(),
+                created=now,
+                updated=now,
+            )
+            for pk in range(1, size + 1)
+        ]
+        return {'count': size, 'next': None, 'previous': None, 'results': GoalSerializer(goals, many=True).data}
+
+    @staticmethod
+    def measure(iterations: int, func) -> float:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return time.perf_counter() - started
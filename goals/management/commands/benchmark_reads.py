@@ -0,0 +1,158 @@
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+import requests
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core.models import User
+from goals.models import Board, Goal
+
+SERVERS = {
+    'sync': ['todolist.wsgi:application'],
+    'async': ['todolist.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочное сравнение чтения: синхронные воркеры gunicorn (WSGI) против воркеров uvicorn (ASGI, '
+        'асинхронные представления) при равном числе воркеров'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Пользователь, от имени которого идут запросы')
+        parser.add_argument('--workers', type=int, default=4, help='Воркеров сервера в обоих режимах')
+        parser.add_argument('--concurrency', type=int, default=64, help='Одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=2000, help='Запросов на режим')
+        parser.add_argument('--port', type=int, default=8100, help='Порт запускаемого сервера')
+        parser.add_argument('--mode', choices=tuple(SERVERS), action='append', help='Только указанные режимы')
+        parser.add_argument('--path', action='append', help='Путь запроса, по умолчанию четыре представления чтения')
+        parser.add_argument('--no-list-cache', action='store_true', help='Отключить кеш ответов списков')
+        parser.add_argument(
+            '--pool', choices=('on', 'off', 'both'), default='on',
+            help='Пул соединений с базой: включен, выключен (соединение на запрос) или оба варианта',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {options["username"]} не найден')
+        paths = options['path'] or self.default_paths(user)
+        session = self.create_session(user)
+        env = dict(os.environ)
+        if options['no_list_cache']:
+            env['GOALS_LIST_CACHE_TIMEOUT'] = '0'
+
+        self.stdout.write(
+            f'Воркеров: {options["workers"]}, клиентов: {options["concurrency"]}, запросов: {options["requests"]}'
+        )
+        for path in paths:
+            self.stdout.write(f'  {path}')
+        pools = {'on': (True,), 'off': (False,), 'both': (True, False)}[options['pool']]
+        try:
+            for mode in options['mode'] or SERVERS:
+                for pool in pools:
+                    server_env = env if pool else {**env, 'DB_POOL_MAX_SIZE': '0'}
+                    server = self.start_server(mode, options['workers'], options['port'], server_env)
+                    try:
+                        base_url = f'http://127.0.0.1:{options["port"]}'
+                        self.wait_ready(base_url + paths[0], session.session_key)
+                        self.run(base_url, paths, session.session_key, options['concurrency'], options['concurrency'])
+                        self.report(f'{mode}, {"пул" if pool else "без пула"}', *self.run(
+                            base_url, paths, session.session_key, options['concurrency'], options['requests'],
+                        ))
+                    finally:
+                        server.terminate()
+                        server.wait()
+        finally:
+            session.delete()
+
+    @staticmethod
+    def default_paths(user: User) -> list[str]:
+        board = Board.objects.visible_to(user).order_by('pk').first()
+        if board is None:
+            raise CommandError('У пользователя нет досок')
+        goal = Goal.objects.filter(category__board=board).order_by('pk').first()
+        return [
+            reverse('board-list'),
+            reverse('board-view', kwargs={'pk': board.pk}),
+            reverse('goal-list') + '?limit=50',
+            reverse('comment-list') + (f'?goal={goal.pk}&limit=50' if goal else '?limit=50'),
+        ]
+
+    @staticmethod
+    def create_session(user: User):
+        """
+        Сессия пользователя, как после входа
+        """
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session
+
+    @staticmethod
+    def start_server(mode: str, workers: int, port: int, env: dict) -> subprocess.Popen:
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *SERVERS[mode], '-w', str(workers), '-b', f'127.0.0.1:{port}'],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    @staticmethod
+    def wait_ready(url: str, session_key: str, timeout: float = 30) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                response = requests.get(url, cookies={settings.SESSION_COOKIE_NAME: session_key}, timeout=timeout)
+            except requests.ConnectionError:
+                time.sleep(0.2)
+                continue
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            return
+        raise CommandError(f'Сервер не ответил за {timeout:.0f} с')
+
+    @staticmethod
+    def run(base_url: str, paths: list[str], session_key: str, concurrency: int,
+            total: int) -> tuple[float, list[float], int]:
+        """
+        Выполняет total запросов по кругу путей с concurrency клиентами.
+        Возвращает длительность, задержки запросов и число ответов не 200.
+        """
+        local = threading.local()
+
+        def fetch(index: int) -> tuple[float, bool]:
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+                local.session.cookies.set(settings.SESSION_COOKIE_NAME, session_key)
+            started = time.perf_counter()
+            response = local.session.get(base_url + paths[index % len(paths)])
+            return time.perf_counter() - started, response.status_code == 200
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+        return elapsed, [latency for latency, _ in results], sum(not ok for _, ok in results)
+
+    def report(self, label: str, elapsed: float, latencies: list[float], errors: int) -> None:
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f'{label:>16}: {len(latencies) / elapsed:8.1f} запр/с, '
+            f'p50 {percentiles[49] * 1000:7.1f} мс, p95 {percentiles[94] * 1000:7.1f} мс, '
+            f'p99 {percentiles[98] * 1000:7.1f} мс, ошибок {errors}'
+        )
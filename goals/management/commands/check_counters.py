@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from goals.counters import check_counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счетчики активных целей категорий и комментариев целей, с --repair исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', type=int, help='Только одна доска')
+        parser.add_argument('--repair', action='store_true', help='Исправить найденные расхождения')
+
+    def handle(self, *args, **options):
+        drift = check_counters(options['board'], options['repair'])
+        for line in drift:
+            self.stdout.write(line)
+        action = 'исправлено' if options['repair'] else 'найдено'
+        self.stdout.write(f'Расхождений {action}: {len(drift)}')
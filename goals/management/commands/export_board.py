@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from goals.export import EXPORT_FORMATS, export_board
+from goals.models import Board
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка категорий, целей и комментариев доски в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('board_id', type=int)
+        parser.add_argument('--format', dest='export_format', choices=tuple(EXPORT_FORMATS), default='ndjson')
+        parser.add_argument('--output', help='Файл выгрузки, по умолчанию stdout')
+        parser.add_argument('--chunk-size', type=int, help='Строк за одно чтение серверного курсора')
+
+    def handle(self, *args, **options):
+        try:
+            board = Board.objects.get(pk=options['board_id'], is_deleted=False)
+        except Board.DoesNotExist:
+            raise CommandError(f'Доска {options["board_id"]} не найдена')
+
+        lines = export_board(board, options['export_format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                output.writelines(lines)
+        else:
+            sys.stdout.buffer.writelines(lines)
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import User
+from goals.importer import IMPORT_FORMATS, GoalImporter, ImportFileError, read_rows
+from goals.models import Board, BoardParticipant
+
+
+class Command(BaseCommand):
+    help = 'Импорт целей на доску из файла CSV или NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('board_id', type=int)
+        parser.add_argument('path', help='Файл CSV или NDJSON')
+        parser.add_argument('--user', required=True, help='Username автора целей, владельца или редактора доски')
+        parser.add_argument('--format', dest='import_format', choices=IMPORT_FORMATS, help='По умолчанию по расширению')
+        parser.add_argument('--create-categories', action='store_true', help='Создавать недостающие категории')
+        parser.add_argument('--chunk-size', type=int, help='Строк в одной порции проверки и вставки')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+            board = Board.objects.visible_to(user, min_role=BoardParticipant.Role.writer).get(pk=options['board_id'])
+        except (User.DoesNotExist, Board.DoesNotExist):
+            raise CommandError('Пользователь не найден или не может редактировать доску')
+        import_format = options['import_format'] or options['path'].rpartition('.')[2].lower()
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError(f'Допустимые форматы: {", ".join(IMPORT_FORMATS)}')
+
+        importer = GoalImporter(board, user, options['create_categories'], options['chunk_size'])
+        started = time.perf_counter()
+        with open(options['path'], 'rb') as file:
+            try:
+                report = importer.run(read_rows(file, import_format))
+            except ImportFileError as exc:
+                raise CommandError(f'Строка {exc.row}: {exc}. Импорт отменен')
+        elapsed = time.perf_counter() - started
+
+        for error in report['errors']:
+            messages = '; '.join(f'{field}: {" ".join(errors)}' for field, errors in error['errors'].items())
+            self.stderr.write(f'Строка {error["row"]}: {messages}')
+        rows = report['created'] + len(report['errors'])
+        self.stdout.write(
+            f'Создано целей: {report["created"]}, ошибок: {len(report["errors"])}, '
+            f'{rows / elapsed if elapsed else rows:.0f} строк/с'
+        )
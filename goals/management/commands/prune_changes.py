@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from goals.models import Change
+
+
+class Command(BaseCommand):
+    help = 'Удаляет из журнала изменений записи старше срока хранения курсоров синхронизации'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.GOALS_SYNC_RETENTION_DAYS,
+            help='Срок хранения, не меньше GOALS_SYNC_RETENTION_DAYS',
+        )
+
+    def handle(self, *args, **options):
+        # курсоры старше GOALS_SYNC_RETENTION_DAYS отклоняются, записи для них больше не нужны
+        days = max(options['days'], settings.GOALS_SYNC_RETENTION_DAYS)
+        deleted, _ = Change.objects.filter(created__lt=timezone.now() - timedelta(days=days)).delete()
+        self.stdout.write(f'Удалено записей: {deleted}')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from goals.stats import rebuild_goal_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводную статистику целей и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', type=int, help='Только одна доска')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать расхождения')
+
+    def handle(self, *args, **options):
+        drift = rebuild_goal_stats(options['board'], options['dry_run'])
+        for line in drift:
+            self.stdout.write(line)
+        action = 'найдено' if options['dry_run'] else 'исправлено'
+        self.stdout.write(f'Расхождений {action}: {len(drift)}')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from goals.archive import rehydrate_goal
+from goals.models import ArchivedGoal, Goal
+
+
+class Command(BaseCommand):
+    help = 'Возвращает цель из архива в рабочие таблицы вместе с комментариями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('goal', type=int, help='Идентификатор цели')
+        parser.add_argument(
+            '--status',
+            type=int,
+            choices=Goal.Status.values,
+            default=Goal.Status.to_do,
+            help='Статус возвращенной цели, по умолчанию - к выполнению',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            goal = rehydrate_goal(options['goal'], options['status'])
+        except ArchivedGoal.DoesNotExist:
+            raise CommandError(f'Цель {options["goal"]} не найдена в архиве')
+        self.stdout.write(f'Цель {goal.pk} возвращена из архива, комментариев: {goal.comments_count}')
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.13 on 2026-10-18 04:18
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('goals', '0006_goal_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='boardparticipant',
+            index=models.Index(fields=['user', 'board'], include=('role',), name='participant_user_board_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='goal',
+            index=models.Index(condition=models.Q(('status', 4), _negated=True), fields=['category'], name='goal_active_category_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='goal',
+            index=models.Index(condition=models.Q(('status', 4), _negated=True), fields=['due_date'], name='goal_active_due_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='goalcategory',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['board'], name='category_active_board_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='goalcomment',
+            index=models.Index(fields=['goal', '-created'], name='comment_goal_created_idx'),
+        ),
+    ]
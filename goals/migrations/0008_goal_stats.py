@@ -0,0 +1,117 @@
+# Generated by Django 4.1.13 on 2026-10-18 04:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Открытые цели: status 1 (к выполнению) и 2 (в работе)
+GOAL_STATS_TRIGGER = '''
+CREATE FUNCTION goals_goal_stats_update() RETURNS trigger AS $$
+DECLARE
+    delta_sql text;
+BEGIN
+    delta_sql := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT category_id, status, priority, due_date, 1 AS delta FROM new_goals'
+        WHEN 'DELETE' THEN 'SELECT category_id, status, priority, due_date, -1 AS delta FROM old_goals'
+        ELSE 'SELECT category_id, status, priority, due_date, -1 AS delta FROM old_goals
+              UNION ALL SELECT category_id, status, priority, due_date, 1 FROM new_goals'
+    END;
+
+    EXECUTE format($sql$
+        WITH delta AS (%s)
+        INSERT INTO goals_goalstat AS stat (category_id, status, priority, count)
+        SELECT category_id, status, priority, sum(delta) FROM delta
+        GROUP BY category_id, status, priority
+        HAVING sum(delta) <> 0
+        ORDER BY category_id, status, priority
+        ON CONFLICT (category_id, status, priority) DO UPDATE SET count = stat.count + EXCLUDED.count
+    $sql$, delta_sql);
+
+    EXECUTE format($sql$
+        WITH delta AS (%s)
+        INSERT INTO goals_goalduestat AS stat (category_id, due_date, count)
+        SELECT category_id, due_date, sum(delta) FROM delta
+        WHERE status IN (1, 2) AND due_date IS NOT NULL
+        GROUP BY category_id, due_date
+        HAVING sum(delta) <> 0
+        ORDER BY category_id, due_date
+        ON CONFLICT (category_id, due_date) DO UPDATE SET count = stat.count + EXCLUDED.count
+    $sql$, delta_sql);
+
+    -- закрытые цели и прошедшие сроки не должны копить нулевые строки
+    EXECUTE format($sql$
+        WITH delta AS (%s)
+        DELETE FROM goals_goalduestat AS stat USING delta
+        WHERE stat.category_id = delta.category_id AND stat.due_date = delta.due_date AND stat.count = 0
+    $sql$, delta_sql);
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goal_stats_insert_trigger
+    AFTER INSERT ON goals_goal REFERENCING NEW TABLE AS new_goals
+    FOR EACH STATEMENT EXECUTE FUNCTION goals_goal_stats_update();
+
+CREATE TRIGGER goals_goal_stats_update_trigger
+    AFTER UPDATE ON goals_goal REFERENCING OLD TABLE AS old_goals NEW TABLE AS new_goals
+    FOR EACH STATEMENT EXECUTE FUNCTION goals_goal_stats_update();
+
+CREATE TRIGGER goals_goal_stats_delete_trigger
+    AFTER DELETE ON goals_goal REFERENCING OLD TABLE AS old_goals
+    FOR EACH STATEMENT EXECUTE FUNCTION goals_goal_stats_update();
+
+INSERT INTO goals_goalstat (category_id, status, priority, count)
+SELECT category_id, status, priority, count(*) FROM goals_goal GROUP BY category_id, status, priority;
+
+INSERT INTO goals_goalduestat (category_id, due_date, count)
+SELECT category_id, due_date, count(*) FROM goals_goal
+WHERE status IN (1, 2) AND due_date IS NOT NULL
+GROUP BY category_id, due_date;
+'''
+
+DROP_GOAL_STATS_TRIGGER = '''
+DROP TRIGGER IF EXISTS goals_goal_stats_insert_trigger ON goals_goal;
+DROP TRIGGER IF EXISTS goals_goal_stats_update_trigger ON goals_goal;
+DROP TRIGGER IF EXISTS goals_goal_stats_delete_trigger ON goals_goal;
+DROP FUNCTION IF EXISTS goals_goal_stats_update();
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoalStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'К выполнению'), (2, 'В работе'), (3, 'Выполнено'), (4, 'Архив')], verbose_name='Статус')),
+                ('priority', models.PositiveSmallIntegerField(choices=[(1, 'Низкий'), (2, 'Средний'), (3, 'Высокий'), (4, 'Критический')], verbose_name='Приоритет')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goal_stats', to='goals.goalcategory')),
+            ],
+            options={
+                'verbose_name': 'Статистика целей',
+                'verbose_name_plural': 'Статистика целей',
+                'unique_together': {('category', 'status', 'priority')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GoalDueStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_date', models.DateField(verbose_name='Срок выполнения')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goal_due_stats', to='goals.goalcategory')),
+            ],
+            options={
+                'verbose_name': 'Сроки целей',
+                'verbose_name_plural': 'Сроки целей',
+                'unique_together': {('category', 'due_date')},
+            },
+        ),
+        migrations.RunSQL(GOAL_STATS_TRIGGER, DROP_GOAL_STATS_TRIGGER),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.13 on 2026-10-18 04:37
+
+from django.db import migrations, models
+
+# Начальные значения счетчиков; status 4 - архив
+BACKFILL_COUNTERS = '''
+UPDATE goals_goalcategory AS category SET active_goals_count = goals.count
+FROM (SELECT category_id, count(*) AS count FROM goals_goal WHERE status <> 4 GROUP BY category_id) AS goals
+WHERE category.id = goals.category_id;
+
+UPDATE goals_goal AS goal SET comments_count = comments.count
+FROM (SELECT goal_id, count(*) AS count FROM goals_goalcomment GROUP BY goal_id) AS comments
+WHERE goal.id = comments.goal_id;
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0008_goal_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='comments_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.AddField(
+            model_name='goalcategory',
+            name='active_goals_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Активных целей'),
+        ),
+        migrations.RunSQL(BACKFILL_COUNTERS, migrations.RunSQL.noop),
+    ]
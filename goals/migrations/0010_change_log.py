@@ -0,0 +1,101 @@
+# Generated by Django 4.1.13 on 2026-10-18 04:41
+
+from django.db import migrations, models
+
+# Аргументы триггера: сущность, доска, пользователь участника, соединения для поиска доски.
+# При изменении строки пишутся и старая, и новая доска, чтобы перенос цели был виден на обеих.
+CHANGE_LOG_FUNCTION = '''
+CREATE FUNCTION goals_change_log() RETURNS trigger AS $$
+DECLARE
+    rows_sql text;
+    action int;
+BEGIN
+    rows_sql := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT * FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT * FROM old_rows'
+        ELSE 'SELECT * FROM new_rows UNION ALL SELECT * FROM old_rows'
+    END;
+    action := CASE TG_OP WHEN 'INSERT' THEN 1 WHEN 'UPDATE' THEN 2 ELSE 3 END;
+
+    EXECUTE format($sql$
+        INSERT INTO goals_change (xid, entity, action, object_id, board_id, user_id, created)
+        SELECT DISTINCT pg_current_xact_id()::text::bigint, %s, %s, t.id, %s, %s, statement_timestamp()
+        FROM (%s) AS t %s
+    $sql$, TG_ARGV[0], action, TG_ARGV[1], TG_ARGV[2], rows_sql, TG_ARGV[3]);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+CHANGE_LOG_TABLES = (
+    ('goals_board', (1, 't.id', 'NULL::bigint', '')),
+    ('goals_boardparticipant', (2, 't.board_id', 't.user_id', '')),
+    ('goals_goalcategory', (3, 't.board_id', 'NULL::bigint', '')),
+    ('goals_goal', (4, 'c.board_id', 'NULL::bigint', 'JOIN goals_goalcategory AS c ON c.id = t.category_id')),
+    ('goals_goalcomment', (5, 'c.board_id', 'NULL::bigint', (
+        'JOIN goals_goal AS g ON g.id = t.goal_id JOIN goals_goalcategory AS c ON c.id = g.category_id'
+    ))),
+)
+
+CHANGE_LOG_REFERENCING = {
+    'INSERT': 'NEW TABLE AS new_rows',
+    'UPDATE': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'DELETE': 'OLD TABLE AS old_rows',
+}
+
+
+def change_log_triggers() -> str:
+    statements = [CHANGE_LOG_FUNCTION]
+    for table, args in CHANGE_LOG_TABLES:
+        arguments = ', '.join(f"'{arg}'" for arg in args)
+        for operation, referencing in CHANGE_LOG_REFERENCING.items():
+            statements.append(
+                f'CREATE TRIGGER {table}_change_{operation.lower()} AFTER {operation} ON {table} '
+                f'REFERENCING {referencing} FOR EACH STATEMENT EXECUTE FUNCTION goals_change_log({arguments});'
+            )
+    return '\n'.join(statements)
+
+
+def drop_change_log_triggers() -> str:
+    statements = [
+        f'DROP TRIGGER {table}_change_{operation.lower()} ON {table};'
+        for table, _ in CHANGE_LOG_TABLES for operation in CHANGE_LOG_REFERENCING
+    ]
+    statements.append('DROP FUNCTION goals_change_log();')
+    return '\n'.join(statements)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0009_goal_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('xid', models.BigIntegerField(verbose_name='Транзакция')),
+                ('entity', models.PositiveSmallIntegerField(choices=[(1, 'Доска'), (2, 'Участник'), (3, 'Категория'), (4, 'Цель'), (5, 'Комментарий')], verbose_name='Сущность')),
+                ('action', models.PositiveSmallIntegerField(choices=[(1, 'Создание'), (2, 'Изменение'), (3, 'Удаление')], verbose_name='Действие')),
+                ('object_id', models.BigIntegerField(verbose_name='Объект')),
+                ('board_id', models.BigIntegerField(verbose_name='Доска')),
+                ('user_id', models.BigIntegerField(null=True, verbose_name='Пользователь участника')),
+                ('created', models.DateTimeField(verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Изменения',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['xid', 'id'], name='change_xid_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['created'], name='change_created_idx'),
+        ),
+        migrations.RunSQL(change_log_triggers(), drop_change_log_triggers()),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.13 on 2026-10-18 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0011_goal_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['board_id', 'xid', 'id'], name='change_board_xid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(condition=models.Q(('entity', 2)), fields=['user_id', 'xid', 'id'], name='change_participant_xid_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+from importlib import import_module
+
+from django.db import migrations
+
+# Триггер с таблицами переходов нельзя ограничить списком столбцов (UPDATE OF), поэтому UPDATE
+# без изменения category_id, status, priority и due_date (название, счетчик комментариев)
+# завершается одной проверкой, а в дельту попадают только измененные строки
+GOAL_STATS_FUNCTION = '''
+CREATE OR REPLACE FUNCTION goals_goal_stats_update() RETURNS trigger AS $$
+DECLARE
+    delta_sql text;
+BEGIN
+    -- вложенный IF: old_goals есть только у UPDATE, а условие разбирается целиком
+    IF TG_OP = 'UPDATE' THEN
+        IF NOT EXISTS (
+            SELECT FROM old_goals o JOIN new_goals n USING (id)
+            WHERE (o.category_id, o.status, o.priority, o.due_date)
+                IS DISTINCT FROM (n.category_id, n.status, n.priority, n.due_date)
+        ) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    delta_sql := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT category_id, status, priority, due_date, 1 AS delta FROM new_goals'
+        WHEN 'DELETE' THEN 'SELECT category_id, status, priority, due_date, -1 AS delta FROM old_goals'
+        ELSE 'WITH changed AS (
+                  SELECT o.category_id AS old_category_id, o.status AS old_status, o.priority AS old_priority,
+                         o.due_date AS old_due_date, n.category_id, n.status, n.priority, n.due_date
+                  FROM old_goals o JOIN new_goals n USING (id)
+                  WHERE (o.category_id, o.status, o.priority, o.due_date)
+                      IS DISTINCT FROM (n.category_id, n.status, n.priority, n.due_date)
+              )
+              SELECT old_category_id, old_status, old_priority, old_due_date, -1 AS delta FROM changed
+              UNION ALL SELECT category_id, status, priority, due_date, 1 FROM changed'
+    END;
+
+    EXECUTE format($sql$
+        WITH delta (category_id, status, priority, due_date, delta) AS (%s)
+        INSERT INTO goals_goalstat AS stat (category_id, status, priority, count)
+        SELECT category_id, status, priority, sum(delta) FROM delta
+        GROUP BY category_id, status, priority
+        HAVING sum(delta) <> 0
+        ORDER BY category_id, status, priority
+        ON CONFLICT (category_id, status, priority) DO UPDATE SET count = stat.count + EXCLUDED.count
+    $sql$, delta_sql);
+
+    EXECUTE format($sql$
+        WITH delta (category_id, status, priority, due_date, delta) AS (%s)
+        INSERT INTO goals_goalduestat AS stat (category_id, due_date, count)
+        SELECT category_id, due_date, sum(delta) FROM delta
+        WHERE status IN (1, 2) AND due_date IS NOT NULL
+        GROUP BY category_id, due_date
+        HAVING sum(delta) <> 0
+        ORDER BY category_id, due_date
+        ON CONFLICT (category_id, due_date) DO UPDATE SET count = stat.count + EXCLUDED.count
+    $sql$, delta_sql);
+
+    -- закрытые цели и прошедшие сроки не должны копить нулевые строки
+    EXECUTE format($sql$
+        WITH delta (category_id, status, priority, due_date, delta) AS (%s)
+        DELETE FROM goals_goalduestat AS stat USING delta
+        WHERE stat.category_id = delta.category_id AND stat.due_date = delta.due_date AND stat.count = 0
+    $sql$, delta_sql);
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+
+def previous_function() -> str:
+    trigger_sql = import_module('goals.migrations.0008_goal_stats').GOAL_STATS_TRIGGER
+    return trigger_sql.split('CREATE TRIGGER')[0].replace('CREATE FUNCTION', 'CREATE OR REPLACE FUNCTION')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0012_change_board_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(GOAL_STATS_FUNCTION, previous_function()),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.13 on 2026-10-18 06:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0014_drop_covered_fk_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='active_goal',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to='goals.goal', verbose_name='Рабочая цель'),
+        ),
+        migrations.AlterField(
+            model_name='archivedcomment',
+            name='goal',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='goals.archivedgoal', verbose_name='Цель'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcomment',
+            index=models.Index(fields=['active_goal', '-created'], name='archived_comment_active_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='archivedcomment',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('active_goal__isnull', True), ('goal__isnull', False)), models.Q(('active_goal__isnull', False), ('goal__isnull', True)), _connector='OR'), name='archived_comment_one_goal'),
+        ),
+    ]
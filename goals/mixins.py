@@ -0,0 +1,236 @@
+import hashlib
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from rest_framework.response import Response
+
+from core.replicas import reading_replica
+from goals.cache import count_list_cache, get_board_versions, list_cache_key
+from goals.roles import get_board_roles
+
+
+class ConditionalGetMixin:
+    """
+    Условный GET (ETag / If-None-Match).
+
+    Валидаторы считаются одним агрегатным запросом max(updated) и count по тем же queryset,
+    что и ответ, поэтому неизмененный ответ возвращается как 304 без сериализации.
+    Количество строк учитывает удаление и потерю доступа, которые не меняют max(updated),
+    а версии досок пользователя - записи без правки updated, например счетчики комментариев и участники.
+    Last-Modified не отдается: по max(updated) он не меняется после удаления, и клиент с одним
+    If-Modified-Since получил бы 304 на устаревшие данные.
+    """
+
+    def get_validator_queryset(self):
+        return self.filter_queryset(self.get_queryset()).order_by()
+
+    def get_validator_aggregates(self) -> dict:
+        return {'last_modified': Max('updated'), 'count': Count('pk')}
+
+    def get_validators(self) -> dict:
+        """
+        Возвращает {'last_modified': datetime | None, 'count': int, 'boards': str}
+        """
+        validators = self.get_validator_queryset().aggregate(**self.get_validator_aggregates())
+        validators['boards'] = self.get_board_state()
+        return validators
+
+    async def aget_validators(self) -> dict:
+        queryset = await sync_to_async(self.get_validator_queryset)()
+        validators = await queryset.aaggregate(**self.get_validator_aggregates())
+        validators['boards'] = await sync_to_async(self.get_board_state)()
+        return validators
+
+    def get_board_state(self) -> str:
+        """
+        Доски пользователя с ролями и версиями
+        """
+        roles = get_board_roles(self.request).roles
+        versions = get_board_versions(roles)
+        return ','.join(f'{board_id}:{roles[board_id]}:{versions[board_id]}' for board_id in sorted(roles))
+
+    def get_etag(self, validators: dict) -> str:
+        last_modified = validators['last_modified']
+        key = ':'.join((
+            type(self).__name__,
+            str(self.request.user.id),
+            self.request.get_full_path(),
+            str(validators['count']),
+            validators['boards'],
+            last_modified.isoformat() if last_modified else '',
+        ))
+        return 'W/' + quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(self.get_validators())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return self.add_conditions(response, etag)
+
+    async def aget(self, request, *args, **kwargs):
+        etag = self.get_etag(await self.aget_validators())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await super().aget(request, *args, **kwargs)
+        return self.add_conditions(response, etag)
+
+    @staticmethod
+    def add_conditions(response, etag: str):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class BoardVersionCacheMixin:
+    """
+    Кеш ответов списков.
+
+    Ключ строится из досок пользователя с его ролями, текущих версий этих досок и нормализованных
+    параметров запроса, поэтому участники с одинаковыми правами делят записи. Любая запись на доске
+    увеличивает ее версию (goals.signals), старые записи просто перестают читаться и истекают по таймауту.
+    """
+    list_cache_name: str = ''
+
+    def get_list_cache_key(self) -> str:
+        roles = get_board_roles(self.request).roles
+        query = urlencode(sorted(self.request.query_params.lists()), doseq=True)
+        params = f'{self.request.build_absolute_uri(self.request.path)}?{query}'
+        return list_cache_key(self.list_cache_name, roles, get_board_versions(roles), params)
+
+    def list(self, request, *args, **kwargs):
+        response = self.get_cached_response()
+        if response is None:
+            response = self.cache_response(super().list(request, *args, **kwargs))
+        return response
+
+    async def alist(self, request, *args, **kwargs):
+        response = await sync_to_async(self.get_cached_response)()
+        if response is None:
+            response = await sync_to_async(self.cache_response)(await super().alist(request, *args, **kwargs))
+        return response
+
+    def get_cached_response(self) -> Response | None:
+        self.list_cache_key = self.get_list_cache_key()
+        data = cache.get(self.list_cache_key)
+        if data is None:
+            count_list_cache(self.list_cache_name, 'misses')
+            return None
+        count_list_cache(self.list_cache_name, 'hits')
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def cache_response(self, response: Response) -> Response:
+        timeout = settings.GOALS_LIST_CACHE_TIMEOUT
+        if reading_replica():
+            # ответ с реплики может отставать от версии доски, под которой сохраняется
+            timeout = min(timeout, settings.DATABASE_REPLICA_MAX_LAG)
+        cache.set(self.list_cache_key, response.data, timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class AsyncReadMixin:
+    """
+    Асинхронный GET для представлений DRF под ASGI.
+
+    Запросы чтения идут через асинхронный ORM и не занимают поток воркера на время ответа базы.
+    Аутентификация, проверка прав, фильтры и кеш синхронные и выполняются через sync_to_async,
+    остальные методы обслуживает обычный синхронный dispatch DRF.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        sync_view = super().as_view(**initkwargs)
+        run_sync = sync_to_async(sync_view)
+
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await run_sync(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.setup(request, *args, **kwargs)
+            return await self.adispatch(request, *args, **kwargs)
+
+        # атрибуты представления DRF (cls, initkwargs, csrf_exempt) без обертки csrf_exempt:
+        # в Django 4.1 она синхронная и скрыла бы корутину от обработчика запросов
+        view.__dict__.update({key: value for key, value in sync_view.__dict__.items() if key != '__wrapped__'})
+        view.__doc__ = sync_view.__doc__
+        view.__module__ = sync_view.__module__
+        return view
+
+    async def adispatch(self, request, *args, **kwargs):
+        """
+        dispatch DRF с асинхронным обработчиком aget
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await self.aget(request, *args, **kwargs)
+        except Exception as exc:
+            response = await sync_to_async(self.handle_exception)(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        if hasattr(self.paginator, 'apaginate_queryset'):
+            return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+        return await sync_to_async(self.paginator.paginate_queryset)(queryset, self.request, view=self)
+
+
+class AsyncListMixin(AsyncReadMixin):
+    """
+    Асинхронный list
+    """
+
+    async def aget(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        # FilterSet проверяет значения фильтров запросами к базе
+        queryset = await sync_to_async(self.filter_queryset)(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer([obj async for obj in queryset], many=True).data)
+
+
+class AsyncRetrieveMixin(AsyncReadMixin):
+    """
+    Асинхронный retrieve
+    """
+
+    async def aget(self, request, *args, **kwargs):
+        return await self.aretrieve(request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(await self.aget_object()).data)
+
+    async def aget_object(self):
+        """
+        get_object через асинхронный ORM, с теми же 404 и проверкой прав на объект
+        """
+        queryset = await sync_to_async(self.filter_queryset)(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        await sync_to_async(self.check_object_permissions)(self.request, obj)
+        return obj
@@ -1,8 +1,84 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Exists, OuterRef
 
 from core.models import User
 
 
+def participant_exists(user: User | int | None, min_role: int | None, board_ref: str) -> Exists:
+    """
+    Полусоединение EXISTS с участниками доски: без размножения строк и без DISTINCT.
+    Роли упорядочены по убыванию прав (владелец = 1), поэтому min_role пропускает роли не ниже указанной,
+    по умолчанию - любого участника.
+    """
+    return Exists(BoardParticipant.objects.filter(
+        board_id=OuterRef(board_ref),
+        user_id=getattr(user, 'pk', user),
+        role__lte=min_role or BoardParticipant.Role.reader,
+    ))
+
+
+class BoardQuerySet(models.QuerySet):
+    """
+    Доски
+    """
+
+    def visible_to(self, user: User | int | None, min_role: int | None = None, deleted: bool = False):
+        """
+        Доски, где пользователь участник с ролью не ниже min_role
+        """
+        return self.filter(participant_exists(user, min_role, 'pk'), is_deleted=deleted)
+
+
+class GoalCategoryQuerySet(models.QuerySet):
+    """
+    Категории
+    """
+
+    def visible_to(self, user: User | int | None, min_role: int | None = None, deleted: bool = False):
+        """
+        Категории неудаленных досок, где пользователь участник с ролью не ниже min_role
+        """
+        return self.filter(
+            participant_exists(user, min_role, 'board_id'),
+            is_deleted=deleted,
+            board__is_deleted=False,
+        )
+
+
+class GoalQuerySet(models.QuerySet):
+    """
+    Цели
+    """
+
+    def visible_to(self, user: User | int | None, min_role: int | None = None):
+        """
+        Цели неудаленных категорий и досок, где пользователь участник с ролью не ниже min_role
+        """
+        return self.filter(
+            participant_exists(user, min_role, 'category__board_id'),
+            category__is_deleted=False,
+            category__board__is_deleted=False,
+        )
+
+
+class GoalCommentQuerySet(models.QuerySet):
+    """
+    Комментарии
+    """
+
+    def visible_to(self, user: User | int | None, min_role: int | None = None):
+        """
+        Комментарии к целям неудаленных категорий и досок, где пользователь участник с ролью не ниже min_role
+        """
+        return self.filter(
+            participant_exists(user, min_role, 'goal__category__board_id'),
+            goal__category__is_deleted=False,
+            goal__category__board__is_deleted=False,
+        )
+
+
 class DatesModelMixin(models.Model):
     """
     Миксин для моделей с полями даты
@@ -14,6 +90,18 @@ class DatesModelMixin(models.Model):
         abstract = True
 
 
+class CountersModelMixin:
+    """
+    Миксин для моделей со счетчиками, которые меняются только через update() с F().
+    Счетчики исключаются из UPDATE при сохранении экземпляра, чтобы не затереть их устаревшим значением.
+    """
+    counter_fields: tuple[str, ...] = ()
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        values = [value for value in values if value[0].name not in self.counter_fields]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+
 class Board(DatesModelMixin):
     """
     Модель доски
@@ -21,7 +109,7 @@ class Board(DatesModelMixin):
     title = models.CharField(verbose_name='Название', max_length=255)
     is_deleted = models.BooleanField(verbose_name='Удалена', default=False)
 
-    objects = models.Manager()
+    objects = BoardQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Доска'
@@ -47,11 +135,13 @@ class BoardParticipant(DatesModelMixin):
         verbose_name='Доска',
         related_name='participants',
     )
+    # индекс по пользователю покрывает participant_user_board_idx
     user = models.ForeignKey(
         User,
         on_delete=models.PROTECT,
         verbose_name='Пользователь',
         related_name='participants',
+        db_index=False,
     )
     role = models.PositiveSmallIntegerField(
         verbose_name='Роль',
@@ -65,12 +155,15 @@ class BoardParticipant(DatesModelMixin):
         unique_together = ('board', 'user')
         verbose_name = 'Участник'
         verbose_name_plural = 'Участники'
+        indexes = (
+            models.Index(fields=('user', 'board'), include=('role',), name='participant_user_board_idx'),
+        )
 
     def __str__(self):
         return self.user
 
 
-class GoalCategory(DatesModelMixin):
+class GoalCategory(CountersModelMixin, DatesModelMixin):
     """
     Модель категории
     """
@@ -83,18 +176,24 @@ class GoalCategory(DatesModelMixin):
         on_delete=models.PROTECT,
         related_name='categories',
     )
+    active_goals_count = models.IntegerField(default=0, editable=False, verbose_name='Активных целей')
 
-    objects = models.Manager()
+    counter_fields = ('active_goals_count',)
+
+    objects = GoalCategoryQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Категория'
         verbose_name_plural = 'Категории'
+        indexes = (
+            models.Index(fields=('board',), condition=models.Q(is_deleted=False), name='category_active_board_idx'),
+        )
 
     def __str__(self):
         return self.title
 
 
-class Goal(DatesModelMixin):
+class Goal(CountersModelMixin, DatesModelMixin):
     """
     Модель цели
     """
@@ -132,30 +231,251 @@ class Goal(DatesModelMixin):
     )
     due_date = models.DateField(verbose_name='Срок выполнения', null=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name='Автор', related_name='goals')
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name='Поисковый вектор')
+    comments_count = models.IntegerField(default=0, editable=False, verbose_name='Комментариев')
 
-    objects = models.Manager()
+    counter_fields = ('comments_count',)
+
+    objects = GoalQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Цель'
         verbose_name_plural = 'Цели'
+        indexes = (
+            models.Index(fields=('title', 'id'), name='goal_title_id_idx'),
+            models.Index(fields=('created', 'id'), name='goal_created_id_idx'),
+            GinIndex(fields=('search_vector',), name='goal_search_vector_idx'),
+            # status=4 - Goal.Status.archived, архивные цели не попадают в списки
+            models.Index(fields=('category',), condition=~models.Q(status=4), name='goal_active_category_idx'),
+            models.Index(fields=('due_date',), condition=~models.Q(status=4), name='goal_active_due_date_idx'),
+        )
 
     def __str__(self):
         return self.title
 
 
+class GoalStat(models.Model):
+    """
+    Количество целей категории по статусу и приоритету.
+    Поддерживается триггером goals_goal_stats_trigger (миграция 0008) при любых изменениях целей,
+    включая update() и bulk_create. Расхождения исправляет команда rebuild_goal_stats.
+    """
+    category = models.ForeignKey(GoalCategory, on_delete=models.CASCADE, related_name='goal_stats')
+    status = models.PositiveSmallIntegerField(verbose_name='Статус', choices=Goal.Status.choices)
+    priority = models.PositiveSmallIntegerField(verbose_name='Приоритет', choices=Goal.Priority.choices)
+    count = models.IntegerField(verbose_name='Количество', default=0)
+
+    objects = models.Manager()
+
+    class Meta:
+        unique_together = ('category', 'status', 'priority')
+        verbose_name = 'Статистика целей'
+        verbose_name_plural = 'Статистика целей'
+
+
+class GoalDueStat(models.Model):
+    """
+    Количество открытых целей (к выполнению и в работе) категории по сроку выполнения.
+    Просроченные цели - сумма по срокам раньше текущей даты. Поддерживается тем же триггером.
+    """
+    category = models.ForeignKey(GoalCategory, on_delete=models.CASCADE, related_name='goal_due_stats')
+    due_date = models.DateField(verbose_name='Срок выполнения')
+    count = models.IntegerField(verbose_name='Количество', default=0)
+
+    objects = models.Manager()
+
+    class Meta:
+        unique_together = ('category', 'due_date')
+        verbose_name = 'Сроки целей'
+        verbose_name_plural = 'Сроки целей'
+
+
 class GoalComment(DatesModelMixin):
     """
     Модель комментариев
     """
-    goal = models.ForeignKey(Goal, on_delete=models.CASCADE, verbose_name='Цель', related_name='comments')
+    # индекс по цели покрывает comment_goal_created_idx
+    goal = models.ForeignKey(
+        Goal, on_delete=models.CASCADE, verbose_name='Цель', related_name='comments', db_index=False,
+    )
     text = models.TextField(verbose_name='Комментарий')
     user = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name='Автор', related_name='comments')
 
-    objects = models.Manager()
+    objects = GoalCommentQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(fields=('goal', '-created'), name='comment_goal_created_idx'),
+        )
+
+    def __str__(self):
+        return self.text
+
+
+class ArchivedGoalQuerySet(models.QuerySet):
+    """
+    Цели в архиве
+    """
+
+    def visible_to(self, user: User | int | None, min_role: int | None = None):
+        """
+        Архивные цели неудаленных категорий и досок, где пользователь участник с ролью не ниже min_role
+        """
+        return self.filter(
+            participant_exists(user, min_role, 'category__board_id'),
+            category__is_deleted=False,
+            category__board__is_deleted=False,
+        )
+
+
+class ArchivedCommentQuerySet(models.QuerySet):
+    """
+    Комментарии в архиве
+    """
+
+    def visible_to(self, user: User | int | None, min_role: int | None = None):
+        """
+        Комментарии архивных и рабочих целей неудаленных категорий и досок, где пользователь участник с ролью
+        не ниже min_role
+        """
+        return self.filter(
+            models.Q(
+                participant_exists(user, min_role, 'goal__category__board_id'),
+                goal__category__is_deleted=False,
+                goal__category__board__is_deleted=False,
+            ) | models.Q(
+                participant_exists(user, min_role, 'active_goal__category__board_id'),
+                active_goal__category__is_deleted=False,
+                active_goal__category__board__is_deleted=False,
+            ),
+        )
+
+
+class ArchivedGoal(models.Model):
+    """
+    Цель в архиве (холодное хранилище).
+    Архивные цели, не менявшиеся дольше GOALS_ARCHIVE_AFTER_DAYS, переносятся сюда из goals_goal
+    командой archive_goals с прежними id и датами и возвращаются командой rehydrate_goal.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID')
+    title = models.CharField(verbose_name='Название', max_length=255)
+    description = models.TextField(verbose_name='Описание', null=True, blank=True)
+    # индекс по категории покрывает archived_goal_category_idx
+    category = models.ForeignKey(
+        GoalCategory, on_delete=models.PROTECT, verbose_name='Категория', related_name='archived_goals', db_index=False,
+    )
+    priority = models.PositiveSmallIntegerField(verbose_name='Приоритет', choices=Goal.Priority.choices)
+    due_date = models.DateField(verbose_name='Срок выполнения', null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name='Автор', related_name='archived_goals')
+    comments_count = models.IntegerField(default=0, verbose_name='Комментариев')
+    created = models.DateTimeField(verbose_name='Дата создания')
+    updated = models.DateTimeField(verbose_name='Дата последнего обновления')
+    archived = models.DateTimeField(verbose_name='Дата переноса в архив')
+
+    objects = ArchivedGoalQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Цель в архиве'
+        verbose_name_plural = 'Цели в архиве'
+        indexes = (
+            models.Index(fields=('category', '-archived'), name='archived_goal_category_idx'),
+        )
+
+    def __str__(self):
+        return self.title
+
+
+class ArchivedComment(models.Model):
+    """
+    Комментарий в архиве: комментарий архивной цели (goal) переносится и возвращается вместе с ней,
+    старый комментарий рабочей цели (active_goal) переносится отдельно и остается в ее comments_count.
+    При переносе цели в архив ее старые комментарии переходят из active_goal в goal.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID')
+    goal = models.ForeignKey(
+        ArchivedGoal, on_delete=models.CASCADE, verbose_name='Цель', related_name='comments', db_index=False,
+        null=True, blank=True,
+    )
+    # индексы по целям покрывают archived_comment_goal_idx и archived_comment_active_idx
+    active_goal = models.ForeignKey(
+        Goal, on_delete=models.CASCADE, verbose_name='Рабочая цель', related_name='archived_comments',
+        db_index=False, null=True, blank=True,
+    )
+    text = models.TextField(verbose_name='Комментарий')
+    user = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name='Автор', related_name='archived_comments')
+    created = models.DateTimeField(verbose_name='Дата создания')
+    updated = models.DateTimeField(verbose_name='Дата последнего обновления')
+
+    objects = ArchivedCommentQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Комментарий в архиве'
+        verbose_name_plural = 'Комментарии в архиве'
+        indexes = (
+            models.Index(fields=('goal', '-created'), name='archived_comment_goal_idx'),
+            models.Index(fields=('active_goal', '-created'), name='archived_comment_active_idx'),
+        )
+        constraints = (
+            models.CheckConstraint(
+                check=models.Q(goal__isnull=False, active_goal__isnull=True)
+                | models.Q(goal__isnull=True, active_goal__isnull=False),
+                name='archived_comment_one_goal',
+            ),
+        )
 
     def __str__(self):
         return self.text
+
+
+class Change(models.Model):
+    """
+    Журнал изменений досок для синхронизации клиентов.
+    Пишется триггером goals_change_log (миграция 0010) при любых изменениях досок, участников, категорий,
+    целей и комментариев, включая update(), bulk_create и удаление. Строки упорядочены по (xid, id),
+    где xid - номер транзакции, записавшей изменение.
+    """
+
+    class Entity(models.IntegerChoices):
+        """
+        Сущность
+        """
+        board = 1, 'Доска'
+        participant = 2, 'Участник'
+        category = 3, 'Категория'
+        goal = 4, 'Цель'
+        comment = 5, 'Комментарий'
+
+    class Action(models.IntegerChoices):
+        """
+        Действие
+        """
+        insert = 1, 'Создание'
+        update = 2, 'Изменение'
+        delete = 3, 'Удаление'
+
+    xid = models.BigIntegerField(verbose_name='Транзакция')
+    entity = models.PositiveSmallIntegerField(verbose_name='Сущность', choices=Entity.choices)
+    action = models.PositiveSmallIntegerField(verbose_name='Действие', choices=Action.choices)
+    object_id = models.BigIntegerField(verbose_name='Объект')
+    # без внешних ключей: запись об удалении переживает сам объект
+    board_id = models.BigIntegerField(verbose_name='Доска')
+    user_id = models.BigIntegerField(verbose_name='Пользователь участника', null=True)
+    created = models.DateTimeField(verbose_name='Дата изменения')
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Изменения'
+        # синхронизация читает изменения своих досок и свое участие (entity=2) после курсора:
+        # у каждой ветви OR свой индекс, поэтому чтение не зависит от объема изменений на чужих досках
+        indexes = (
+            models.Index(fields=('xid', 'id'), name='change_xid_id_idx'),
+            models.Index(fields=('board_id', 'xid', 'id'), name='change_board_xid_idx'),
+            models.Index(
+                fields=('user_id', 'xid', 'id'), name='change_participant_xid_idx', condition=models.Q(entity=2),
+            ),
+            models.Index(fields=('created',), name='change_created_idx'),
+        )
@@ -0,0 +1,189 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from datetime import date
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (keyset) без COUNT(*) и OFFSET.
+
+    Позиция страницы хранится в непрозрачном курсоре: значения полей сортировки
+    и id граничной записи. Следующая страница выбирается условием по этим значениям,
+    поэтому время ответа не зависит от глубины страницы.
+    Первая страница запрашивается с пустым курсором: ?cursor=
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 50
+    max_page_size = 1000
+    tiebreaker = 'id'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, cursor = self.get_page_queryset(queryset, request, view)
+        return self.set_page(list(queryset), cursor)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset, cursor = self.get_page_queryset(queryset, request, view)
+        return self.set_page([obj async for obj in queryset], cursor)
+
+    def get_page_queryset(self, queryset, request, view):
+        """
+        Запрос страницы (на одну запись больше размера страницы) и разобранный курсор
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+        ordering = [self._invert(field) for field in self.ordering] if reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if cursor:
+            try:
+                queryset = queryset.filter(self._position_filter(ordering, cursor['p']))
+            except (TypeError, ValueError, ValidationError):
+                # значения позиции подменены: не того типа, null или неразбираемая дата
+                raise NotFound(self.invalid_cursor_message)
+        return queryset[:self.page_size + 1], cursor
+
+    def set_page(self, results: list, cursor: dict | None) -> list:
+        reverse = bool(cursor and cursor['r'])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request) -> int:
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, request, queryset, view) -> list[str]:
+        """
+        Сортировка берется у OrderingFilter представления, к ней добавляется id,
+        чтобы позиция в выборке была однозначной.
+        """
+        ordering = None
+        for backend in getattr(view, 'filter_backends', ()):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        ordering = [field for field in ordering or getattr(view, 'ordering', None) or ()
+                    if field.lstrip('-') not in (self.tiebreaker, 'pk')]
+        descending = bool(ordering) and ordering[-1].startswith('-')
+        return ordering + [f'-{self.tiebreaker}' if descending else self.tiebreaker]
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> str | None:
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse: bool) -> str:
+        position = []
+        for field in self.ordering:
+            value = attrgetter(field.lstrip('-').replace('__', '.'))(obj)
+            position.append(value.isoformat() if isinstance(value, date) else value)
+        payload = json.dumps({'o': self.ordering, 'p': position, 'r': reverse}, separators=(',', ':'))
+        cursor = urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request) -> dict | None:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            if cursor['o'] != self.ordering or len(cursor['p']) != len(self.ordering):
+                raise ValueError
+            cursor['r'] = bool(cursor['r'])
+        except (BinasciiError, KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    @staticmethod
+    def _invert(field: str) -> str:
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _position_filter(ordering: list[str], position: list) -> Q:
+        """
+        Условие "строго после позиции" для составного ключа сортировки:
+        (a > x) OR (a = x AND b > y) OR ...
+        Первое поле дополнительно ограничено диапазоном, чтобы планировщик выбрал index range scan.
+        """
+        fields = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        first, first_desc = fields[0]
+        condition = Q()
+        for index, (name, descending) in enumerate(fields):
+            step = Q(**{f'{name}__{"lt" if descending else "gt"}': position[index]})
+            for prev_index in range(index):
+                step &= Q(**{fields[prev_index][0]: position[prev_index]})
+            condition |= step
+        return Q(**{f'{first}__{"lte" if first_desc else "gte"}': position[0]}) & condition
+
+
+class LimitOffsetPagination(pagination.LimitOffsetPagination):
+    """
+    Пагинация limit/offset DRF с асинхронным вариантом для асинхронных представлений
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        self.request = request
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [obj async for obj in queryset[self.offset:self.offset + self.limit]]
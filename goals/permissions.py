@@ -1,6 +1,7 @@
 from rest_framework import permissions
 
-from goals.models import BoardParticipant, GoalCategory, Board, Goal, GoalComment
+from goals.models import GoalCategory, Board, Goal, GoalComment
+from goals.roles import get_board_roles
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -16,33 +17,30 @@ class BoardPermissions(permissions.IsAuthenticated):
     message = 'Вы не являетесь владельцем доски'
 
     def has_object_permission(self, request, view, obj: Board):
-        _filters: dict = {'user': request.user, 'board': obj}
-        if request.method not in permissions.SAFE_METHODS:
-            _filters['role__in'] = [BoardParticipant.Role.owner]
-
-        return BoardParticipant.objects.filter(**_filters).exists()
+        board_roles = get_board_roles(request)
+        if request.method in permissions.SAFE_METHODS:
+            return board_roles.can_read(obj.id)
+        return board_roles.is_owner(obj.id)
 
 
 class GoalCategoryPermissions(permissions.IsAuthenticated):
     message = 'Недостаточно прав'
 
     def has_object_permission(self, request, view, obj: GoalCategory):
-        _filters: dict = {'user_id': request.user.id, 'board_id': obj.board_id}
-        if request.method not in permissions.SAFE_METHODS:
-            _filters['role__in'] = [BoardParticipant.Role.owner, BoardParticipant.Role.writer]
-
-        return BoardParticipant.objects.filter(**_filters).exists()
+        board_roles = get_board_roles(request)
+        if request.method in permissions.SAFE_METHODS:
+            return board_roles.can_read(obj.board_id)
+        return board_roles.can_write(obj.board_id)
 
 
 class GoalPermissions(permissions.IsAuthenticated):
     message = 'Недостаточно прав'
 
     def has_object_permission(self, request, view, obj: Goal):
-        _filters: dict = {'user_id': request.user.id, 'board_id': obj.category.board_id}
-        if request.method not in permissions.SAFE_METHODS:
-            _filters['role__in'] = [BoardParticipant.Role.owner, BoardParticipant.Role.writer]
-
-        return BoardParticipant.objects.filter(**_filters).exists()
+        board_roles = get_board_roles(request)
+        if request.method in permissions.SAFE_METHODS:
+            return board_roles.can_read(obj.category.board_id)
+        return board_roles.can_write(obj.category.board_id)
 
 
 class CommentsPermissions(permissions.IsAuthenticated):
@@ -51,5 +49,5 @@ class CommentsPermissions(permissions.IsAuthenticated):
     def has_object_permission(self, request, view, obj: GoalComment):
         return any((
             request.method in permissions.SAFE_METHODS,
-            obj.user.id == request.user.id
+            obj.user_id == request.user.id
         ))
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+from functools import lru_cache
+from typing import Iterable
+
+import psycopg2
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def board_topic(board_id: int) -> str:
+    return f'board:{board_id}'
+
+
+def user_topic(user_id: int) -> str:
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """
+    Очередь событий одного подключения. События кладутся из любого потока через цикл событий подписчика.
+    При переполнении очередь сбрасывается и клиент получает событие resync.
+    """
+
+    def __init__(self, broker: 'InMemoryBroker', topics: set[str], max_size: int):
+        self.broker = broker
+        self.topics = set(topics)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_size)
+
+    def deliver(self, event: dict) -> None:
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'type': 'resync'})
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def update(self, topics: set[str]) -> None:
+        self.broker.resubscribe(self, topics)
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+    """
+    Раздача событий подписчикам внутри процесса. Подходит для одного процесса и тестов.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers: dict[str, set[Subscription]] = {}
+
+    def publish(self, messages: list[tuple[str, dict]]) -> None:
+        """
+        Раздает события сразу: publish_change вызывает его после фиксации транзакции
+        """
+        for topic, event in messages:
+            self.dispatch(topic, event)
+
+    def dispatch(self, topic: str, event: dict) -> None:
+        with self.lock:
+            subscribers = list(self.subscribers.get(topic, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def broadcast(self, event: dict) -> None:
+        with self.lock:
+            subscribers = set().union(*self.subscribers.values())
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def subscribe(self, topics: set[str]) -> Subscription:
+        subscription = Subscription(self, set(), settings.GOALS_PUSH_QUEUE_SIZE)
+        self.resubscribe(subscription, topics)
+        return subscription
+
+    def resubscribe(self, subscription: Subscription, topics: set[str]) -> None:
+        with self.lock:
+            for topic in subscription.topics - topics:
+                self._remove(topic, subscription)
+            for topic in topics - subscription.topics:
+                self.subscribers.setdefault(topic, set()).add(subscription)
+            subscription.topics = set(topics)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self.lock:
+            for topic in subscription.topics:
+                self._remove(topic, subscription)
+            subscription.topics = set()
+
+    def _remove(self, topic: str, subscription: Subscription) -> None:
+        subscribers = self.subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[topic]
+
+
+class PostgresBroker(InMemoryBroker):
+    """
+    События между процессами через LISTEN/NOTIFY PostgreSQL.
+
+    Публикация отправляет все события одним NOTIFY-запросом. publish_change вызывает ее после фиксации,
+    а внутри транзакции PostgreSQL доставил бы уведомления только после ее фиксации. В каждом процессе
+    с подписчиками один фоновый поток слушает канал отдельным соединением и раздает события локально.
+    """
+    channel = 'goals_push'
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+        self.stopping = threading.Event()
+
+    def publish(self, messages: list[tuple[str, dict]]) -> None:
+        params = []
+        for topic, event in messages:
+            params += [self.channel, json.dumps({'topic': topic, 'event': event}, separators=(',', ':'))]
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT ' + ', '.join(['pg_notify(%s, %s)'] * len(messages)), params)
+
+    def subscribe(self, topics: set[str]) -> Subscription:
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name='goals-push-listener', daemon=True)
+                self.listener.start()
+        return super().subscribe(topics)
+
+    def stop(self) -> None:
+        self.stopping.set()
+        if self.listener is not None:
+            self.listener.join()
+
+    def listen(self) -> None:
+        reconnect = False
+        while not self.stopping.is_set():
+            try:
+                self.listen_connection(reconnect)
+            except (psycopg2.Error, OSError, ValueError):
+                logger.exception('Ошибка слушателя событий досок, переподключение')
+                self.stopping.wait(1)
+            reconnect = True
+
+    def listen_connection(self, reconnect: bool) -> None:
+        conn = psycopg2.connect(**connection.get_connection_params())
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {self.channel}')
+            if reconnect:
+                # события, пришедшие без соединения, потеряны: клиенты досинхронизируются по курсору
+                self.broadcast({'type': 'resync'})
+            while not self.stopping.is_set():
+                if select.select([conn], [], [], 1) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    message = json.loads(conn.notifies.pop(0).payload)
+                    self.dispatch(message['topic'], message['event'])
+        finally:
+            conn.close()
+
+
+@lru_cache(maxsize=None)
+def get_broker() -> InMemoryBroker:
+    return import_string(settings.GOALS_PUSH_BROKER)()
+
+
+@receiver(setting_changed)
+def reset_broker(setting: str, **kwargs):
+    if setting == 'GOALS_PUSH_BROKER':
+        get_broker.cache_clear()
+
+
+class PendingEvents:
+    """
+    События транзакции до фиксации, по одному на тему и доску.
+    Несколько изменений доски схлопываются в одно событие с action bulk: клиент все равно
+    забирает изменения через sync, поэтому достаточно одной подсказки на доску.
+    """
+
+    def __init__(self):
+        self.events: dict[tuple[str, int], dict] = {}
+
+    def add(self, topic: str, event: dict) -> None:
+        key = (topic, event['board'])
+        pending = self.events.get(key)
+        if pending is None or pending == event:
+            self.events[key] = event
+            return
+        self.events[key] = {
+            **pending,
+            'entity': pending['entity'] if pending['entity'] == event['entity'] else None,
+            'action': 'bulk',
+            'id': None,
+        }
+
+    def flush(self) -> None:
+        if getattr(connection, 'goals_pending_events', None) is self:
+            connection.goals_pending_events = None
+        get_broker().publish([(topic, event) for (topic, _), event in self.events.items()])
+
+
+def pending_events() -> PendingEvents:
+    """
+    События текущей транзакции. Новый буфер заводится, если прежний уже отправлен
+    или его on_commit отменен откатом.
+    """
+    pending = getattr(connection, 'goals_pending_events', None)
+    if pending is None or not any(entry[1] == pending.flush for entry in connection.run_on_commit):
+        pending = connection.goals_pending_events = PendingEvents()
+        transaction.on_commit(pending.flush)
+    return pending
+
+
+def publish_change(board_id: int | None, entity: str, action: str, object_id: int | None = None,
+                   user_ids: Iterable[int] = ()) -> None:
+    """
+    Событие об изменении на доске, подписчики получат его после фиксации транзакции.
+    Изменения доски за одну транзакцию приходят одним событием, при разных изменениях - с action bulk,
+    id null и entity null, если менялись разные сущности.
+    Об изменении участия пользователь узнает отдельным событием membership: так подключение
+    подписывается на новые доски и отписывается от досок, где его больше нет.
+    """
+    if board_id is None:
+        return
+    event = {'type': 'change', 'board': board_id, 'entity': entity, 'action': action, 'id': object_id}
+    messages = [
+        (board_topic(board_id), event),
+        *((user_topic(user_id), {**event, 'type': 'membership'}) for user_id in user_ids),
+    ]
+    if not connection.in_atomic_block:
+        get_broker().publish(messages)
+        return
+    pending = pending_events()
+    for topic, message in messages:
+        pending.add(topic, message)
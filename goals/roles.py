@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from goals.models import BoardParticipant
+
+
+def board_roles_cache_key(user_id: int) -> str:
+    return f'goals:board_roles:{user_id}'
+
+
+def invalidate_board_roles(*user_ids: int) -> None:
+    """
+    Сбрасывает закешированные роли пользователей.
+    Повторно сбрасывает после коммита, чтобы параллельный запрос не закешировал старые данные.
+    """
+    keys = [board_roles_cache_key(user_id) for user_id in set(user_ids)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class BoardRoles:
+    """
+    Роли пользователя на досках.
+
+    Роли по всем неудаленным доскам хранятся в общем кеше Django (один ключ на пользователя),
+    при промахе загружаются одним запросом. В рамках запроса объект переиспользуется
+    проверками прав на объект, сериализаторами, ключом кеша списков и ETag. Сами списки фильтруются
+    по участию через visible_to (EXISTS по участникам), а не по закешированным id досок.
+    """
+    writer_roles = (BoardParticipant.Role.owner, BoardParticipant.Role.writer)
+
+    def __init__(self, user_id: int | None):
+        self.user_id = user_id
+        self._roles: dict[int, int] | None = None
+
+    @property
+    def roles(self) -> dict[int, int]:
+        if self._roles is None:
+            self._roles = self.load(self.user_id) if self.user_id else {}
+        return self._roles
+
+    @staticmethod
+    def load(user_id: int) -> dict[int, int]:
+        key = board_roles_cache_key(user_id)
+        roles = cache.get(key)
+        if roles is None:
+            # роли - источник прав, поэтому не читаются с отстающей реплики и не кешируются из нее
+            roles = dict(
+                BoardParticipant.objects.using(DEFAULT_DB_ALIAS).filter(
+                    user_id=user_id,
+                    board__is_deleted=False,
+                ).values_list('board_id', 'role')
+            )
+            cache.set(key, roles, settings.GOALS_BOARD_ROLES_CACHE_TIMEOUT)
+        return roles
+
+    @property
+    def board_ids(self) -> list[int]:
+        return list(self.roles)
+
+    @property
+    def writable_board_ids(self) -> list[int]:
+        return [board_id for board_id, role in self.roles.items() if role in self.writer_roles]
+
+    def get(self, board_id: int) -> int | None:
+        return self.roles.get(board_id)
+
+    def can_read(self, board_id: int) -> bool:
+        return board_id in self.roles
+
+    def can_write(self, board_id: int) -> bool:
+        return self.get(board_id) in self.writer_roles
+
+    def is_owner(self, board_id: int) -> bool:
+        return self.get(board_id) == BoardParticipant.Role.owner
+
+    def reset(self) -> None:
+        self._roles = None
+
+
+def get_board_roles(request) -> BoardRoles:
+    """
+    Возвращает роли текущего пользователя, общие для всего запроса.
+    Хранятся на django HttpRequest, чтобы права и сериализаторы видели один объект.
+    """
+    http_request = getattr(request, '_request', request)
+    board_roles = getattr(http_request, '_board_roles', None)
+    if board_roles is None or board_roles.user_id != request.user.id:
+        board_roles = BoardRoles(request.user.id)
+        http_request._board_roles = board_roles
+    return board_roles
@@ -1,9 +1,16 @@
-from django.db import transaction
+from collections import Counter
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import PermissionDenied
 from core.models import User
 from core.serializers import ProfileSerializer
-from goals.models import GoalCategory, Goal, GoalComment, Board, BoardParticipant
+from goals.counters import adjust_active_goals, count_active_goals
+from goals.models import GoalCategory, Goal, GoalComment, Board, BoardParticipant, ArchivedGoal, ArchivedComment
+from goals.roles import get_board_roles, invalidate_board_roles
+from goals.signals import send_bulk_write
 
 
 class BoardCreateSerializer(serializers.ModelSerializer):
@@ -24,6 +31,64 @@ class BoardCreateSerializer(serializers.ModelSerializer):
         return board
 
 
+class ParticipantUsernameField(serializers.SlugRelatedField):
+    """
+    Пользователь участника по username.
+    Существование пользователей проверяет BoardParticipantListSerializer одним запросом на весь список.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('slug_field', 'username')
+        kwargs.setdefault('queryset', User.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str) or not data:
+            self.fail('invalid')
+        return data
+
+
+class BoardParticipantListSerializer(serializers.ListSerializer):
+    """
+    Список участников доски
+    """
+
+    default_error_messages = {
+        'duplicate': 'Пользователь {value} указан несколько раз.',
+    }
+
+    def to_internal_value(self, data):
+        participants = super().to_internal_value(data)
+        usernames = Counter(participant['user'] for participant in participants)
+        users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        errors = [self.participant_errors(participant['user'], users, usernames) for participant in participants]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        for participant in participants:
+            participant['user'] = users[participant['user']]
+        return participants
+
+    def participant_errors(self, username: str, users: dict[str, User], usernames: Counter) -> dict:
+        user_field = self.child.fields['user']
+        if username not in users:
+            message = user_field.error_messages['does_not_exist'].format(
+                slug_name=user_field.slug_field,
+                value=username,
+            )
+        elif usernames[username] > 1:
+            message = self.error_messages['duplicate'].format(value=username)
+        else:
+            return {}
+        return {'user': [message]}
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            # участники из prefetch_related уже загружены с пользователями
+            prefetched = getattr(data.instance, '_prefetched_objects_cache', {})
+            data = data.all() if data.field.remote_field.get_cache_name() in prefetched else data.select_related('user')
+        return super().to_representation(data)
+
+
 class BoardParticipantSerializer(serializers.ModelSerializer):
     """
     Сериализатор участников доски
@@ -32,15 +97,13 @@ class BoardParticipantSerializer(serializers.ModelSerializer):
         required=True,
         choices=BoardParticipant.Role.choices[1:],
     )
-    user = serializers.SlugRelatedField(
-        slug_field='username',
-        queryset=User.objects.all(),
-    )
+    user = ParticipantUsernameField()
 
     class Meta:
         model = BoardParticipant
         fields = '__all__'
         read_only_fields = ('id', 'created', 'updated', 'board')
+        list_serializer_class = BoardParticipantListSerializer
 
 
 class BoardListSerializer(serializers.ModelSerializer):
@@ -68,24 +131,36 @@ class BoardSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         owner = validated_data.pop('user')
         new_participants = validated_data.pop('participants')
-        new_by_id = {part['user'].id: part for part in new_participants}
+        new_by_id = {part['user'].id: part for part in new_participants if part['user'].id != owner.id}
 
-        old_participants = instance.participants.exclude(user=owner)
         with transaction.atomic():
-            for old_participant in old_participants:
-                if old_participant.user_id not in new_by_id:
-                    old_participant.delete()
-                else:
-                    if old_participant.role != new_by_id[old_participant.user_id]['role']:
-                        old_participant.role = new_by_id[old_participant.user_id]['role']
-                        old_participant.save()
-                    new_by_id.pop(old_participant.user_id)
-            for new_part in new_by_id.values():
-                BoardParticipant.objects.create(
-                    user=new_part['user'],
-                    board=instance,
-                    role=new_part['role'],
-                )
+            old_by_id = {part.user_id: part for part in instance.participants.exclude(user=owner)}
+            now = timezone.now()
+
+            removed = old_by_id.keys() - new_by_id.keys()
+            changed = []
+            for user_id, old_participant in old_by_id.items():
+                if user_id in new_by_id and old_participant.role != new_by_id[user_id]['role']:
+                    old_participant.role = new_by_id[user_id]['role']
+                    old_participant.updated = now
+                    changed.append(old_participant)
+            added = [
+                BoardParticipant(user=new_part['user'], board=instance, role=new_part['role'])
+                for user_id, new_part in new_by_id.items()
+                if user_id not in old_by_id
+            ]
+
+            if removed:
+                BoardParticipant.objects.filter(board=instance, user_id__in=removed).delete()
+            if changed:
+                BoardParticipant.objects.bulk_update(changed, ('role', 'updated'))
+            if added:
+                BoardParticipant.objects.bulk_create(added)
+            user_ids = {*removed, *(part.user_id for part in changed + added)}
+            invalidate_board_roles(*user_ids)
+            if user_ids:
+                send_bulk_write(BoardParticipant, {instance.pk}, user_ids)
+
             if title := validated_data.get('title'):
                 instance.title = title
                 instance.save()
@@ -102,16 +177,12 @@ class GoalCategoryCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = GoalCategory
         fields = '__all__'
-        read_only_fields = ('id', 'created', 'updated', 'user', 'is_deleted',)
+        read_only_fields = ('id', 'created', 'updated', 'user', 'is_deleted', 'active_goals_count')
 
     def validate_board(self, value: Board) -> Board:
         if value.is_deleted:
             raise serializers.ValidationError('Доска удалена')
-        if not BoardParticipant.objects.filter(
-                board=value,
-                role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-                user_id=self.context['request'].user.id,
-        ):
+        if not get_board_roles(self.context['request']).can_write(value.id):
             raise PermissionDenied('Вы должны быть владельцем или редактором доски')
         return value
 
@@ -125,7 +196,86 @@ class GoalCategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = GoalCategory
         fields = '__all__'
-        read_only_fields = ('id', 'created', 'updated', 'user', 'board')
+        read_only_fields = ('id', 'created', 'updated', 'user', 'board', 'active_goals_count')
+
+
+def load_batch_categories(items) -> dict[int, GoalCategory]:
+    """
+    Загружает одним запросом все категории, указанные в пакете целей
+    """
+    category_ids = set()
+    for item in items:
+        try:
+            category_ids.add(int(item['category']))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return GoalCategory.objects.filter(is_deleted=False).in_bulk(category_ids)
+
+
+def batch_results(item_errors: list[dict], data: list) -> list[dict]:
+    """
+    Результаты пакета по порядку элементов: данные принятого элемента или {'errors': ошибки}
+    """
+    accepted = iter(data)
+    return [{'errors': errors} if errors else next(accepted) for errors in item_errors]
+
+
+class BatchCategoryField(serializers.PrimaryKeyRelatedField):
+    """
+    Категория цели. В пакетных запросах категории загружаются заранее
+    и передаются полю через атрибут categories, поэтому поле не делает запросов.
+    """
+    categories: dict[int, GoalCategory] | None = None
+
+    def to_internal_value(self, data):
+        if self.categories is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.categories:
+            self.fail('does_not_exist', pk_value=data)
+        return self.categories[pk]
+
+
+class GoalBatchCreateSerializer(serializers.ListSerializer):
+    """
+    Пакетное создание целей одним INSERT.
+    Ошибочные элементы пропускаются, их ошибки по порядку элементов лежат в item_errors
+    ({} у принятых), пакет отклоняется целиком, только если не принят ни один элемент.
+    """
+    item_errors: list[dict]
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data or (self.max_length is not None and len(data) > self.max_length):
+            # ошибки самого списка: не список, пустой или слишком длинный
+            return super().to_internal_value(data)
+        self.child.fields['category'].categories = load_batch_categories(
+            item for item in data if isinstance(item, dict)
+        )
+        validated, self.item_errors = [], []
+        for item in data:
+            try:
+                validated.append(self.child.run_validation(item))
+            except serializers.ValidationError as exc:
+                self.item_errors.append(exc.detail)
+            except PermissionDenied as exc:
+                self.item_errors.append({'category': [exc.detail]})
+            else:
+                self.item_errors.append({})
+        if not validated:
+            raise serializers.ValidationError(batch_results(self.item_errors, []))
+        return validated
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            goals = Goal.objects.bulk_create([Goal(**attrs) for attrs in validated_data])
+            adjust_active_goals(count_active_goals(goals))
+            send_bulk_write(Goal, {attrs['category'].board_id for attrs in validated_data})
+        return goals
 
 
 class GoalCreateSerializer(serializers.ModelSerializer):
@@ -133,18 +283,16 @@ class GoalCreateSerializer(serializers.ModelSerializer):
     Сериализатор создания цели
     """
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    category = BatchCategoryField(queryset=GoalCategory.objects.filter(is_deleted=False))
 
     class Meta:
         model = Goal
-        fields = '__all__'
-        read_only_fields = ('id', 'created', 'updated', 'user')
+        exclude = ('search_vector',)
+        read_only_fields = ('id', 'created', 'updated', 'user', 'comments_count')
+        list_serializer_class = GoalBatchCreateSerializer
 
     def validate_category(self, value: GoalCategory) -> GoalCategory:
-        if not BoardParticipant.objects.filter(
-                board=value.board_id,
-                role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-                user_id=self.context['request'].user.id
-        ):
+        if not get_board_roles(self.context['request']).can_write(value.board_id):
             raise PermissionDenied('Вы должны быть владельцем или редактором доски')
         return value
 
@@ -153,11 +301,29 @@ class GoalSerializer(serializers.ModelSerializer):
     """
     Сериализатор цели
     """
+    category = BatchCategoryField(queryset=GoalCategory.objects.filter(is_deleted=False))
 
     class Meta:
         model = Goal
-        fields = '__all__'
-        read_only_fields = ('id', 'created', 'updated', 'user')
+        exclude = ('search_vector',)
+        read_only_fields = ('id', 'created', 'updated', 'user', 'comments_count')
+
+    def validate_category(self, value: GoalCategory) -> GoalCategory:
+        if not get_board_roles(self.context['request']).can_write(value.board_id):
+            raise PermissionDenied('Вы должны быть владельцем или редактором доски')
+        return value
+
+
+class GoalBatchStatusSerializer(serializers.Serializer):
+    """
+    Сериализатор пакетной смены статуса целей
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.GOALS_BATCH_MAX_SIZE,
+    )
+    status = serializers.ChoiceField(choices=Goal.Status.choices)
 
 
 class GoalCommentCreateSerializer(serializers.ModelSerializer):
@@ -165,6 +331,7 @@ class GoalCommentCreateSerializer(serializers.ModelSerializer):
     Сериализатор создания комментария
     """
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    goal = serializers.PrimaryKeyRelatedField(queryset=Goal.objects.select_related('category'))
 
     class Meta:
         model = GoalComment
@@ -172,11 +339,7 @@ class GoalCommentCreateSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created', 'updated', 'user')
 
     def validate_goal(self, value: Goal):
-        if not BoardParticipant.objects.filter(
-                board=value.category.board.pk,
-                role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-                user_id=self.context['request'].user.id,
-        ):
+        if not get_board_roles(self.context['request']).can_write(value.category.board_id):
             raise PermissionDenied('Недостаточно прав')
         return value
 
@@ -191,3 +354,24 @@ class GoalCommentSerializer(serializers.ModelSerializer):
         model = GoalComment
         fields = '__all__'
         read_only_fields = ('id', 'created', 'updated', 'user', 'goal')
+
+
+class ArchivedGoalSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор цели в архиве
+    """
+
+    class Meta:
+        model = ArchivedGoal
+        fields = '__all__'
+
+
+class ArchivedCommentSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор комментария в архиве
+    """
+    user = ProfileSerializer(read_only=True)
+
+    class Meta:
+        model = ArchivedComment
+        fields = '__all__'
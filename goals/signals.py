@@ -0,0 +1,161 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+
+from core.models import User
+from core.serializers import ProfileSerializer
+from goals.cache import bump_board_versions
+from goals.counters import adjust_active_goals, adjust_comments, is_active
+from goals.models import Board, BoardParticipant, GoalCategory, Goal, GoalComment
+from goals.push import publish_change
+from goals.roles import invalidate_board_roles
+
+# Массовые изменения (update, bulk_create, bulk_update) не вызывают post_save/post_delete,
+# поэтому такие пути отправляют bulk_write с моделью в sender и затронутыми досками в board_ids,
+# для участников - еще и с пользователями в user_ids
+bulk_write = Signal()
+
+
+def send_bulk_write(sender, board_ids, user_ids=()) -> None:
+    bulk_write.send(sender=sender, board_ids=set(board_ids), user_ids=set(user_ids))
+
+
+PUSH_ENTITIES = {
+    Board: 'board',
+    BoardParticipant: 'participant',
+    GoalCategory: 'category',
+    Goal: 'goal',
+    GoalComment: 'comment',
+}
+
+
+def push_action(signal) -> str:
+    return 'delete' if signal is post_delete else 'save'
+
+
+def goal_board_id(goal: Goal) -> int | None:
+    """
+    Доска цели без лишнего запроса, если категория уже загружена
+    """
+    if Goal.category.is_cached(goal):
+        return goal.category.board_id
+    return GoalCategory.objects.filter(pk=goal.category_id).values_list('board_id', flat=True).first()
+
+
+def comment_board_id(comment: GoalComment) -> int | None:
+    if GoalComment.goal.is_cached(comment):
+        return goal_board_id(comment.goal)
+    return Goal.objects.filter(pk=comment.goal_id).values_list('category__board_id', flat=True).first()
+
+
+@receiver(post_save, sender=BoardParticipant)
+@receiver(post_delete, sender=BoardParticipant)
+def participant_changed(sender, instance: BoardParticipant, signal, origin=None, **kwargs):
+    invalidate_board_roles(instance.user_id)
+    bump_board_versions(instance.board_id)
+    # удаление запросом публикуется одним событием через send_bulk_write
+    if isinstance(origin, QuerySet):
+        return
+    publish_change(instance.board_id, 'participant', push_action(signal), instance.pk, user_ids=(instance.user_id,))
+
+
+@receiver(post_save, sender=User)
+def profile_changed(sender, instance: User, created: bool, update_fields=None, **kwargs):
+    """
+    Профиль пользователя входит в закешированные ответы досок, где он участник
+    """
+    if created or (update_fields is not None and not set(ProfileSerializer.Meta.fields) & set(update_fields)):
+        # например, last_login при входе
+        return
+    bump_board_versions(*BoardParticipant.objects.filter(user=instance).values_list('board_id', flat=True))
+
+
+@receiver(post_init, sender=Board)
+def remember_board_state(sender, instance: Board, **kwargs):
+    instance._loaded_is_deleted = instance.is_deleted
+
+
+@receiver(post_save, sender=Board)
+def board_changed(sender, instance: Board, created: bool, **kwargs):
+    bump_board_versions(instance.pk)
+    publish_change(instance.pk, 'board', 'save', instance.pk)
+    if created or instance.is_deleted == instance._loaded_is_deleted:
+        return
+    instance._loaded_is_deleted = instance.is_deleted
+    invalidate_board_roles(*BoardParticipant.objects.filter(board=instance).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=GoalCategory)
+@receiver(post_delete, sender=GoalCategory)
+def category_changed(sender, instance: GoalCategory, signal, **kwargs):
+    bump_board_versions(instance.board_id)
+    publish_change(instance.board_id, 'category', push_action(signal), instance.pk)
+
+
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+def goal_changed(sender, instance: Goal, signal, **kwargs):
+    board_id = goal_board_id(instance)
+    bump_board_versions(board_id)
+    publish_change(board_id, 'goal', push_action(signal), instance.pk)
+
+
+@receiver(post_init, sender=Goal)
+def remember_goal_state(sender, instance: Goal, **kwargs):
+    # через __dict__, чтобы не загружать отложенные поля
+    instance._loaded_counted = (instance.__dict__.get('category_id'), instance.__dict__.get('status'))
+
+
+@receiver(post_save, sender=Goal)
+def goal_saved(sender, instance: Goal, created: bool, update_fields=None, **kwargs):
+    """
+    Счетчик активных целей категорий при создании, смене статуса или переносе цели
+    """
+    loaded_category_id, loaded_status = instance._loaded_counted
+    if not created and loaded_status is None:
+        return
+    if update_fields is not None and not {'status', 'category', 'category_id'} & set(update_fields):
+        return
+    deltas = {}
+    if not created and is_active(loaded_status):
+        deltas[loaded_category_id] = -1
+    if is_active(instance.status):
+        deltas[instance.category_id] = deltas.get(instance.category_id, 0) + 1
+    adjust_active_goals(deltas)
+    instance._loaded_counted = (instance.category_id, instance.status)
+
+
+@receiver(post_delete, sender=Goal)
+def goal_deleted(sender, instance: Goal, **kwargs):
+    loaded_category_id, loaded_status = instance._loaded_counted
+    if is_active(loaded_status):
+        adjust_active_goals({loaded_category_id: -1})
+
+
+@receiver(post_save, sender=GoalComment)
+@receiver(post_delete, sender=GoalComment)
+def comment_changed(sender, instance: GoalComment, signal, **kwargs):
+    board_id = comment_board_id(instance)
+    bump_board_versions(board_id)
+    publish_change(board_id, 'comment', push_action(signal), instance.pk)
+
+
+@receiver(post_save, sender=GoalComment)
+def comment_saved(sender, instance: GoalComment, created: bool, **kwargs):
+    if created:
+        adjust_comments({instance.goal_id: 1})
+
+
+@receiver(post_delete, sender=GoalComment)
+def comment_deleted(sender, instance: GoalComment, origin=None, **kwargs):
+    # при удалении самой цели комментарии уходят каскадом, ее счетчик обновлять незачем
+    if isinstance(origin, Goal) or isinstance(origin, QuerySet) and origin.model is Goal:
+        return
+    adjust_comments({instance.goal_id: -1})
+
+
+@receiver(bulk_write)
+def bulk_written(sender, board_ids: set[int], user_ids: set[int] = frozenset(), **kwargs):
+    bump_board_versions(*board_ids)
+    for board_id in board_ids:
+        publish_change(board_id, PUSH_ENTITIES[sender], 'bulk', user_ids=user_ids)
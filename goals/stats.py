@@ -0,0 +1,104 @@
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from goals.models import Board, GoalCategory, Goal, GoalStat, GoalDueStat
+
+OPEN_STATUSES = (Goal.Status.to_do, Goal.Status.in_progress)
+
+
+def _empty_stats() -> dict:
+    return {
+        'total': 0,
+        'overdue': 0,
+        'by_status': {status.name: 0 for status in Goal.Status},
+        'by_priority': {priority.name: 0 for priority in Goal.Priority},
+    }
+
+
+def board_stats(board: Board) -> dict:
+    """
+    Статистика доски и ее категорий из сводных таблиц, без чтения целей.
+    Архивные цели учитываются только в by_status, total и by_priority считают неархивные.
+    """
+    categories = dict(GoalCategory.objects.filter(board=board, is_deleted=False).values_list('id', 'title'))
+    stats = {category_id: _empty_stats() for category_id in categories}
+
+    for category_id, status, priority, count in GoalStat.objects.filter(category_id__in=categories).values_list(
+        'category_id', 'status', 'priority', 'count',
+    ):
+        category_stats = stats[category_id]
+        category_stats['by_status'][Goal.Status(status).name] += count
+        if status != Goal.Status.archived:
+            category_stats['total'] += count
+            category_stats['by_priority'][Goal.Priority(priority).name] += count
+
+    overdue = GoalDueStat.objects.filter(
+        category_id__in=categories,
+        due_date__lt=timezone.localdate(),
+    ).values('category_id').annotate(overdue=Sum('count')).values_list('category_id', 'overdue')
+    for category_id, count in overdue:
+        stats[category_id]['overdue'] = count
+
+    total = _empty_stats()
+    for category_stats in stats.values():
+        total['total'] += category_stats['total']
+        total['overdue'] += category_stats['overdue']
+        for group in ('by_status', 'by_priority'):
+            for key, count in category_stats[group].items():
+                total[group][key] += count
+
+    return {
+        'board': board.id,
+        **total,
+        'categories': [
+            {'id': category_id, 'title': title, **stats[category_id]} for category_id, title in categories.items()
+        ],
+    }
+
+
+def rebuild_goal_stats(board_id: int | None = None, dry_run: bool = False) -> list[str]:
+    """
+    Пересчитывает сводные таблицы по целям и исправляет расхождения.
+    На время пересчета цели блокируются от изменений. Возвращает описание найденных расхождений.
+    """
+    goals = Goal.objects.all()
+    if board_id is not None:
+        goals = goals.filter(category__board_id=board_id)
+    drift = []
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {Goal._meta.db_table} IN SHARE MODE')
+
+        for model, keys, expected_goals in (
+            (GoalStat, ('category_id', 'status', 'priority'), goals),
+            (GoalDueStat, ('category_id', 'due_date'), goals.filter(status__in=OPEN_STATUSES, due_date__isnull=False)),
+        ):
+            expected = {
+                row[:-1]: row[-1]
+                for row in expected_goals.order_by().values_list(*keys).annotate(count=Count('id'))
+            }
+            stored_rows = model.objects.all()
+            if board_id is not None:
+                stored_rows = stored_rows.filter(category__board_id=board_id)
+            stored = {row[:-2]: row[-2:] for row in stored_rows.values_list(*keys, 'id', 'count')}
+
+            stale_ids, changed, added = [], [], []
+            for key, (pk, count) in stored.items():
+                if expected.get(key, 0) != count:
+                    drift.append(f'{model.__name__} {dict(zip(keys, key))}: {count} -> {expected.get(key, 0)}')
+                    if key in expected:
+                        changed.append(model(id=pk, count=expected[key]))
+                    else:
+                        stale_ids.append(pk)
+            for key, count in expected.items():
+                if key not in stored:
+                    drift.append(f'{model.__name__} {dict(zip(keys, key))}: нет -> {count}')
+                    added.append(model(**dict(zip(keys, key)), count=count))
+
+            if not dry_run:
+                model.objects.filter(id__in=stale_ids).delete()
+                model.objects.bulk_update(changed, ('count',))
+                model.objects.bulk_create(added)
+    return drift
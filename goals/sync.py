@@ -0,0 +1,242 @@
+import json
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from core.models import User
+from goals.models import Board, BoardParticipant, GoalCategory, Goal, GoalComment, Change
+from goals.serializers import BoardSerializer, GoalCategorySerializer, GoalSerializer, GoalCommentSerializer
+
+SYNC_COLLECTIONS = ('boards', 'categories', 'goals', 'comments')
+SYNC_SERIALIZERS = {
+    'boards': BoardSerializer,
+    'categories': GoalCategorySerializer,
+    'goals': GoalSerializer,
+    'comments': GoalCommentSerializer,
+}
+
+
+class SyncCursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Курсор устарел, требуется полная синхронизация'
+    default_code = 'cursor_expired'
+
+
+class SyncCursor(NamedTuple):
+    """
+    Позиция в журнале изменений: все изменения до (xid, change_id) включительно уже переданы клиенту.
+    Пока полный снимок отдается страницами, snapshot - позиция в нем: номер коллекции и последний id.
+    """
+    xid: int
+    change_id: int
+    issued: int
+    snapshot: tuple[int, int] | None = None
+
+    def encode(self) -> str:
+        data = {'x': self.xid, 'i': self.change_id, 't': self.issued}
+        if self.snapshot is not None:
+            data['s'] = list(self.snapshot)
+        return urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode()
+
+    @classmethod
+    def decode(cls, value: str) -> 'SyncCursor':
+        try:
+            data = json.loads(urlsafe_b64decode(value.encode()))
+            snapshot = data.get('s')
+            if snapshot is not None:
+                stage, after = map(int, snapshot)
+                if not 0 <= stage < len(SYNC_COLLECTIONS):
+                    raise ValueError
+                snapshot = (stage, after)
+            cursor = cls(int(data['x']), int(data['i']), int(data['t']), snapshot)
+        except (BinasciiError, UnicodeError, ValueError, TypeError, KeyError, AttributeError):
+            raise ValidationError({'cursor': 'Неверный курсор'})
+        if cursor.issued < time.time() - settings.GOALS_SYNC_RETENTION_DAYS * 86400:
+            raise SyncCursorExpired()
+        return cursor
+
+
+def committed_xid() -> int:
+    """
+    Граница журнала: транзакции с меньшими номерами завершены, поэтому их изменения уже видны
+    и не появятся позже. Изменения незавершенных транзакций попадут в следующую синхронизацию.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        return cursor.fetchone()[0]
+
+
+RESTORE_SQL = '''
+    INSERT INTO goals_change (xid, entity, action, object_id, board_id, user_id, created)
+    VALUES (pg_current_xact_id()::text::bigint, %s, %s, %s, %s, NULL, statement_timestamp())
+'''
+
+
+def log_restore(entity: int, object_id: int, board_id: int) -> None:
+    """
+    Записывает восстановление доски или категории как создание: при синхронизации клиент получит
+    объект вместе с содержимым, которое триггер журнала при восстановлении не отмечает
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(RESTORE_SQL, [entity, Change.Action.insert, object_id, board_id])
+
+
+class BoardSync:
+    """
+    Изменения на досках пользователя после курсора.
+
+    Журнал читается порциями по limit записей, повторные изменения одного объекта схлопываются,
+    и текущее состояние объектов загружается одним запросом на сущность, поэтому объем ответа
+    зависит от числа изменений, а не от размера досок. Удаленные, архивные и недоступные объекты
+    возвращаются в deleted. Без курсора отдается полный снимок страницами по limit объектов: граница
+    журнала фиксируется в начале снимка, и изменения, сделанные за время его чтения, приходят после него.
+    Для досок, куда пользователя только что добавили, отдается снимок доски, для созданных
+    и восстановленных досок и категорий - снимок их содержимого.
+    """
+
+    def __init__(self, user: User, context: dict, limit: int | None = None):
+        self.user = user
+        self.context = context
+        self.limit = limit or settings.GOALS_SYNC_PAGE_SIZE
+        self.board_ids = set(BoardParticipant.objects.filter(user=user).values_list('board_id', flat=True))
+        self.objects = {name: {} for name in SYNC_COLLECTIONS}
+        self.deleted = {name: set() for name in SYNC_COLLECTIONS}
+
+    def run(self, cursor: SyncCursor | None) -> dict:
+        if cursor is None or cursor.snapshot is not None:
+            if cursor is None:
+                cursor = SyncCursor(committed_xid(), 0, int(time.time()), (0, 0))
+            next_cursor = cursor._replace(snapshot=self.add_snapshot_page(*cursor.snapshot))
+            has_more = next_cursor.snapshot is not None
+        else:
+            position, has_more = self.add_changes(cursor, committed_xid())
+            next_cursor = SyncCursor(*position, int(time.time()))
+        return {
+            'cursor': next_cursor.encode(),
+            'has_more': has_more,
+            **{name: list(objects.values()) for name, objects in self.objects.items()},
+            'deleted': {name: sorted(ids - self.objects[name].keys()) for name, ids in self.deleted.items()},
+        }
+
+    def add_snapshot_page(self, stage: int, after: int) -> tuple[int, int] | None:
+        """
+        Страница полного снимка: не больше limit объектов досок пользователя по коллекциям в порядке
+        SYNC_COLLECTIONS и по id после позиции. Возвращает позицию следующей страницы или None в конце снимка.
+        """
+        boards = Board.objects.filter(pk__in=self.board_ids, is_deleted=False)
+        categories = GoalCategory.objects.filter(board__in=boards, is_deleted=False)
+        goals = Goal.objects.filter(category__in=categories).exclude(status=Goal.Status.archived)
+        querysets = dict(zip(SYNC_COLLECTIONS, (
+            boards, categories, goals, GoalComment.objects.filter(goal__in=goals),
+        )))
+        remaining = self.limit
+        for index in range(stage, len(SYNC_COLLECTIONS)):
+            name = SYNC_COLLECTIONS[index]
+            start = after if index == stage else 0
+            instances = list(self.prepare(name, querysets[name].filter(pk__gt=start))[:remaining + 1])
+            if len(instances) > remaining:
+                self.collect(name, instances[:remaining])
+                return index, instances[remaining - 1].pk if remaining else start
+            self.collect(name, instances)
+            remaining -= len(instances)
+        return None
+
+    def add_changes(self, cursor: SyncCursor, upper: int) -> tuple[tuple[int, int], bool]:
+        changes = Change.objects.filter(
+            Q(board_id__in=self.board_ids) | Q(entity=Change.Entity.participant, user_id=self.user.pk),
+            Q(xid__gt=cursor.xid) | Q(xid=cursor.xid, id__gt=cursor.change_id),
+            # диапазон по xid для индексов (board_id, xid, id) и (user_id, xid, id)
+            xid__gte=cursor.xid,
+            xid__lt=upper,
+        ).order_by('xid', 'id').values_list('xid', 'id', 'entity', 'action', 'object_id', 'board_id', 'user_id')
+        rows = list(changes[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+
+        changed, created = defaultdict(set), defaultdict(set)
+        joined, left = set(), set()
+        for _, _, entity, action, object_id, board_id, user_id in rows:
+            if entity == Change.Entity.participant:
+                # состав участников входит в представление доски
+                changed[Change.Entity.board].add(board_id)
+                if user_id == self.user.pk and action == Change.Action.insert:
+                    joined.add(board_id)
+                elif user_id == self.user.pk and action == Change.Action.delete:
+                    left.add(board_id)
+            else:
+                changed[entity].add(object_id)
+                if action == Change.Action.insert:
+                    created[entity].add(object_id)
+
+        self.deleted['boards'].update(left - self.board_ids)
+        self.add_snapshot(Board.objects.filter(
+            pk__in=(joined | created[Change.Entity.board]) & self.board_ids, is_deleted=False,
+        ))
+        self.add_subtree(GoalCategory.objects.filter(
+            pk__in=created[Change.Entity.category], board_id__in=self.board_ids, is_deleted=False,
+        ))
+        self.add_changed(changed)
+
+        if has_more:
+            return rows[-1][:2], True
+        return max((cursor.xid, cursor.change_id), (upper, 0)), False
+
+    def add_changed(self, changed: dict[int, set[int]]) -> None:
+        querysets = {
+            Change.Entity.board: Board.objects.filter(pk__in=self.board_ids),
+            Change.Entity.category: GoalCategory.objects.filter(board_id__in=self.board_ids),
+            Change.Entity.goal: Goal.objects.filter(category__board_id__in=self.board_ids),
+            Change.Entity.comment: GoalComment.objects.filter(goal__category__board_id__in=self.board_ids),
+        }
+        for entity, name in zip(querysets, SYNC_COLLECTIONS):
+            ids = changed.get(entity)
+            if not ids:
+                continue
+            live = self.collect(name, self.prepare(name, querysets[entity].filter(pk__in=ids)))
+            # удаленные, архивные и ставшие недоступными объекты клиент удаляет у себя
+            self.deleted[name].update(ids - live)
+
+    def add_snapshot(self, boards) -> None:
+        board_ids = self.collect('boards', self.prepare('boards', boards))
+        if board_ids:
+            self.add_subtree(GoalCategory.objects.filter(board_id__in=board_ids, is_deleted=False))
+
+    def add_subtree(self, categories) -> None:
+        """
+        Категории вместе с их активными целями и комментариями к ним
+        """
+        category_ids = self.collect('categories', self.prepare('categories', categories))
+        if not category_ids:
+            return
+        goals = Goal.objects.filter(category_id__in=category_ids).exclude(status=Goal.Status.archived)
+        self.collect('goals', self.prepare('goals', goals))
+        self.collect('comments', self.prepare('comments', GoalComment.objects.filter(goal__in=goals.values('pk'))))
+
+    @staticmethod
+    def prepare(name: str, queryset):
+        queryset = queryset.order_by('pk')
+        if name == 'boards':
+            return queryset
+        if name == 'goals':
+            return queryset.defer('search_vector')
+        return queryset.select_related('user')
+
+    def collect(self, name: str, instances) -> set[int]:
+        """
+        Сериализует объекты, кроме мягко удаленных и архивных. Возвращает id отданных объектов.
+        """
+        live = [
+            instance for instance in instances
+            if not getattr(instance, 'is_deleted', False) and getattr(instance, 'status', None) != Goal.Status.archived
+        ]
+        for instance, data in zip(live, SYNC_SERIALIZERS[name](live, many=True, context=self.context).data):
+            self.objects[name][instance.pk] = data
+        return {instance.pk for instance in live}
@@ -1,3 +1,1714 @@
-# from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import tempfile
+import threading
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase, APITransactionTestCase
+
+from core.models import User
+from core.testing import QueryBudgetTestMixin
+from goals import views
+from goals.counters import check_counters
+from goals.events import BoardEventsApp
+from goals.models import Board, BoardParticipant, GoalCategory, Goal, GoalComment, GoalStat, ArchivedGoal, \
+    ArchivedComment, Change
+from goals.push import get_broker
+from goals.roles import BoardRoles
+from goals.stats import board_stats
+from goals.sync import SYNC_COLLECTIONS, SyncCursor
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def seed_boards(user: User, boards: int = 3, categories: int = 2, goals: int = 5, comments: int = 2) -> list[Board]:
+    """
+    Создает доски пользователя с категориями, целями и комментариями
+    """
+    created_boards = Board.objects.bulk_create(Board(title=f'Доска {i}') for i in range(boards))
+    BoardParticipant.objects.bulk_create(
+        BoardParticipant(board=board, user=user, role=BoardParticipant.Role.owner) for board in created_boards
+    )
+    created_categories = GoalCategory.objects.bulk_create(
+        GoalCategory(board=board, user=user, title=f'Категория {i}')
+        for board in created_boards for i in range(categories)
+    )
+    created_goals = Goal.objects.bulk_create(
+        Goal(category=category, user=user, title=f'Цель {i}', status=i % 4 + 1, due_date=f'2030-01-{i % 28 + 1:02d}')
+        for category in created_categories for i in range(goals)
+    )
+    GoalComment.objects.bulk_create(
+        GoalComment(goal=goal, user=user, text=f'Комментарий {i}')
+        for goal in created_goals for i in range(comments)
+    )
+    return created_boards
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Планы запросов проверяются только на PostgreSQL')
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryPlanTest(TestCase):
+    """
+    Запросы списков и детальных представлений используют рассчитанные на них индексы.
+
+    Данных столько, что полное сканирование больших таблиц дороже индекса, поэтому планировщик
+    работает с настройками по умолчанию, а тест сверяет имена индексов в EXPLAIN (FORMAT JSON).
+    """
+    large_tables = ('goals_board', 'goals_boardparticipant', 'goals_goalcategory', 'goals_goal', 'goals_goalcomment')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='planner')
+        others = User.objects.bulk_create(User(username=f'other{i}') for i in range(40))
+        boards = []
+        for other in others:
+            boards += seed_boards(other, boards=10, categories=2, goals=5, comments=1)
+        # участники чужих досок: у каждой доски их несколько, у пользователя - несколько досок
+        members = User.objects.bulk_create(User(username=f'member{i}') for i in range(400))
+        BoardParticipant.objects.bulk_create(
+            BoardParticipant(board=board, user=member, role=BoardParticipant.Role.reader)
+            for index, member in enumerate(members)
+            for board in {boards[(index * 7 + k) % len(boards)] for k in range(20)}
+        )
+        # доски и категории без целей: полное сканирование этих таблиц дороже выборки по индексу
+        empty_boards = Board.objects.bulk_create(Board(title=f'Пустая {i}') for i in range(15000))
+        GoalCategory.objects.bulk_create(
+            GoalCategory(board=board, user=others[0], title=f'Категория {i}')
+            for board in empty_boards[:5000] for i in range(2)
+        )
+        cls.board = seed_boards(cls.user)[0]
+        cls.category = cls.board.categories.first()
+        cls.goal = Goal.objects.filter(category=cls.category).exclude(status=Goal.Status.archived).first()
+        cls.comment = cls.goal.comments.first()
+        with connection.cursor() as cursor:
+            for table in cls.large_tables:
+                cursor.execute(f'ANALYZE {table}')
+
+    def view_queryset(self, view_class, query: dict | None = None, **kwargs):
+        request = Request(APIRequestFactory().get('/', query or {}))
+        request.user = self.user
+        view = view_class(request=request, args=(), kwargs=kwargs, format_kwarg=None)
+        queryset = view.get_queryset()
+        if 'pk' in kwargs:
+            return queryset.filter(pk=kwargs['pk'])
+        return view.filter_queryset(queryset)[:50]
+
+    @classmethod
+    def plan_scans(cls, node: dict) -> dict[str, set[str | None]]:
+        """
+        Таблицы плана и индексы, которыми они читаются (None - последовательное сканирование)
+        """
+        scans = {}
+        if 'Relation Name' in node:
+            scans[node['Relation Name']] = {node.get('Index Name')}
+        for child in node.get('Plans', ()):
+            for table, indexes in cls.plan_scans(child).items():
+                scans.setdefault(table, set()).update(indexes)
+        return scans
+
+    def assertIndexedPlan(self, queryset, **indexes: str):
+        """
+        Большие таблицы читаются только по индексам, а таблицы из indexes - именно этими индексами
+        """
+        plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+        scans = self.plan_scans(plan)
+        msg = f'\n{queryset.query}\n{queryset.explain()}'
+        for table in self.large_tables:
+            self.assertNotIn(None, scans.get(table, ()), msg=msg)
+        for table, index in indexes.items():
+            self.assertEqual(scans.get(table), {index}, msg=msg)
+
+    def test_board_roles(self):
+        self.assertIndexedPlan(
+            BoardParticipant.objects.filter(user_id=self.user.id, board__is_deleted=False).values_list('board_id'),
+            goals_boardparticipant='participant_user_board_idx',
+            goals_board='goals_board_pkey',
+        )
+
+    def test_board_views(self):
+        self.assertIndexedPlan(
+            self.view_queryset(views.BoardListView),
+            goals_boardparticipant='participant_user_board_idx',
+            goals_board='goals_board_pkey',
+        )
+        self.assertIndexedPlan(self.view_queryset(views.BoardView, pk=self.board.pk), goals_board='goals_board_pkey')
+
+    def test_category_views(self):
+        self.assertIndexedPlan(
+            self.view_queryset(views.GoalCategoryListView),
+            goals_boardparticipant='participant_user_board_idx',
+            goals_goalcategory='category_active_board_idx',
+        )
+        self.assertIndexedPlan(
+            self.view_queryset(views.GoalCategoryView, pk=self.category.pk),
+            goals_goalcategory='goals_goalcategory_pkey',
+        )
+
+    def test_goal_views(self):
+        for query in (
+            None,
+            {'ordering': '-created'},
+            {'due_date__gte': '2030-01-05T00:00:00', 'due_date__lte': '2030-01-10T00:00:00'},
+        ):
+            with self.subTest(query=query):
+                self.assertIndexedPlan(
+                    self.view_queryset(views.GoalListView, query),
+                    goals_boardparticipant='participant_user_board_idx',
+                    goals_goalcategory='category_active_board_idx',
+                    goals_goal='goal_active_category_idx',
+                )
+        self.assertIndexedPlan(self.view_queryset(views.GoalView, pk=self.goal.pk), goals_goal='goals_goal_pkey')
+
+    def test_comment_views(self):
+        self.assertIndexedPlan(
+            self.view_queryset(views.GoalCommentListView, {'goal': self.goal.pk}),
+            goals_goalcomment='comment_goal_created_idx',
+        )
+        self.assertIndexedPlan(
+            self.view_queryset(views.GoalCommentView, pk=self.comment.pk),
+            goals_goalcomment='goals_goalcomment_pkey',
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryBudgetTest(QueryBudgetTestMixin, APITestCase):
+    """
+    Бюджет SQL-запросов эндпоинтов goals при холодном кеше ролей.
+    Бюджет списков один для всех размеров страницы, поэтому N+1 сразу его превышает.
+    """
+    page_sizes = (5, 50)
+    list_budgets = {
+        'board-list': 3,
+        'category-list': 3,
+        'goal-list': 4,
+        'comment-list': 4,
+    }
+    detail_budgets = {
+        'board-view': 4,
+        'category-view': 2,
+        'goal-view': 2,
+        'comment-view': 1,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='budget')
+        cls.members = User.objects.bulk_create(User(username=f'member{i}') for i in range(30))
+        cls.board = seed_boards(cls.user, boards=3, categories=4, goals=10, comments=3)[0]
+        cls.category = cls.board.categories.first()
+        cls.goals = list(Goal.objects.filter(category__board=cls.board).exclude(status=Goal.Status.archived))
+        cls.comment = GoalComment.objects.filter(goal=cls.goals[0]).first()
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def call(self, budget: int, method: str, url_name: str, data=None, status: int = 200, **kwargs):
+        cache.clear()
+        url = reverse(url_name, kwargs=kwargs)
+        with self.assertQueryBudget(budget, f'{method.upper()} {url_name}'):
+            if method == 'get':
+                response = self.client.get(url, data)
+            else:
+                response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, status, response.content)
+        return response
+
+    def test_list_endpoints(self):
+        for url_name, budget in self.list_budgets.items():
+            for page_size in self.page_sizes:
+                with self.subTest(url_name=url_name, page_size=page_size):
+                    self.call(budget, 'get', url_name, {'limit': page_size})
+
+    def test_goal_list_cursor(self):
+        for page_size in self.page_sizes:
+            response = self.call(3, 'get', 'goal-list', {'limit': page_size, 'cursor': ''})
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_goal_list_cursor_traversal(self):
+        # названия целей повторяются, поэтому порядок внутри одинаковых названий задает id
+        goals = Goal.objects.visible_to(self.user).exclude(status=Goal.Status.archived)
+        for ordering, order_by in ((None, ('title', 'id')), ('-title,created', ('-title', 'created', 'id'))):
+            with self.subTest(ordering=ordering):
+                expected = list(goals.order_by(*order_by).values_list('id', flat=True))
+                params = {'limit': 7, 'cursor': ''}
+                if ordering:
+                    params['ordering'] = ordering
+                pages = [self.client.get(reverse('goal-list'), params).data]
+                while pages[-1]['next']:
+                    pages.append(self.client.get(pages[-1]['next']).data)
+                self.assertEqual([goal['id'] for page in pages for goal in page['results']], expected)
+                self.assertIsNone(pages[0]['previous'])
+
+                backward = [pages[-1]]
+                while backward[-1]['previous']:
+                    backward.append(self.client.get(backward[-1]['previous']).data)
+                self.assertEqual(len(backward), len(pages))
+                self.assertEqual([goal['id'] for page in reversed(backward) for goal in page['results']], expected)
+
+    def test_goal_list_cursor_ties(self):
+        # одинаковые названия и даты создания: порядок и границы страниц задает только id
+        goals = Goal.objects.visible_to(self.user).exclude(status=Goal.Status.archived)
+        Goal.objects.filter(pk__in=goals.values('pk')).update(title='Одна', created=timezone.now())
+        cache.clear()
+        for ordering in ('title', '-title', 'created', '-created', '-title,-created'):
+            with self.subTest(ordering=ordering):
+                fields = ordering.split(',')
+                tiebreaker = '-id' if fields[-1].startswith('-') else 'id'
+                expected = list(goals.order_by(*fields, tiebreaker).values_list('id', flat=True))
+                page = self.client.get(reverse('goal-list'), {'limit': 3, 'cursor': '', 'ordering': ordering}).data
+                ids = [goal['id'] for goal in page['results']]
+                while page['next']:
+                    page = self.client.get(page['next']).data
+                    ids += [goal['id'] for goal in page['results']]
+                self.assertEqual(ids, expected)
+
+    def test_goal_list_cursor_unsupported_ordering(self):
+        # недопустимые поля отбрасываются OrderingFilter, остается сортировка по умолчанию
+        first = self.client.get(reverse('goal-list'), {'limit': 5, 'cursor': ''}).data
+        expected = [first['results'], self.client.get(first['next']).data['results']]
+        for ordering in ('description', '-priority', 'user__username', 'search_vector', 'id', ''):
+            with self.subTest(ordering=ordering):
+                response = self.client.get(reverse('goal-list'), {'limit': 5, 'cursor': '', 'ordering': ordering})
+                self.assertEqual(response.status_code, 200)
+                following = self.client.get(response.data['next'])
+                self.assertEqual(following.status_code, 200)
+                self.assertEqual([response.data['results'], following.data['results']], expected)
+
+    def test_goal_list_invalid_cursor(self):
+        url = reverse('goal-list')
+        next_url = self.client.get(url, {'limit': 5, 'cursor': ''}).data['next']
+        cursor = json.loads(urlsafe_b64decode(parse_qs(urlparse(next_url).query)['cursor'][0]))
+        title, pk = cursor['p']
+
+        def encode(payload) -> str:
+            return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        cursors = {
+            'not base64': 'мусор',
+            'not json': urlsafe_b64encode(b'{"o":').decode(),
+            'not object': encode([title, pk]),
+            'missing position': encode({'o': cursor['o'], 'r': False}),
+            'short position': encode({**cursor, 'p': [title]}),
+            'other ordering': encode({**cursor, 'o': ['created', 'id']}),
+            'wrong type': encode({**cursor, 'p': [title, 'abc']}),
+            'null value': encode({**cursor, 'p': [None, pk]}),
+            'nested value': encode({**cursor, 'p': [title, [pk]]}),
+        }
+        for name, value in cursors.items():
+            with self.subTest(name):
+                response = self.client.get(url, {'limit': 5, 'cursor': value})
+                self.assertEqual(response.status_code, 404)
+        # курсор одной сортировки не подходит к другой
+        response = self.client.get(url, {'limit': 5, 'cursor': encode(cursor), 'ordering': 'created'})
+        self.assertEqual(response.status_code, 404)
+        created = self.client.get(url, {'limit': 5, 'cursor': '', 'ordering': 'created'}).data['next']
+        created_cursor = json.loads(urlsafe_b64decode(parse_qs(urlparse(created).query)['cursor'][0]))
+        response = self.client.get(url, {
+            'limit': 5, 'ordering': 'created', 'cursor': encode({**created_cursor, 'p': ['вчера', pk]}),
+        })
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail_endpoints(self):
+        pks = {
+            'board-view': self.board.pk,
+            'category-view': self.category.pk,
+            'goal-view': self.goals[0].pk,
+            'comment-view': self.comment.pk,
+        }
+        for url_name, budget in self.detail_budgets.items():
+            with self.subTest(url_name=url_name):
+                self.call(budget, 'get', url_name, pk=pks[url_name])
+
+    def test_create_endpoints(self):
+        self.call(4, 'post', 'board-create', {'title': 'Новая'}, status=201)
+        self.call(4, 'post', 'category-create', {'title': 'Новая', 'board': self.board.pk}, status=201)
+        self.call(5, 'post', 'goal-create', {'title': 'Новая', 'category': self.category.pk}, status=201)
+        self.call(5, 'post', 'comment-create', {'text': 'Новый', 'goal': self.goals[0].pk}, status=201)
+
+    def test_update_endpoints(self):
+        # цель блокируется до чтения в транзакции: в тесте это еще SAVEPOINT и RELEASE
+        self.call(7, 'patch', 'goal-view', {'title': 'Изменена'}, pk=self.goals[0].pk)
+        self.call(4, 'patch', 'category-view', {'title': 'Изменена'}, pk=self.category.pk)
+        self.call(4, 'patch', 'comment-view', {'text': 'Изменен'}, pk=self.comment.pk)
+
+    def test_board_participants_sync(self):
+        for members in (self.members[:5], self.members, self.members[:10]):
+            participants = [{'user': member.username, 'role': BoardParticipant.Role.writer} for member in members]
+            self.call(12, 'put', 'board-view', {'title': 'Доска', 'participants': participants}, pk=self.board.pk)
+
+    def test_batch_endpoints(self):
+        for size in self.page_sizes:
+            goals = [{'title': f'Цель {i}', 'category': self.category.pk} for i in range(size)]
+            self.call(7, 'post', 'goal-bulk-create', goals, status=201)
+            patch = [{'id': goal.pk, 'priority': Goal.Priority.high} for goal in self.goals[:size]]
+            self.call(7, 'patch', 'goal-bulk-update', patch)
+            ids = [goal.pk for goal in self.goals[:size]]
+            self.call(6, 'post', 'goal-bulk-status', {'ids': ids, 'status': Goal.Status.done})
+
+    def test_batch_update_ids(self):
+        goal = self.goals[0]
+        patch = [{'id': goal.pk, 'title': 'Изменена'}] + [
+            {'id': pk, 'title': 'Изменена'} for pk in ([goal.pk], {'pk': goal.pk}, True, str(goal.pk), None)
+        ]
+        response = self.client.patch(reverse('goal-bulk-update'), patch, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['id'], goal.pk)
+        self.assertEqual(response.data[1:], [{'errors': {'id': ['Цель не найдена']}}] * 5)
+        self.assertEqual(list(Goal.objects.filter(title='Изменена').values_list('pk', flat=True)), [goal.pk])
+
+        response = self.client.patch(reverse('goal-bulk-update'), patch[1:], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, [{'errors': {'id': ['Цель не найдена']}}] * 5)
+
+    def test_batch_item_results(self):
+        # на чужой доске пользователь только читатель: такие элементы получают ошибку, остальные применяются
+        owner = User.objects.create(username='batch_owner')
+        board = seed_boards(owner, boards=1, categories=1, goals=1, comments=0)[0]
+        BoardParticipant.objects.create(board=board, user=self.user, role=BoardParticipant.Role.reader)
+        read_only_category = board.categories.get()
+        read_only_goal = Goal.objects.get(category=read_only_category)
+        # seed_boards пишет через bulk_create, начальные значения выставляет команда
+        call_command('check_counters', '--repair', stdout=io.StringIO())
+        denied = 'Вы должны быть владельцем или редактором доски'
+
+        response = self.client.post(reverse('goal-bulk-create'), [
+            {'title': 'Принята', 'category': self.category.pk},
+            {'title': 'Чужая доска', 'category': read_only_category.pk},
+            {'category': self.category.pk},
+            {'title': 'Тоже принята', 'category': self.category.pk},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data[0]['title'], 'Принята')
+        self.assertEqual(response.data[1], {'errors': {'category': [denied]}})
+        self.assertIn('title', response.data[2]['errors'])
+        self.assertEqual(response.data[3]['title'], 'Тоже принята')
+        self.assertEqual(Goal.objects.filter(title__in=('Принята', 'Тоже принята')).count(), 2)
+        self.assertFalse(Goal.objects.filter(category=read_only_category, title='Чужая доска').exists())
+
+        response = self.client.post(reverse('goal-bulk-create'), [
+            {'title': 'Чужая доска', 'category': read_only_category.pk},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, [{'errors': {'category': [denied]}}])
+
+        goal, moved = self.goals[0], self.goals[1]
+        response = self.client.patch(reverse('goal-bulk-update'), [
+            {'id': read_only_goal.pk, 'title': 'Изменена'},
+            {'id': goal.pk, 'title': 'Изменена'},
+            {'id': moved.pk, 'category': read_only_category.pk},
+            {'id': self.goals[2].pk, 'priority': 100},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0], {'errors': {'id': [denied]}})
+        self.assertEqual(response.data[1]['title'], 'Изменена')
+        self.assertEqual(response.data[2], {'errors': {'category': [denied]}})
+        self.assertIn('priority', response.data[3]['errors'])
+        self.assertEqual(list(Goal.objects.filter(title='Изменена').values_list('pk', flat=True)), [goal.pk])
+        self.assertEqual(Goal.objects.get(pk=moved.pk).category_id, moved.category_id)
+        self.assertEqual(check_counters(), [])
+
+    def test_delete_and_restore(self):
+        self.call(6, 'delete', 'category-view', status=204, pk=self.category.pk)
+        self.call(4, 'post', 'category-restore', pk=self.category.pk)
+        self.call(7, 'delete', 'board-view', status=204, pk=self.board.pk)
+        self.call(5, 'post', 'board-restore', pk=self.board.pk)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTest(QueryBudgetTestMixin, APITestCase):
+    """
+    Повторный опрос без изменений возвращает 304 одним агрегатным запросом, изменения меняют ETag
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='poller')
+        cls.board = seed_boards(cls.user, boards=1, categories=2, goals=5, comments=2)[0]
+        cls.goal = Goal.objects.filter(category__board=cls.board).exclude(status=Goal.Status.archived).first()
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        # фильтр goal проверяет существование цели отдельным запросом
+        self.budgets = {
+            reverse('board-view', kwargs={'pk': self.board.pk}): 1,
+            reverse('goal-list') + '?limit=10': 1,
+            reverse('comment-list') + f'?goal={self.goal.pk}': 2,
+        }
+        self.urls = tuple(self.budgets)
+
+    def test_not_modified(self):
+        for url, budget in self.budgets.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Last-Modified', response)
+                with self.assertQueryBudget(budget, url):
+                    not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+                self.assertFalse(not_modified.content)
+
+    def test_changes_invalidate_etag(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        self.client.patch(reverse('goal-view', kwargs={'pk': self.goal.pk}), {'title': 'Новая'}, format='json')
+        self.client.post(reverse('comment-create'), {'text': 'Новый', 'goal': self.goal.pk}, format='json')
+        reader = User.objects.create(username='reader')
+        BoardParticipant.objects.create(board=self.board, user=reader, role=BoardParticipant.Role.reader)
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_delete_then_if_modified_since(self):
+        url = reverse('comment-list') + f'?goal={self.goal.pk}'
+        response = self.client.get(url)
+        comment = GoalComment.objects.filter(goal=self.goal).latest('updated')
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted = self.client.delete(reverse('comment-view', kwargs={'pk': comment.pk}))
+        self.assertEqual(deleted.status_code, 204)
+        since = http_date(comment.updated.timestamp() + 60)
+        modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(modified.status_code, 200)
+        self.assertEqual(len(modified.data), len(response.data) - 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_comment_keeps_goal_updated(self):
+        url = reverse('goal-list') + '?limit=10'
+        etag = self.client.get(url)['ETag']
+        updated = Goal.objects.get(pk=self.goal.pk).updated
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('comment-create'), {'text': 'Счетчик', 'goal': self.goal.pk})
+        self.assertEqual(response.status_code, 201)
+        goal = Goal.objects.get(pk=self.goal.pk)
+        self.assertEqual(goal.updated, updated)
+        self.assertEqual(goal.comments_count, self.goal.comments_count + 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_depends_on_user_and_query(self):
+        url = reverse('goal-list')
+        etag = self.client.get(url + '?limit=10')['ETag']
+        self.assertNotEqual(self.client.get(url + '?limit=5')['ETag'], etag)
+        other = User.objects.create(username='other')
+        BoardParticipant.objects.create(board=self.board, user=other, role=BoardParticipant.Role.reader)
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url + '?limit=10', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ListCacheTest(QueryBudgetTestMixin, APITestCase):
+    """
+    Кеш списков по версиям досок: повторный запрос не выполняет выборку, запись на доске сбрасывает кеш
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='cached')
+        cls.reader = User.objects.create(username='cached_reader')
+        cls.admin = User.objects.create(username='cached_admin', is_staff=True)
+        cls.board, cls.other_board = seed_boards(cls.user, boards=2, categories=2, goals=3, comments=1)
+        BoardParticipant.objects.create(board=cls.board, user=cls.reader, role=BoardParticipant.Role.reader)
+        cls.goal = Goal.objects.filter(category__board=cls.board).exclude(status=Goal.Status.archived).first()
+
+    def setUp(self):
+        cache.clear()
+        BoardRoles.load(self.user.id)
+        self.client.force_authenticate(self.user)
+
+    def get(self, url_name: str, budget: int, cache_status: str, **params):
+        with self.assertQueryBudget(budget, url_name):
+            response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], cache_status)
+        return response
+
+    def test_hit_after_miss(self):
+        # goal-list и comment-list сначала считают валидаторы условного GET
+        for url_name, validators in (('board-list', 0), ('category-list', 0), ('goal-list', 1), ('comment-list', 1)):
+            with self.subTest(url_name=url_name):
+                miss = self.get(url_name, validators + 2, 'MISS', limit=10)
+                hit = self.get(url_name, validators, 'HIT', limit=10)
+                self.assertEqual(hit.data, miss.data)
+                self.get(url_name, validators + 2, 'MISS', limit=5)
+
+    def test_write_bumps_board_version(self):
+        self.get('goal-list', 3, 'MISS', limit=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('goal-view', kwargs={'pk': self.goal.pk}), {'title': 'Новая'}, format='json')
+        response = self.get('goal-list', 3, 'MISS', limit=10)
+        self.assertIn('Новая', [goal['title'] for goal in response.data['results']])
+
+    def test_bulk_write_bumps_board_version(self):
+        self.get('goal-list', 3, 'MISS', limit=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('goal-bulk-status'), {'ids': [self.goal.pk], 'status': Goal.Status.archived}, format='json',
+            )
+        response = self.get('goal-list', 3, 'MISS', limit=10)
+        self.assertNotIn(self.goal.pk, [goal['id'] for goal in response.data['results']])
+
+    def test_profile_update_bumps_board_version(self):
+        self.get('category-list', 2, 'MISS', limit=10)
+        # вход меняет только last_login, профиль в ответах прежний
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.last_login = timezone.now()
+            self.user.save(update_fields=('last_login',))
+        self.get('category-list', 0, 'HIT', limit=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse('profile'), {'first_name': 'Переименован'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.get('category-list', 2, 'MISS', limit=10)
+        self.assertEqual({category['user']['first_name'] for category in response.data['results']}, {'Переименован'})
+
+    def test_entries_scoped_by_roles(self):
+        self.get('board-list', 2, 'MISS', limit=10)
+        self.client.force_authenticate(self.reader)
+        response = self.get('board-list', 3, 'MISS', limit=10)
+        self.assertEqual([board['id'] for board in response.data['results']], [self.board.pk])
+
+    def test_stats(self):
+        self.get('board-list', 2, 'MISS', limit=10)
+        self.get('board-list', 0, 'HIT', limit=10)
+        self.assertEqual(self.client.get(reverse('list-cache-stats')).status_code, 403)
+        self.client.force_authenticate(self.admin)
+        stats = self.client.get(reverse('list-cache-stats')).data
+        self.assertEqual(stats['board-list'], {'hits': 1, 'misses': 1})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BoardRolesTest(APITestCase):
+    """
+    Закешированные роли меняются вместе с составом участников и ролями
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='roles_owner')
+        cls.member = User.objects.create(username='roles_member')
+        cls.board = seed_boards(cls.owner, boards=1, categories=1, goals=1, comments=0)[0]
+        cls.category = cls.board.categories.first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.owner)
+        self.member_client = APIClient()
+        self.member_client.force_authenticate(self.member)
+
+    def sync_participants(self, *participants: dict):
+        response = self.client.put(
+            reverse('board-view', kwargs={'pk': self.board.pk}),
+            {'title': self.board.title, 'participants': list(participants)},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def create_goal(self) -> int:
+        return self.member_client.post(
+            reverse('goal-create'), {'title': 'Цель участника', 'category': self.category.pk}, format='json',
+        ).status_code
+
+    def test_participant_sync(self):
+        # пустые роли закешированы до добавления
+        self.assertEqual(BoardRoles.load(self.member.id), {})
+        self.assertEqual(self.member_client.get(reverse('board-view', kwargs={'pk': self.board.pk})).status_code, 404)
+
+        self.sync_participants({'user': self.member.username, 'role': BoardParticipant.Role.writer})
+        self.assertEqual(BoardRoles.load(self.member.id), {self.board.pk: BoardParticipant.Role.writer})
+        self.assertEqual(self.member_client.get(reverse('board-view', kwargs={'pk': self.board.pk})).status_code, 200)
+        self.assertEqual(self.create_goal(), 201)
+
+        self.sync_participants({'user': self.member.username, 'role': BoardParticipant.Role.reader})
+        self.assertEqual(BoardRoles.load(self.member.id), {self.board.pk: BoardParticipant.Role.reader})
+        self.assertEqual(self.create_goal(), 403)
+
+        self.sync_participants()
+        self.assertEqual(BoardRoles.load(self.member.id), {})
+        self.assertEqual(self.member_client.get(reverse('board-view', kwargs={'pk': self.board.pk})).status_code, 404)
+        self.assertEqual(BoardRoles.load(self.owner.id), {self.board.pk: BoardParticipant.Role.owner})
+
+    def test_participant_model_changes(self):
+        self.assertEqual(BoardRoles.load(self.member.id), {})
+        participant = BoardParticipant.objects.create(
+            board=self.board, user=self.member, role=BoardParticipant.Role.reader,
+        )
+        self.assertEqual(BoardRoles.load(self.member.id), {self.board.pk: BoardParticipant.Role.reader})
+        participant.role = BoardParticipant.Role.writer
+        participant.save()
+        self.assertEqual(BoardRoles.load(self.member.id), {self.board.pk: BoardParticipant.Role.writer})
+        participant.delete()
+        self.assertEqual(BoardRoles.load(self.member.id), {})
+
+    def test_invalid_participant_sync(self):
+        self.sync_participants({'user': self.member.username, 'role': BoardParticipant.Role.reader})
+        participants = set(BoardParticipant.objects.filter(board=self.board).values_list('user_id', 'role'))
+        reader = {'user': self.member.username, 'role': BoardParticipant.Role.writer}
+        cases = {
+            'unknown and owner': [
+                {'user': 'nobody', 'role': BoardParticipant.Role.writer},
+                {'user': self.owner.username, 'role': BoardParticipant.Role.owner},
+                reader,
+            ],
+            'unknown': [reader, {'user': 'nobody', 'role': BoardParticipant.Role.reader}],
+            'duplicate': [reader, {'user': self.member.username, 'role': BoardParticipant.Role.reader}],
+        }
+        for name, payload in cases.items():
+            with self.subTest(name):
+                response = self.client.put(
+                    reverse('board-view', kwargs={'pk': self.board.pk}),
+                    {'title': 'Переименована', 'participants': payload},
+                    format='json',
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(len(response.data['participants']), len(payload))
+                self.assertEqual(
+                    set(BoardParticipant.objects.filter(board=self.board).values_list('user_id', 'role')),
+                    participants,
+                )
+                self.assertEqual(BoardRoles.load(self.member.id), {self.board.pk: BoardParticipant.Role.reader})
+                self.assertEqual(Board.objects.get(pk=self.board.pk).title, self.board.title)
+        self.assertIn('user', response.data['participants'][1])
+        self.assertEqual(response.data['participants'][0], {'user': [
+            f'Пользователь {self.member.username} указан несколько раз.',
+        ]})
+
+    def test_board_delete(self):
+        self.sync_participants({'user': self.member.username, 'role': BoardParticipant.Role.writer})
+        self.assertEqual(BoardRoles.load(self.member.id), {self.board.pk: BoardParticipant.Role.writer})
+        self.assertEqual(self.client.delete(reverse('board-view', kwargs={'pk': self.board.pk})).status_code, 204)
+        self.assertEqual(BoardRoles.load(self.member.id), {})
+        self.assertEqual(BoardRoles.load(self.owner.id), {})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FullTextSearchTest(APITestCase):
+    """
+    Поиск search= по хранимому вектору целей и по полям досок и категорий
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='searcher')
+        cls.board = seed_boards(cls.user, boards=1, categories=1, goals=0, comments=0)[0]
+        cls.category = cls.board.categories.get()
+        cls.groceries = Goal.objects.create(category=cls.category, user=cls.user, title='Купить продукты')
+        cls.shoes = Goal.objects.create(
+            category=cls.category, user=cls.user, title='Running shoes', description='Купить к марафону',
+        )
+        cls.note = Goal.objects.create(
+            category=cls.category, user=cls.user, title='Список', description='продукты на неделю',
+        )
+
+    def setUp(self):
+        # версии досок растут после коммита, а TestCase не коммитит: ответы прошлых тестов сбрасываются
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def search(self, search: str, url_name: str = 'goal-list', **params) -> list[int]:
+        response = self.client.get(reverse(url_name), {'search': search, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data]
+
+    def test_stemming(self):
+        self.assertEqual(set(self.search('продуктов')), {self.groceries.pk, self.note.pk})
+        self.assertEqual(self.search('shoe'), [self.shoes.pk])
+        self.assertEqual(self.search('run'), [self.shoes.pk])
+        self.assertEqual(self.search('марафон -продукты'), [self.shoes.pk])
+
+    def test_prefix(self):
+        self.assertEqual(set(self.search('прод')), {self.groceries.pk, self.note.pk})
+        self.assertEqual(self.search('купить прод'), [self.groceries.pk])
+        self.assertEqual(self.search('sho'), [self.shoes.pk])
+        # в кавычках префикс не ищется
+        self.assertEqual(self.search('"прод"'), [])
+
+    def test_trigger(self):
+        self.groceries.title = 'Починить велосипед'
+        self.groceries.save()
+        Goal.objects.filter(pk=self.note.pk).update(description='велосипедная прогулка')
+        self.assertEqual(self.search('продукты'), [])
+        self.assertEqual(set(self.search('велосипед')), {self.groceries.pk, self.note.pk})
+
+    def test_rank_and_ordering(self):
+        # совпадение в названии весит больше, чем в описании
+        self.assertEqual(self.search('продукты'), [self.groceries.pk, self.note.pk])
+        self.assertEqual(self.search('продукты', ordering='title'), [self.groceries.pk, self.note.pk])
+        self.assertEqual(self.search('продукты', ordering='-title'), [self.note.pk, self.groceries.pk])
+
+    def test_vector_not_loaded(self):
+        requests = (
+            ('get', reverse('goal-list'), None),
+            ('get', reverse('goal-view', kwargs={'pk': self.groceries.pk}), None),
+            ('patch', reverse('goal-view', kwargs={'pk': self.groceries.pk}), {'priority': Goal.Priority.high}),
+            ('patch', reverse('goal-bulk-update'), [{'id': self.note.pk, 'priority': Goal.Priority.high}]),
+        )
+        for method, url, data in requests:
+            with self.subTest(method=method, url=url), CaptureQueriesContext(connection) as queries:
+                self.assertEqual(getattr(self.client, method)(url, data, format='json').status_code, 200)
+            self.assertFalse([query['sql'] for query in queries if 'search_vector' in query['sql']])
+        self.assertEqual(set(self.search('продукты')), {self.groceries.pk, self.note.pk})
+
+    def test_boards_and_categories(self):
+        Board.objects.filter(pk=self.board.pk).update(title='Домашние дела')
+        GoalCategory.objects.filter(pk=self.category.pk).update(title='Shopping lists')
+        self.assertEqual(self.search('дело', 'board-list'), [self.board.pk])
+        self.assertEqual(self.search('дом', 'board-list'), [self.board.pk])
+        self.assertEqual(self.search('работа', 'board-list'), [])
+        self.assertEqual(self.search('list', 'category-list'), [self.category.pk])
+        self.assertEqual(self.search('shop', 'category-list'), [self.category.pk])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, GOALS_EXPORT_CHUNK_SIZE=7)
+class BoardExportTest(APITestCase):
+    """
+    Выгрузка доски целиком, чтение порциями меньше размера таблиц
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='exporter')
+        cls.board = seed_boards(cls.user, boards=2, categories=3, goals=5, comments=2)[0]
+        GoalCategory.objects.filter(board=cls.board).update(title='Категория, "с запятой"\nи переносом')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def export(self, export_format: str) -> bytes:
+        url = reverse('board-export', kwargs={'pk': self.board.pk})
+        response = self.client.get(url, {'export_format': export_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn(f'board-{self.board.pk}.{export_format}', response['Content-Disposition'])
+        return b''.join(response.streaming_content)
+
+    def assertRowCounts(self, rows: list[dict]):
+        types = [row['type'] for row in rows]
+        self.assertEqual(types.count('category'), 3)
+        self.assertEqual(types.count('goal'), 15)
+        self.assertEqual(types.count('comment'), 30)
+
+    def test_ndjson(self):
+        rows = [json.loads(line) for line in self.export('ndjson').splitlines()]
+        self.assertRowCounts(rows)
+        goal = next(row for row in rows if row['type'] == 'goal')
+        self.assertRegex(goal['created'], r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+        self.assertEqual(goal['author'], self.user.username)
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv').decode())))
+        self.assertRowCounts(rows)
+        self.assertEqual(rows[0]['title'], 'Категория, "с запятой"\nи переносом')
+
+    def test_access_and_format(self):
+        url = reverse('board-export', kwargs={'pk': self.board.pk})
+        self.assertEqual(self.client.get(url, {'export_format': 'xml'}).status_code, 400)
+        self.client.force_authenticate(User.objects.create(username='stranger'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile() as output:
+            call_command('export_board', self.board.pk, '--format', 'ndjson', '--output', output.name)
+            rows = [json.loads(line) for line in output.read().splitlines()]
+        self.assertRowCounts(rows)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, GOALS_EXPORT_CHUNK_SIZE=4)
+class BoardExportASGITest(TransactionTestCase):
+    """
+    Выгрузка через ASGI-приложение проекта: ленивое чтение ORM не должно идти в цикле событий
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username='exporter')
+        self.board = seed_boards(self.user, boards=1, categories=2, goals=3, comments=1)[0]
+        self.client.force_login(self.user)
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    async def test_export(self):
+        from todolist.asgi import application
+
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http',
+            'method': 'GET',
+            'path': reverse('board-export', kwargs={'pk': self.board.pk}),
+            'query_string': b'export_format=ndjson',
+            'headers': [(b'cookie', self.cookie.encode())],
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(5)
+        self.assertEqual(start['status'], 200)
+        body = b''
+        while (message := await communicator.receive_output(5)).get('more_body'):
+            body += message['body']
+        types = [json.loads(line)['type'] for line in body.splitlines()]
+        self.assertEqual((types.count('category'), types.count('goal'), types.count('comment')), (2, 6, 6))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, GOALS_IMPORT_CHUNK_SIZE=4)
+class BoardImportTest(QueryBudgetTestMixin, APITestCase):
+    """
+    Импорт целей порциями с отчетом об ошибках по строкам
+    """
+    csv_rows = (
+        'title,description,category,status,priority,due_date\n'
+        + ''.join(f'Цель {i},,Работа,{i % 4 + 1},2,2030-01-0{i % 9 + 1}\n' for i in range(10))
+        + ',,Работа,9,1,завтра\n'
+        + 'Без категории,,Отпуск,1,1,\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='importer')
+        cls.board = seed_boards(cls.user, boards=1, categories=1, goals=0, comments=0)[0]
+        cls.category = cls.board.categories.get()
+        cls.category.title = 'Работа'
+        cls.category.save()
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name: str, content: str, **params):
+        url = reverse('board-import', kwargs={'pk': self.board.pk})
+        if params:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.post(url, {'file': SimpleUploadedFile(name, content.encode())}, format='multipart')
+
+    def test_csv(self):
+        # категории, порции по 4 строки и сохранение
+        with self.assertQueryBudget(12, 'board-import'):
+            response = self.upload('goals.csv', self.csv_rows)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 10)
+        self.assertEqual([error['row'] for error in response.data['errors']], [11, 12])
+        self.assertEqual(set(response.data['errors'][0]['errors']), {'title', 'status', 'due_date'})
+        self.assertIn('category', response.data['errors'][1]['errors'])
+        self.assertEqual(Goal.objects.filter(category=self.category).count(), 10)
+
+    def test_ndjson_with_new_categories(self):
+        lines = [json.dumps({'title': f'Цель {i}', 'category': f'Новая {i % 2}'}) for i in range(6)]
+        lines.insert(3, '{broken')
+        response = self.upload('goals.txt', '\n'.join(lines), import_format='ndjson', create_categories='true')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 6)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4])
+        self.assertEqual(
+            sorted(self.board.categories.values_list('title', flat=True)), ['Новая 0', 'Новая 1', 'Работа'],
+        )
+
+    def test_rejected(self):
+        self.assertEqual(self.upload('goals.xml', '').status_code, 400)
+        response = self.upload('goals.csv', 'title,category\n,Работа\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], 0)
+
+        # нечитаемый файл не импортируется частично
+        content = self.csv_rows.encode('cp1251')
+        upload = SimpleUploadedFile('goals.csv', content)
+        response = self.client.post(reverse('board-import', kwargs={'pk': self.board.pk}), {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['errors'][-1]['errors'], {'file': ['Файл должен быть в кодировке UTF-8']})
+        self.assertFalse(Goal.objects.filter(category__board=self.board).exists())
+        with tempfile.NamedTemporaryFile(suffix='.ndjson') as file:
+            file.write('{"title": "Цель", "category": "Работа"}\n'.encode('cp1251'))
+            file.flush()
+            with self.assertRaisesMessage(CommandError, 'кодировке UTF-8'):
+                call_command('import_goals', self.board.pk, file.name, user=self.user.username)
+
+        reader = User.objects.create(username='import_reader')
+        BoardParticipant.objects.create(board=self.board, user=reader, role=BoardParticipant.Role.reader)
+        self.client.force_authenticate(reader)
+        self.assertEqual(self.upload('goals.csv', self.csv_rows).status_code, 404)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as file:
+            file.write(self.csv_rows.encode())
+            file.flush()
+            stdout, stderr = io.StringIO(), io.StringIO()
+            call_command(
+                'import_goals', self.board.pk, file.name, user=self.user.username, stdout=stdout, stderr=stderr,
+            )
+        self.assertIn('Создано целей: 10, ошибок: 2', stdout.getvalue())
+        self.assertIn('Строка 12: category', stderr.getvalue())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BoardStatsTest(QueryBudgetTestMixin, APITestCase):
+    """
+    Сводная статистика совпадает с подсчетом по целям после любых путей записи
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='stats')
+        cls.board = seed_boards(cls.user, boards=1, categories=3, goals=8, comments=0)[0]
+        cls.categories = list(cls.board.categories.order_by('id'))
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def expected_stats(self) -> dict:
+        goals = Goal.objects.filter(category__board=self.board, category__is_deleted=False)
+        overdue = goals.filter(
+            status__in=(Goal.Status.to_do, Goal.Status.in_progress), due_date__lt=timezone.localdate(),
+        )
+        active = goals.exclude(status=Goal.Status.archived)
+        return {
+            'total': active.count(),
+            'overdue': overdue.count(),
+            'by_status': {status.name: goals.filter(status=status).count() for status in Goal.Status},
+            'by_priority': {priority.name: active.filter(priority=priority).count() for priority in Goal.Priority},
+        }
+
+    def assertStatsConsistent(self):
+        cache.clear()
+        with self.assertQueryBudget(5, 'board-stats'):
+            response = self.client.get(reverse('board-stats', kwargs={'pk': self.board.pk}))
+        self.assertEqual(response.status_code, 200)
+        stats = response.data
+        summary = {key: stats[key] for key in ('total', 'overdue', 'by_status', 'by_priority')}
+        self.assertEqual(summary, self.expected_stats())
+        self.assertEqual(sum(category['total'] for category in stats['categories']), stats['total'])
+
+    def test_write_paths(self):
+        category = self.categories[0]
+        goal = Goal.objects.filter(category=category).first()
+        self.assertStatsConsistent()
+
+        self.client.post(reverse('goal-create'), {
+            'title': 'Просрочена', 'category': category.pk, 'due_date': '2000-01-01',
+        }, format='json')
+        self.client.patch(reverse('goal-view', kwargs={'pk': goal.pk}), {
+            'status': Goal.Status.in_progress, 'priority': Goal.Priority.critical, 'due_date': '2000-01-02',
+        }, format='json')
+        self.assertStatsConsistent()
+
+        # одно выражение с измененными и неизмененными строками и UPDATE без полей статистики
+        goals = Goal.objects.filter(category=self.categories[1])
+        goals.filter(pk=goals.first().pk).update(priority=Goal.Priority.low)
+        goals.update(priority=Goal.Priority.low)
+        goals.update(title='Без статистики')
+        self.client.post(reverse('comment-create'), {'text': 'Счетчик', 'goal': goal.pk}, format='json')
+        self.assertStatsConsistent()
+
+        self.client.post(reverse('goal-bulk-status'), {
+            'ids': list(Goal.objects.filter(category=self.categories[1]).values_list('id', flat=True)),
+            'status': Goal.Status.done,
+        }, format='json')
+        self.client.post(reverse('goal-bulk-create'), [
+            {'title': f'Пакет {i}', 'category': self.categories[2].pk, 'due_date': '2001-01-01'} for i in range(5)
+        ], format='json')
+        self.assertStatsConsistent()
+
+        with self.settings(GOALS_DELETE_MODE='cascade'):
+            self.client.delete(reverse('category-view', kwargs={'pk': self.categories[2].pk}))
+        Goal.objects.filter(pk=goal.pk).delete()
+        self.assertStatsConsistent()
+
+    def test_rebuild(self):
+        GoalStat.objects.filter(category=self.categories[0]).update(count=100)
+        GoalStat.objects.filter(category=self.categories[1]).delete()
+        stdout = io.StringIO()
+        call_command('rebuild_goal_stats', '--dry-run', board=self.board.pk, stdout=stdout)
+        self.assertNotEqual(board_stats(self.board)['total'], self.expected_stats()['total'])
+        self.assertNotIn('Расхождений найдено: 0', stdout.getvalue())
+
+        call_command('rebuild_goal_stats', board=self.board.pk, stdout=io.StringIO())
+        self.assertStatsConsistent()
+        stdout = io.StringIO()
+        call_command('rebuild_goal_stats', stdout=stdout)
+        self.assertIn('Расхождений исправлено: 0', stdout.getvalue())
+
+
+class GoalCountersTest(APITestCase):
+    """
+    Счетчики активных целей и комментариев совпадают с фактическими после любых путей записи
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='counters')
+        cls.board = seed_boards(cls.user, boards=1, categories=3, goals=8, comments=2)[0]
+        # seed_boards пишет через bulk_create, начальные значения выставляет команда
+        call_command('check_counters', '--repair', stdout=io.StringIO())
+        cls.categories = list(cls.board.categories.order_by('id'))
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def assertCountersConsistent(self):
+        self.assertEqual(check_counters(), [])
+
+    def test_write_paths(self):
+        category = self.categories[0]
+        goal = Goal.objects.filter(category=category).exclude(status=Goal.Status.archived).first()
+
+        response = self.client.post(reverse('goal-create'), {'title': 'Новая', 'category': category.pk}, format='json')
+        self.assertEqual(response.data['comments_count'], 0)
+        self.client.patch(reverse('goal-view', kwargs={'pk': goal.pk}), {
+            'status': Goal.Status.archived,
+        }, format='json')
+        self.client.post(reverse('comment-create'), {'text': 'Новый', 'goal': response.data['id']}, format='json')
+        self.assertCountersConsistent()
+
+        goals = list(Goal.objects.filter(category=self.categories[1]).exclude(status=Goal.Status.archived))
+        response = self.client.patch(reverse('goal-bulk-update'), [
+            {'id': goals[0].pk, 'category': self.categories[2].pk},
+            {'id': goals[1].pk, 'status': Goal.Status.archived},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.post(reverse('goal-bulk-status'), {
+            'ids': [goal.pk for goal in goals[2:]],
+            'status': Goal.Status.archived,
+        }, format='json')
+        self.client.post(reverse('goal-bulk-create'), [
+            {'title': f'Пакет {i}', 'category': self.categories[2].pk, 'status': i % 4 + 1} for i in range(5)
+        ], format='json')
+        self.assertCountersConsistent()
+
+        comment = GoalComment.objects.filter(goal__category__board=self.board).first()
+        self.assertEqual(self.client.delete(reverse('comment-view', kwargs={'pk': comment.pk})).status_code, 204)
+        goal = Goal.objects.filter(category=category).exclude(status=Goal.Status.archived).last()
+        self.assertEqual(self.client.delete(reverse('goal-view', kwargs={'pk': goal.pk})).status_code, 204)
+        with self.settings(GOALS_DELETE_MODE='cascade'):
+            self.client.delete(reverse('category-view', kwargs={'pk': self.categories[2].pk}))
+        self.assertCountersConsistent()
+
+    def test_serializers(self):
+        category = self.categories[0]
+        response = self.client.get(reverse('category-view', kwargs={'pk': category.pk}))
+        self.assertEqual(
+            response.data['active_goals_count'],
+            Goal.objects.filter(category=category).exclude(status=Goal.Status.archived).count(),
+        )
+        goal = Goal.objects.filter(category=category).exclude(status=Goal.Status.archived).first()
+        response = self.client.patch(
+            reverse('goal-view', kwargs={'pk': goal.pk}), {'comments_count': 100}, format='json',
+        )
+        self.assertEqual(response.data['comments_count'], goal.comments.count())
+
+    def test_save_keeps_counters(self):
+        category = GoalCategory.objects.get(pk=self.categories[0].pk)
+        Goal.objects.create(category=category, user=self.user, title='Параллельная')
+        category.title = 'Переименована'
+        category.save()
+        self.assertCountersConsistent()
+
+    def test_save_missing_row_inserts(self):
+        category = GoalCategory.objects.create(board=self.board, user=self.user, title='Пустая')
+        GoalCategory.objects.filter(pk=category.pk).delete()
+        category.save()
+        self.assertTrue(GoalCategory.objects.filter(pk=category.pk, title=category.title).exists())
+
+    def test_repair(self):
+        GoalCategory.objects.filter(pk=self.categories[0].pk).update(active_goals_count=100)
+        Goal.objects.filter(category=self.categories[1]).update(comments_count=-1)
+        stdout = io.StringIO()
+        call_command('check_counters', board=self.board.pk, stdout=stdout)
+        self.assertNotIn('Расхождений найдено: 0', stdout.getvalue())
+        self.assertNotEqual(check_counters(), [])
+
+        call_command('check_counters', '--repair', board=self.board.pk, stdout=io.StringIO())
+        self.assertCountersConsistent()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GoalCountersLockTest(APITransactionTestCase):
+    """
+    Параллельные изменения одной цели (архивирование, перенос в другую категорию) не сбивают счетчики:
+    второй запрос ждет блокировку строки и видит результат первого
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username='counters')
+        self.board = seed_boards(self.user, boards=1, categories=2, goals=4, comments=0)[0]
+        call_command('check_counters', '--repair', stdout=io.StringIO())
+        self.categories = list(self.board.categories.order_by('id'))
+        self.goal = Goal.objects.filter(category=self.categories[0]).exclude(status=Goal.Status.archived).first()
+        self.client.force_authenticate(self.user)
+
+    def archive(self, client: APIClient):
+        return client.post(reverse('goal-bulk-status'), {
+            'ids': [self.goal.pk], 'status': Goal.Status.archived,
+        }, format='json')
+
+    def move(self, client: APIClient):
+        return client.patch(reverse('goal-bulk-update'), [
+            {'id': self.goal.pk, 'category': self.categories[1].pk},
+        ], format='json')
+
+    def archive_one(self, client: APIClient):
+        return client.patch(reverse('goal-view', kwargs={'pk': self.goal.pk}), {
+            'status': Goal.Status.archived,
+        }, format='json')
+
+    def request_in_thread(self, request, responses: list):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            responses.append(request(client))
+        finally:
+            connection.close()
+
+    def run_concurrently(self, first, second):
+        """
+        Первый запрос выполняется в незавершенной транзакции, второй - в другом соединении
+        """
+        responses = []
+        with transaction.atomic():
+            first_response = first(self.client)
+            thread = threading.Thread(target=self.request_in_thread, args=(second, responses))
+            thread.start()
+            # второй запрос ждет блокировку строки цели до фиксации первого
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+        thread.join()
+        self.assertEqual(check_counters(), [])
+        return first_response, responses[0]
+
+    def test_concurrent_archive(self):
+        first, second = self.run_concurrently(self.archive, self.archive)
+        self.assertEqual(first.data, [{'id': self.goal.pk, 'status': Goal.Status.archived}])
+        self.assertEqual(second.data, [{'id': self.goal.pk, 'error': 'Цель не найдена или недостаточно прав'}])
+
+    def test_batch_patch_after_archive(self):
+        _, second = self.run_concurrently(self.archive, self.move)
+        self.assertEqual(second.status_code, 400)
+        self.assertEqual(Goal.objects.get(pk=self.goal.pk).category_id, self.categories[0].pk)
+
+    def test_patch_after_batch_patch(self):
+        first, second = self.run_concurrently(self.move, self.archive_one)
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        goal = Goal.objects.get(pk=self.goal.pk)
+        self.assertEqual((goal.category_id, goal.status), (self.categories[1].pk, Goal.Status.archived))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GoalArchiveTest(APITestCase):
+    """
+    Старые архивные цели с комментариями переносятся в архивные таблицы и возвращаются оттуда
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='archivist')
+        cls.board = seed_boards(cls.user, boards=1, categories=1, goals=8, comments=2)[0]
+        call_command('check_counters', '--repair', stdout=io.StringIO())
+        cls.category = cls.board.categories.get()
+        cls.old_goal, cls.recent_goal = Goal.objects.filter(
+            category=cls.category, status=Goal.Status.archived,
+        ).order_by('pk')
+        # старыми становятся и архивная, и активные цели: переносятся только архивные
+        old = timezone.now() - timezone.timedelta(days=settings.GOALS_ARCHIVE_AFTER_DAYS + 1)
+        Goal.objects.filter(category=cls.category).exclude(pk=cls.recent_goal.pk).update(updated=old, created=old)
+        cls.old_goal.refresh_from_db()
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_archive(self):
+        stdout = io.StringIO()
+        call_command('archive_goals', '--batch-size', 1, stdout=stdout)
+        self.assertIn('целей: 1, комментариев: 2', stdout.getvalue())
+
+        self.assertFalse(Goal.objects.filter(pk=self.old_goal.pk).exists())
+        self.assertFalse(GoalComment.objects.filter(goal_id=self.old_goal.pk).exists())
+        self.assertEqual(list(ArchivedGoal.objects.values_list('pk', flat=True)), [self.old_goal.pk])
+        self.assertEqual(ArchivedComment.objects.filter(goal_id=self.old_goal.pk).count(), 2)
+        self.assertTrue(Change.objects.filter(
+            entity=Change.Entity.goal, action=Change.Action.delete, object_id=self.old_goal.pk,
+        ).exists())
+        self.assertEqual(check_counters(), [])
+
+        response = self.client.get(reverse('archived-goal-list'), {'category__board': self.board.pk})
+        self.assertEqual([goal['id'] for goal in response.data], [self.old_goal.pk])
+        response = self.client.get(reverse('archived-comment-list'), {'goal': self.old_goal.pk})
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['user']['username'], self.user.username)
+        url = reverse('archived-goal-view', kwargs={'pk': self.old_goal.pk})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.delete(url).status_code, 405)
+
+        self.client.force_authenticate(User.objects.create(username='stranger'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(reverse('archived-goal-list')).data, [])
+
+    def test_archive_search(self):
+        Goal.objects.filter(pk=self.old_goal.pk).update(title='Ремонт крыши')
+        call_command('archive_goals', stdout=io.StringIO())
+        response = self.client.get(reverse('archived-goal-list'), {'search': 'крыша'})
+        self.assertEqual([goal['id'] for goal in response.data], [self.old_goal.pk])
+        # полнотекстовый поиск, как у рабочих целей: подстроки внутри слова не находятся
+        self.assertEqual(self.client.get(reverse('archived-goal-list'), {'search': 'емонт'}).data, [])
+
+    def test_archive_old_comments(self):
+        goal = Goal.objects.filter(category=self.category).exclude(status=Goal.Status.archived).first()
+        old = timezone.now() - timezone.timedelta(days=settings.GOALS_ARCHIVE_COMMENTS_AFTER_DAYS + 1)
+        GoalComment.objects.filter(goal=goal).update(updated=old)
+        stdout = io.StringIO()
+        call_command('archive_goals', '--batch-size', 1, stdout=stdout)
+        self.assertIn('целей: 1, комментариев: 4', stdout.getvalue())
+
+        self.assertFalse(GoalComment.objects.filter(goal=goal).exists())
+        self.assertEqual(Goal.objects.get(pk=goal.pk).comments_count, 2)
+        self.assertEqual(check_counters(), [])
+        response = self.client.get(reverse('archived-comment-list'), {'active_goal': goal.pk})
+        self.assertEqual([comment['active_goal'] for comment in response.data], [goal.pk, goal.pk])
+        self.client.force_authenticate(User.objects.create(username='stranger'))
+        self.assertEqual(self.client.get(reverse('archived-comment-list'), {'active_goal': goal.pk}).data, [])
+
+        # цель уходит в архив вслед за своими старыми комментариями
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse('goal-bulk-status'), {'ids': [goal.pk], 'status': Goal.Status.archived}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        Goal.objects.filter(pk=goal.pk).update(updated=old)
+        call_command('archive_goals', stdout=io.StringIO())
+        self.assertEqual(ArchivedComment.objects.filter(goal_id=goal.pk).count(), 2)
+        self.assertFalse(ArchivedComment.objects.filter(active_goal__isnull=False).exists())
+
+        call_command('rehydrate_goal', goal.pk, stdout=io.StringIO())
+        self.assertEqual(GoalComment.objects.filter(goal_id=goal.pk).count(), 2)
+        self.assertEqual(check_counters(), [])
+
+    def test_deleted_category(self):
+        call_command('archive_goals', stdout=io.StringIO())
+        GoalCategory.objects.filter(pk=self.category.pk).update(is_deleted=True)
+        self.assertEqual(self.client.get(reverse('archived-goal-list')).data, [])
+        url = reverse('archived-goal-view', kwargs={'pk': self.old_goal.pk})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(reverse('archived-comment-list'), {'goal': self.old_goal.pk}).data, [])
+
+        GoalCategory.objects.filter(pk=self.category.pk).update(is_deleted=False)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_rehydrate(self):
+        call_command('archive_goals', stdout=io.StringIO())
+        active_goals = GoalCategory.objects.get(pk=self.category.pk).active_goals_count
+
+        call_command('rehydrate_goal', self.old_goal.pk, stdout=io.StringIO())
+        goal = Goal.objects.get(pk=self.old_goal.pk)
+        self.assertEqual(goal.status, Goal.Status.to_do)
+        self.assertEqual(goal.created, self.old_goal.created)
+        self.assertEqual(goal.comments.count(), 2)
+        self.assertFalse(ArchivedGoal.objects.exists())
+        self.assertFalse(ArchivedComment.objects.exists())
+        self.assertEqual(GoalCategory.objects.get(pk=self.category.pk).active_goals_count, active_goals + 1)
+        self.assertEqual(check_counters(), [])
+        self.assertEqual(self.client.get(reverse('goal-view', kwargs={'pk': goal.pk})).status_code, 200)
+
+        with self.assertRaisesMessage(CommandError, 'не найдена в архиве'):
+            call_command('rehydrate_goal', self.old_goal.pk)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SyncTest(APITransactionTestCase):
+    """
+    Синхронизация по курсору возвращает только изменения после курсора, включая массовые пути и удаления.
+    Журнал видит только завершенные транзакции, поэтому тест работает без общей транзакции.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username='sync')
+        self.other = User.objects.create(username='other')
+        self.board = seed_boards(self.user, boards=1, categories=2, goals=4, comments=1)[0]
+        self.other_board = seed_boards(self.other, boards=1, categories=1, goals=2, comments=0)[0]
+        self.categories = list(self.board.categories.order_by('id'))
+        self.client.force_authenticate(self.user)
+
+    def sync(self, cursor: str | None = None, **params) -> dict:
+        if cursor is not None:
+            params['cursor'] = cursor
+        response = self.client.get(reverse('sync'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    @staticmethod
+    def ids(data: dict, name: str) -> set[int]:
+        return {item['id'] for item in data[name]}
+
+    def test_snapshot_and_changes(self):
+        snapshot = self.sync()
+        self.assertEqual(self.ids(snapshot, 'boards'), {self.board.pk})
+        active_goals = Goal.objects.filter(category__board=self.board).exclude(status=Goal.Status.archived)
+        self.assertEqual(self.ids(snapshot, 'goals'), set(active_goals.values_list('id', flat=True)))
+        self.assertEqual(len(snapshot['comments']), GoalComment.objects.filter(goal__in=active_goals).count())
+
+        empty = self.sync(snapshot['cursor'])
+        self.assertEqual([empty[name] for name in ('boards', 'categories', 'goals', 'comments')], [[]] * 4)
+        self.assertFalse(any(empty['deleted'].values()))
+
+        goals = list(active_goals.filter(category=self.categories[0]).order_by('id'))
+        created = self.client.post(reverse('goal-create'), {
+            'title': 'Новая', 'category': self.categories[0].pk,
+        }, format='json').data
+        self.client.patch(reverse('goal-bulk-update'), [{'id': goals[0].pk, 'title': 'Изменена'}], format='json')
+        self.client.post(reverse('goal-bulk-status'), {
+            'ids': [goals[1].pk], 'status': Goal.Status.archived,
+        }, format='json')
+        comment = GoalComment.objects.filter(goal__category__board=self.board).first()
+        self.client.delete(reverse('comment-view', kwargs={'pk': comment.pk}))
+        Goal.objects.filter(category__board=self.other_board).update(title='Чужая')
+
+        changes = self.sync(empty['cursor'])
+        self.assertEqual(self.ids(changes, 'goals'), {created['id'], goals[0].pk})
+        self.assertEqual(changes['deleted']['goals'], [goals[1].pk])
+        self.assertEqual(changes['deleted']['comments'], [comment.pk])
+        # счетчики категорий и комментариев тоже изменились
+        self.assertEqual(self.ids(changes, 'categories'), {self.categories[0].pk})
+
+        with self.settings(GOALS_DELETE_MODE='cascade'):
+            self.client.delete(reverse('category-view', kwargs={'pk': self.categories[1].pk}))
+        changes = self.sync(changes['cursor'])
+        self.assertEqual(changes['deleted']['categories'], [self.categories[1].pk])
+        self.assertEqual(
+            set(changes['deleted']['goals']),
+            set(Goal.objects.filter(category=self.categories[1]).values_list('id', flat=True)),
+        )
+
+    def test_membership(self):
+        cursor = self.sync()['cursor']
+        participant = BoardParticipant.objects.create(
+            board=self.other_board, user=self.user, role=BoardParticipant.Role.reader,
+        )
+        joined = self.sync(cursor)
+        self.assertEqual(self.ids(joined, 'boards'), {self.other_board.pk})
+        self.assertEqual(
+            self.ids(joined, 'goals'),
+            set(Goal.objects.filter(category__board=self.other_board).exclude(
+                status=Goal.Status.archived,
+            ).values_list('id', flat=True)),
+        )
+
+        participant.delete()
+        left = self.sync(joined['cursor'])
+        self.assertEqual(left['deleted']['boards'], [self.other_board.pk])
+
+    def test_restore(self):
+        active_goals = Goal.objects.exclude(status=Goal.Status.archived)
+        category = self.categories[0]
+        cursor = self.sync()['cursor']
+        with self.settings(GOALS_DELETE_MODE='tombstone'):
+            self.client.delete(reverse('category-view', kwargs={'pk': category.pk}))
+            deleted = self.sync(cursor)
+            self.assertEqual(deleted['deleted']['categories'], [category.pk])
+
+            self.client.post(reverse('category-restore', kwargs={'pk': category.pk}))
+            restored = self.sync(deleted['cursor'])
+            self.assertEqual(self.ids(restored, 'categories'), {category.pk})
+            goals = set(active_goals.filter(category=category).values_list('id', flat=True))
+            self.assertTrue(goals)
+            self.assertEqual(self.ids(restored, 'goals'), goals)
+            self.assertEqual(self.ids(restored, 'comments'), set(GoalComment.objects.filter(
+                goal__in=goals,
+            ).values_list('id', flat=True)))
+
+            self.client.delete(reverse('board-view', kwargs={'pk': self.board.pk}))
+            deleted = self.sync(restored['cursor'])
+            self.assertEqual(deleted['deleted']['boards'], [self.board.pk])
+
+            self.client.post(reverse('board-restore', kwargs={'pk': self.board.pk}))
+            restored = self.sync(deleted['cursor'])
+        self.assertEqual(self.ids(restored, 'boards'), {self.board.pk})
+        self.assertEqual(self.ids(restored, 'categories'), {category.pk for category in self.categories})
+        self.assertEqual(
+            self.ids(restored, 'goals'),
+            set(active_goals.filter(category__board=self.board).values_list('id', flat=True)),
+        )
+
+    def test_pages(self):
+        cursor = self.sync()['cursor']
+        Goal.objects.filter(category__board=self.board).update(priority=Goal.Priority.high)
+        expected = set(Goal.objects.filter(category__board=self.board).values_list('id', flat=True))
+
+        seen, pages = set(), 0
+        while True:
+            page = self.sync(cursor, limit=3)
+            seen |= self.ids(page, 'goals') | set(page['deleted']['goals'])
+            cursor, pages = page['cursor'], pages + 1
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, expected)
+        self.assertGreater(pages, 1)
+
+    def test_snapshot_pages(self):
+        full = self.sync()
+        self.assertFalse(full['has_more'])
+        page = self.sync(limit=4)
+        seen = {name: self.ids(page, name) for name in ('boards', 'categories', 'goals', 'comments')}
+        self.assertTrue(page['has_more'])
+        created = None
+        while page['has_more']:
+            if created is None:
+                # изменение во время чтения снимка приходит не позже первой синхронизации после него
+                created = self.client.post(reverse('goal-create'), {
+                    'title': 'Во время снимка', 'category': self.categories[0].pk,
+                }, format='json').data
+            page = self.sync(page['cursor'], limit=4)
+            self.assertLessEqual(sum(len(page[name]) for name in seen), 4)
+            for name in seen:
+                self.assertFalse(seen[name] & self.ids(page, name))
+                seen[name] |= self.ids(page, name)
+        for name in seen:
+            self.assertEqual(seen[name] - {created['id']}, self.ids(full, name))
+        changes = self.sync(page['cursor'])
+        self.assertIn(created['id'], self.ids(changes, 'goals'))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(reverse('sync'), {'cursor': 'мусор'}).status_code, 400)
+        tampered = SyncCursor(1, 0, int(time.time()), (len(SYNC_COLLECTIONS), 0)).encode()
+        self.assertEqual(self.client.get(reverse('sync'), {'cursor': tampered}).status_code, 400)
+        expired = SyncCursor(1, 0, 0).encode()
+        self.assertEqual(self.client.get(reverse('sync'), {'cursor': expired}).status_code, 410)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, GOALS_PUSH_BROKER='goals.push.InMemoryBroker', GOALS_PUSH_HEARTBEAT=5)
+class BoardEventsTest(TestCase):
+    """
+    Поток событий досок: только доски пользователя, подписка на новые доски без переподключения
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='events')
+        cls.other = User.objects.create(username='other')
+        cls.board = seed_boards(cls.user, boards=1, categories=1, goals=1, comments=0)[0]
+        cls.other_board = seed_boards(cls.other, boards=1, categories=1, goals=1, comments=0)[0]
+
+    def setUp(self):
+        # как и тестовый клиент Django, не закрываем соединение внутри тестовой транзакции
+        patcher = mock.patch('goals.events.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.user)
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    async def connect(self, query: str = '', cookie: bool = True) -> tuple[ApplicationCommunicator, dict]:
+        communicator = ApplicationCommunicator(BoardEventsApp(), {
+            'type': 'http',
+            'method': 'GET',
+            'path': '/goals/events',
+            'query_string': query.encode(),
+            'headers': [(b'cookie', self.cookie.encode())] if cookie else [],
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(1)
+        if start['status'] == 200:
+            self.assertEqual((await communicator.receive_output(1))['body'], b'retry: 1000\n\n')
+        return communicator, start
+
+    async def receive_event(self, communicator: ApplicationCommunicator) -> dict:
+        body = (await communicator.receive_output(1))['body'].decode()
+        self.assertTrue(body.startswith('event: change\ndata: '), body)
+        return json.loads(body.split('data: ', 1)[1])
+
+    def write(self, func, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return func(*args, **kwargs)
+
+    async def test_access(self):
+        _, start = await self.connect(cookie=False)
+        self.assertEqual(start['status'], 403)
+        _, start = await self.connect(f'board={self.other_board.pk}')
+        self.assertEqual(start['status'], 404)
+
+    async def test_board_events(self):
+        communicator, start = await self.connect()
+        self.assertEqual(start['status'], 200)
+        category = await GoalCategory.objects.filter(board=self.other_board).afirst()
+        await sync_to_async(self.write)(Goal.objects.create, category=category, user=self.other, title='Чужая')
+        self.assertTrue(await communicator.receive_nothing(0.2))
+
+        category = await GoalCategory.objects.filter(board=self.board).afirst()
+        started = time.perf_counter()
+        goal = await sync_to_async(self.write)(Goal.objects.create, category=category, user=self.user, title='Новая')
+        event = await self.receive_event(communicator)
+        self.assertLess(time.perf_counter() - started, 0.1)
+        self.assertEqual(event, {
+            'type': 'change', 'board': self.board.pk, 'entity': 'goal', 'action': 'save', 'id': goal.pk,
+        })
+
+        await sync_to_async(self.write)(
+            self.client.post, reverse('goal-bulk-status'), {'ids': [goal.pk], 'status': Goal.Status.done},
+            content_type='application/json',
+        )
+        event = await self.receive_event(communicator)
+        self.assertEqual((event['entity'], event['action']), ('goal', 'bulk'))
+
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(1)
+        self.assertEqual(get_broker().subscribers, {})
+
+    async def test_membership(self):
+        communicator, _ = await self.connect()
+        participant = await sync_to_async(self.write)(
+            BoardParticipant.objects.create, board=self.other_board, user=self.user, role=BoardParticipant.Role.reader,
+        )
+        event = await self.receive_event(communicator)
+        self.assertEqual((event['board'], event['entity']), (self.other_board.pk, 'participant'))
+
+        category = await GoalCategory.objects.filter(board=self.other_board).afirst()
+        await sync_to_async(self.write)(GoalComment.objects.create, goal=await Goal.objects.filter(
+            category=category,
+        ).afirst(), user=self.other, text='Новый')
+        event = await self.receive_event(communicator)
+        self.assertEqual((event['board'], event['entity']), (self.other_board.pk, 'comment'))
+
+        await sync_to_async(self.write)(participant.delete)
+        event = await self.receive_event(communicator)
+        self.assertEqual((event['entity'], event['action']), ('participant', 'delete'))
+        # событие membership отписывает поток от доски
+        self.assertTrue(await communicator.receive_nothing(0.1))
+        await sync_to_async(self.write)(Goal.objects.create, category=category, user=self.other, title='Чужая')
+        self.assertTrue(await communicator.receive_nothing(0.2))
+
+    async def test_coalesced_events(self):
+        communicator, _ = await self.connect()
+        category = await GoalCategory.objects.filter(board=self.board).afirst()
+
+        def rolled_back():
+            with transaction.atomic():
+                Goal.objects.create(category=category, user=self.user, title='Откачена')
+                transaction.set_rollback(True)
+
+        await sync_to_async(self.write)(rolled_back)
+        self.assertTrue(await communicator.receive_nothing(0.2))
+
+        def several_writes():
+            with transaction.atomic():
+                goal = Goal.objects.create(category=category, user=self.user, title='Новая')
+                goal.title = 'Изменена'
+                goal.save()
+                GoalComment.objects.create(goal=goal, user=self.user, text='Новый')
+
+        await sync_to_async(self.write)(several_writes)
+        event = await self.receive_event(communicator)
+        self.assertEqual(
+            event, {'type': 'change', 'board': self.board.pk, 'entity': None, 'action': 'bulk', 'id': None}
+        )
+        self.assertTrue(await communicator.receive_nothing(0.2))
+
+    @override_settings(GOALS_PUSH_HEARTBEAT=0.1)
+    async def test_heartbeat(self):
+        communicator, _ = await self.connect()
+        self.assertEqual((await communicator.receive_output(1))['body'], b': ping\n\n')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'LISTEN/NOTIFY есть только в PostgreSQL')
+@override_settings(GOALS_PUSH_BROKER='goals.push.PostgresBroker')
+class PostgresBrokerTest(TransactionTestCase):
+    """
+    Уведомления доходят до подписчиков другого соединения только после фиксации транзакции
+    """
+
+    async def test_notify(self):
+        broker = get_broker()
+        self.addCleanup(broker.stop)
+        subscription = broker.subscribe({'board:1'})
+        await asyncio.sleep(0.2)
+
+        @sync_to_async
+        def publish(rollback: bool):
+            with transaction.atomic():
+                broker.publish([('board:1', {'type': 'change', 'rollback': rollback})])
+                transaction.set_rollback(rollback)
+
+        await publish(True)
+        await publish(False)
+        started = time.perf_counter()
+        self.assertEqual(await asyncio.wait_for(subscription.get(), 1), {'type': 'change', 'rollback': False})
+        self.assertLess(time.perf_counter() - started, 0.1)
+        subscription.close()
+
+    def test_notify_after_commit(self):
+        user = User.objects.create(username='notify')
+        category = seed_boards(user, boards=1, categories=1, goals=0, comments=0)[0].categories.get()
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                for i in range(3):
+                    Goal.objects.create(category=category, user=user, title=f'Цель {i}')
+                self.assertFalse([query for query in queries if 'pg_notify' in query['sql']])
+        notifies = [query['sql'] for query in queries if 'pg_notify' in query['sql']]
+        # одно событие доски за транзакцию
+        self.assertEqual(len(notifies), 1)
+        self.assertEqual(notifies[0].count('pg_notify'), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncReadViewsTest(TestCase):
+    """
+    GET списков и доски обслуживается корутиной через асинхронный ORM, запись остается синхронной
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='async')
+        cls.other = User.objects.create(username='other')
+        cls.board = seed_boards(cls.user, boards=1, categories=1, goals=4, comments=2)[0]
+        cls.other_board = seed_boards(cls.other, boards=1, categories=1, goals=1, comments=0)[0]
+        cls.goal = Goal.objects.filter(category__board=cls.board).exclude(status=Goal.Status.archived).first()
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+
+    def test_views_are_async(self):
+        for name, kwargs in (('board-list', {}), ('board-view', {'pk': 1}), ('goal-list', {}), ('comment-list', {})):
+            with self.subTest(name=name):
+                view = resolve(reverse(name, kwargs=kwargs)).func
+                self.assertTrue(asyncio.iscoroutinefunction(view))
+                self.assertTrue(view.csrf_exempt)
+
+    async def test_lists(self):
+        response = await self.async_client.get(reverse('board-list'))
+        self.assertEqual([board['id'] for board in response.json()], [self.board.pk])
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual((await self.async_client.get(reverse('board-list')))['X-Cache'], 'HIT')
+
+        response = await self.async_client.get(reverse('goal-list'), {'limit': 2})
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(len(response.json()['results']), 2)
+        response = await self.async_client.get(reverse('goal-list'), {'cursor': '', 'limit': 2})
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNotNone(response.json()['next'])
+        response = await self.async_client.get(response.json()['next'])
+        self.assertEqual(len(response.json()['results']), 1)
+
+        url = reverse('comment-list')
+        response = await self.async_client.get(url, {'goal': self.goal.pk})
+        self.assertEqual([comment['user']['username'] for comment in response.json()], ['async', 'async'])
+        # AsyncClient передает дополнительные параметры заголовками ASGI как есть
+        not_modified = await self.async_client.get(url, {'goal': self.goal.pk}, **{'if-none-match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual((await self.async_client.get(url, {'goal': 0})).status_code, 400)
+
+    async def test_board(self):
+        response = await self.async_client.get(reverse('board-view', kwargs={'pk': self.board.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([participant['user'] for participant in response.json()['participants']], ['async'])
+        response = await self.async_client.get(reverse('board-view', kwargs={'pk': self.other_board.pk}))
+        self.assertEqual(response.status_code, 404)
+
+        response = await self.async_client.put(
+            reverse('board-view', kwargs={'pk': self.board.pk}), {'title': 'Новая', 'participants': []},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['title'], 'Новая')
+
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(reverse('board-view', kwargs={'pk': self.board.pk}))
+        self.assertEqual(response.status_code, 403)
@@ -5,7 +5,11 @@ urlpatterns = [
     path('goal_category/create', views.GoalCategoryCreateView.as_view(), name='category-create'),
     path('goal_category/list', views.GoalCategoryListView.as_view(), name='category-list'),
     path('goal_category/<int:pk>', views.GoalCategoryView.as_view(), name='category-view'),
+    path('goal_category/<int:pk>/restore', views.GoalCategoryRestoreView.as_view(), name='category-restore'),
     path('goal/create', views.GoalCreateView.as_view(), name='goal-create'),
+    path('goal/bulk_create', views.GoalBatchCreateView.as_view(), name='goal-bulk-create'),
+    path('goal/bulk_update', views.GoalBatchUpdateView.as_view(), name='goal-bulk-update'),
+    path('goal/bulk_status', views.GoalBatchStatusView.as_view(), name='goal-bulk-status'),
     path('goal/list', views.GoalListView.as_view(), name='goal-list'),
     path('goal/<int:pk>', views.GoalView.as_view(), name='goal-view'),
     path('goal_comment/create', views.GoalCommentCreateView.as_view(), name='comment-create'),
@@ -14,4 +18,13 @@ urlpatterns = [
     path('board/create', views.BoardCreateView.as_view(), name='board-create'),
     path('board/list', views.BoardListView.as_view(), name='board-list'),
     path('board/<int:pk>', views.BoardView.as_view(), name='board-view'),
+    path('board/<int:pk>/restore', views.BoardRestoreView.as_view(), name='board-restore'),
+    path('board/<int:pk>/stats', views.BoardStatsView.as_view(), name='board-stats'),
+    path('board/<int:pk>/export', views.BoardExportView.as_view(), name='board-export'),
+    path('board/<int:pk>/import', views.BoardImportView.as_view(), name='board-import'),
+    path('archive/goal/list', views.ArchivedGoalListView.as_view(), name='archived-goal-list'),
+    path('archive/goal/<int:pk>', views.ArchivedGoalView.as_view(), name='archived-goal-view'),
+    path('archive/goal_comment/list', views.ArchivedCommentListView.as_view(), name='archived-comment-list'),
+    path('sync', views.SyncView.as_view(), name='sync'),
+    path('cache/stats', views.ListCacheStatsView.as_view(), name='list-cache-stats'),
 ]
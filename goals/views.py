@@ -1,14 +1,36 @@
+from collections import Counter
+
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Count, Max, Prefetch
+from django.db.models.functions import Greatest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import generics, permissions, filters
-from goals.filters import GoalDateFilter
-from goals.models import GoalCategory, Goal, GoalComment, Board
+from rest_framework import generics, permissions, filters, status
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.pagination import _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from goals.filters import GoalDateFilter, FullTextSearchFilter
+from goals.cache import list_cache_stats
+from goals.counters import adjust_active_goals, is_active, lock_goals
+from goals.export import EXPORT_FORMATS, export_board
+from goals.importer import IMPORT_FORMATS, GoalImporter, ImportFileError, read_rows
+from goals.mixins import ConditionalGetMixin, BoardVersionCacheMixin, AsyncListMixin, AsyncRetrieveMixin
+from goals.models import GoalCategory, Goal, GoalComment, Board, BoardParticipant, ArchivedGoal, ArchivedComment, \
+    Change
+from goals.pagination import KeysetPagination
 from goals.permissions import IsOwnerOrReadOnly, BoardPermissions, GoalCategoryPermissions, GoalPermissions, \
     CommentsPermissions
+from goals.roles import get_board_roles
 from goals.serializers import GoalCategoryCreateSerializer, GoalCategorySerializer, GoalCreateSerializer, \
     GoalSerializer, GoalCommentCreateSerializer, GoalCommentSerializer, BoardCreateSerializer, BoardListSerializer, \
-    BoardSerializer
+    BoardSerializer, GoalBatchStatusSerializer, ArchivedGoalSerializer, ArchivedCommentSerializer, \
+    batch_results, load_batch_categories
+from goals.signals import send_bulk_write
+from goals.stats import board_stats
+from goals.sync import BoardSync, SyncCursor, log_restore
 
 
 class BoardCreateView(generics.CreateAPIView):
@@ -19,23 +41,24 @@ class BoardCreateView(generics.CreateAPIView):
     serializer_class = BoardCreateSerializer
 
 
-class BoardListView(generics.ListAPIView):
+class BoardListView(BoardVersionCacheMixin, AsyncListMixin, generics.ListAPIView):
     """
     Возвращает список всех досок
     """
     model = Board
+    list_cache_name = 'board-list'
     permission_classes = (BoardPermissions,)
     serializer_class = BoardListSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.OrderingFilter, FullTextSearchFilter]
     ordering_fields = ['title', 'created']
     ordering = ['title']
     search_fields = ['title']
 
     def get_queryset(self):
-        return Board.objects.filter(participants__user_id=self.request.user.id, is_deleted=False)
+        return Board.objects.visible_to(self.request.user)
 
 
-class BoardView(generics.RetrieveUpdateDestroyAPIView):
+class BoardView(ConditionalGetMixin, AsyncRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Просмотр, редактирование и удаление досок
     """
@@ -44,20 +67,127 @@ class BoardView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = (BoardPermissions,)
 
     def get_queryset(self):
-        return Board.objects.filter(
-            participants__user_id=self.request.user.id,
-            is_deleted=False,
-        )
+        boards = Board.objects.visible_to(self.request.user)
+        if self.request.method == 'GET':
+            # участники загружаются вместе с доской, в том числе асинхронным aget
+            boards = boards.prefetch_related(
+                Prefetch('participants', queryset=BoardParticipant.objects.select_related('user')),
+            )
+        return boards
+
+    def get_validator_queryset(self):
+        return Board.objects.visible_to(self.request.user).filter(pk=self.kwargs['pk'])
+
+    def get_validator_aggregates(self) -> dict:
+        """
+        Доска вместе с участниками: изменение состава или ролей тоже меняет валидаторы
+        """
+        return {
+            'last_modified': Greatest(Max('updated'), Max('participants__updated')),
+            'count': Count('participants'),
+        }
 
     def perform_destroy(self, instance: Board):
         with transaction.atomic():
             instance.is_deleted = True
-            instance.save(update_fields=('is_deleted',))
-            instance.categories.update(is_deleted=True)
-            Goal.objects.filter(category__board=instance).update(status=Goal.Status.archived)
+            instance.save(update_fields=('is_deleted', 'updated'))
+            if settings.GOALS_DELETE_MODE == 'cascade':
+                now = timezone.now()
+                instance.categories.update(is_deleted=True, active_goals_count=0, updated=now)
+                Goal.objects.filter(category__board=instance).update(status=Goal.Status.archived, updated=now)
+                send_bulk_write(GoalCategory, {instance.pk})
+                send_bulk_write(Goal, {instance.pk})
             return instance
 
 
+class BoardRestoreView(generics.GenericAPIView):
+    """
+    Восстанавливает удаленную доску. Доступно только владельцу.
+    При удалении в режиме tombstone категории и цели не менялись и возвращаются в прежнем виде.
+    """
+    model = Board
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = BoardListSerializer
+
+    def get_queryset(self):
+        return Board.objects.visible_to(self.request.user, min_role=BoardParticipant.Role.owner, deleted=True)
+
+    def post(self, request, *args, **kwargs):
+        board = self.get_object()
+        board.is_deleted = False
+        with transaction.atomic(savepoint=False):
+            board.save(update_fields=('is_deleted', 'updated'))
+            log_restore(Change.Entity.board, board.pk, board.pk)
+        return Response(self.get_serializer(board).data)
+
+
+class BoardStatsView(generics.GenericAPIView):
+    """
+    Количество целей доски и ее категорий по статусам, приоритетам и просроченных.
+    Читается из сводных таблиц, поэтому стоимость зависит от числа категорий, а не целей.
+    """
+    model = Board
+    permission_classes = (BoardPermissions,)
+
+    def get_queryset(self):
+        return Board.objects.visible_to(self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        return Response(board_stats(self.get_object()))
+
+
+class BoardExportView(generics.GenericAPIView):
+    """
+    Потоковая выгрузка категорий, целей и комментариев доски в NDJSON или CSV (параметр export_format)
+    """
+    model = Board
+    permission_classes = (BoardPermissions,)
+
+    def get_queryset(self):
+        return Board.objects.visible_to(self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'export_format': f'Допустимые форматы: {", ".join(EXPORT_FORMATS)}'})
+        board = self.get_object()
+        response = StreamingHttpResponse(export_board(board, export_format), content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="board-{board.pk}.{export_format}"'
+        return response
+
+
+class BoardImportView(generics.GenericAPIView):
+    """
+    Импорт целей на доску из файла CSV или NDJSON (multipart, поле file).
+    Категории указываются названием, create_categories=true создает недостающие.
+    """
+    model = Board
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return Board.objects.visible_to(self.request.user, min_role=BoardParticipant.Role.writer)
+
+    def post(self, request, *args, **kwargs):
+        board = self.get_object()
+        file = request.FILES.get('file')
+        if file is None:
+            raise ValidationError({'file': 'Обязательное поле.'})
+        import_format = request.query_params.get('import_format') or file.name.rpartition('.')[2].lower()
+        if import_format not in IMPORT_FORMATS:
+            raise ValidationError({'import_format': f'Допустимые форматы: {", ".join(IMPORT_FORMATS)}'})
+
+        importer = GoalImporter(
+            board,
+            request.user,
+            create_categories=request.query_params.get('create_categories') in ('1', 'true'),
+        )
+        try:
+            report = importer.run(read_rows(file, import_format))
+        except ImportFileError as exc:
+            report = {'created': 0, 'errors': [*importer.errors, {'row': exc.row, 'errors': {'file': [str(exc)]}}]}
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST)
+
+
 class GoalCategoryCreateView(generics.CreateAPIView):
     """
     Создает новую категорию
@@ -66,24 +196,22 @@ class GoalCategoryCreateView(generics.CreateAPIView):
     serializer_class = GoalCategoryCreateSerializer
 
 
-class GoalCategoryListView(generics.ListAPIView):
+class GoalCategoryListView(BoardVersionCacheMixin, generics.ListAPIView):
     """
     Возвращает список всех категорий
     """
     model = GoalCategory
+    list_cache_name = 'category-list'
     permission_classes = (GoalCategoryPermissions,)
     serializer_class = GoalCategorySerializer
-    filter_backends = (filters.SearchFilter, filters.OrderingFilter,)
+    filter_backends = (filters.OrderingFilter, FullTextSearchFilter,)
     filterset_fields = ['board']
     ordering_fields = ['title', 'created']
     ordering = ['title', 'created']
     search_fields = ['title']
 
     def get_queryset(self):
-        return GoalCategory.objects.prefetch_related('board__participants').filter(
-            is_deleted=False,
-            board__participants__user_id=self.request.user.id,
-        )
+        return GoalCategory.objects.visible_to(self.request.user).select_related('user')
 
 
 class GoalCategoryView(generics.RetrieveUpdateDestroyAPIView):
@@ -95,19 +223,45 @@ class GoalCategoryView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = GoalCategorySerializer
 
     def get_queryset(self):
-        return GoalCategory.objects.prefetch_related('board__participants').filter(
-            is_deleted=False,
-            board__participants__user_id=self.request.user.id,
-        )
+        return GoalCategory.objects.visible_to(self.request.user).select_related('user')
 
     def perform_destroy(self, instance: GoalCategory) -> GoalCategory:
         with transaction.atomic():
             instance.is_deleted = True
             instance.save()
-            instance.goals.update(status=Goal.Status.archived)
+            if settings.GOALS_DELETE_MODE == 'cascade':
+                now = timezone.now()
+                instance.goals.update(status=Goal.Status.archived, updated=now)
+                GoalCategory.objects.filter(pk=instance.pk).update(active_goals_count=0, updated=now)
+                instance.active_goals_count = 0
+                send_bulk_write(Goal, {instance.board_id})
         return instance
 
 
+class GoalCategoryRestoreView(generics.GenericAPIView):
+    """
+    Восстанавливает удаленную категорию на доске, где пользователь владелец или редактор
+    """
+    model = GoalCategory
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = GoalCategorySerializer
+
+    def get_queryset(self):
+        return GoalCategory.objects.visible_to(
+            self.request.user,
+            min_role=BoardParticipant.Role.writer,
+            deleted=True,
+        ).select_related('user')
+
+    def post(self, request, *args, **kwargs):
+        category = self.get_object()
+        category.is_deleted = False
+        with transaction.atomic(savepoint=False):
+            category.save(update_fields=('is_deleted', 'updated'))
+            log_restore(Change.Entity.category, category.pk, category.board_id)
+        return Response(self.get_serializer(category).data)
+
+
 class GoalCreateView(generics.CreateAPIView):
     """
     Создает новую цель
@@ -116,24 +270,52 @@ class GoalCreateView(generics.CreateAPIView):
     serializer_class = GoalCreateSerializer
 
 
-class GoalListView(generics.ListAPIView):
+class GoalBatchCreateView(generics.CreateAPIView):
+    """
+    Создает пакет целей одной транзакцией.
+    В ответе на месте каждого элемента созданная цель или {'errors': ошибки элемента}.
+    """
+    permission_classes = (GoalPermissions,)
+    serializer_class = GoalCreateSerializer
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(many=True, allow_empty=False, max_length=settings.GOALS_BATCH_MAX_SIZE)
+        return super().get_serializer(*args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(batch_results(serializer.item_errors, serializer.data), status=status.HTTP_201_CREATED)
+
+
+class GoalListView(ConditionalGetMixin, BoardVersionCacheMixin, AsyncListMixin, generics.ListAPIView):
     """
     Возвращает список всех целей.
     """
     model = Goal
+    list_cache_name = 'goal-list'
     permission_classes = (GoalPermissions,)
     serializer_class = GoalSerializer
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     filterset_class = GoalDateFilter
     ordering_fields = ['title', 'created']
     ordering = ['title']
     search_fields = ['title', 'description']
+    search_vector_field = 'search_vector'
+
+    @property
+    def pagination_class(self):
+        """
+        Пагинация по курсору включается параметром cursor, без него остается limit/offset
+        """
+        if KeysetPagination.cursor_query_param in self.request.query_params:
+            return KeysetPagination
+        return api_settings.DEFAULT_PAGINATION_CLASS
 
     def get_queryset(self):
-        return Goal.objects.filter(
-            Q(category__board__participants__user_id=self.request.user.id) & ~Q(status=Goal.Status.archived) & Q(
-                category__is_deleted=False)
-        )
+        # вектор поиска нужен только в условии поиска, в ответ он не входит
+        return Goal.objects.visible_to(self.request.user).exclude(status=Goal.Status.archived).defer('search_vector')
 
 
 class GoalView(generics.RetrieveUpdateDestroyAPIView):
@@ -143,12 +325,138 @@ class GoalView(generics.RetrieveUpdateDestroyAPIView):
     model = Goal
     permission_classes = (GoalPermissions,)
     serializer_class = GoalSerializer
-    queryset = Goal.objects.all()
 
     def get_queryset(self):
-        return Goal.objects.filter(
-            ~Q(status=Goal.Status.archived) & Q(category__is_deleted=False)
-        )
+        return Goal.objects.visible_to(self.request.user).exclude(
+            status=Goal.Status.archived,
+        ).select_related('category').defer('search_vector')
+
+    def get_object(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            # счетчик категории считается от статуса и категории, прочитанных под блокировкой строки
+            lock_goals([self.kwargs['pk']])
+        return super().get_object()
+
+    @transaction.atomic
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    @transaction.atomic
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
+
+class GoalBatchUpdateView(generics.GenericAPIView):
+    """
+    Частичное обновление пакета целей одним bulk_update.
+    В ответе на месте каждого элемента обновленная цель или {'errors': ошибки элемента},
+    ошибочные элементы не применяются.
+    """
+    model = Goal
+    permission_classes = (GoalPermissions,)
+    serializer_class = GoalSerializer
+
+    def get_queryset(self):
+        return Goal.objects.visible_to(self.request.user).exclude(
+            status=Goal.Status.archived,
+        ).select_related('category').defer('search_vector')
+
+    def patch(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            raise ValidationError('Ожидается непустой список целей')
+        if len(items) > settings.GOALS_BATCH_MAX_SIZE:
+            raise ValidationError(f'Не более {settings.GOALS_BATCH_MAX_SIZE} целей за запрос')
+
+        # id проверяется до поиска: bool - подкласс int, а список или словарь нельзя искать в словаре целей
+        ids = [item.get('id') for item in items]
+        ids = [pk if isinstance(pk, int) and not isinstance(pk, bool) else None for pk in ids]
+        categories = load_batch_categories(items)
+        board_roles = get_board_roles(request)
+
+        with transaction.atomic():
+            # параллельное изменение тех же целей дождется фиксации, и счетчики категорий считаются
+            # от актуальных статуса и категории
+            lock_goals(pk for pk in ids if pk is not None)
+            goals = self.get_queryset().in_bulk([pk for pk in ids if pk is not None])
+            item_serializers, errors, seen = [], [], set()
+            for item, pk in zip(items, ids):
+                goal = goals.get(pk)
+                if goal is None or goal.pk in seen:
+                    errors.append({'id': ['Цель не найдена' if goal is None else 'Цель указана повторно']})
+                    continue
+                seen.add(goal.pk)
+                if not board_roles.can_write(goal.category.board_id):
+                    errors.append({'id': ['Вы должны быть владельцем или редактором доски']})
+                    continue
+                serializer = self.get_serializer(goal, data=item, partial=True)
+                serializer.fields['category'].categories = categories
+                try:
+                    valid = serializer.is_valid()
+                except PermissionDenied as exc:
+                    # перенос в категорию доски, где пользователь только читатель
+                    errors.append({'category': [exc.detail]})
+                    continue
+                errors.append({} if valid else serializer.errors)
+                if valid:
+                    item_serializers.append(serializer)
+            if not item_serializers:
+                raise ValidationError(batch_results(errors, []))
+
+            board_ids = {serializer.instance.category.board_id for serializer in item_serializers}
+            # в пакет попадают только активные цели: у прежней категории каждой цели счетчик уменьшается
+            deltas = Counter()
+            deltas.subtract(serializer.instance.category_id for serializer in item_serializers)
+            fields = {'updated'}
+            now = timezone.now()
+            for serializer in item_serializers:
+                for attr, value in serializer.validated_data.items():
+                    setattr(serializer.instance, attr, value)
+                    fields.add(attr)
+                serializer.instance.updated = now
+            instances = [serializer.instance for serializer in item_serializers]
+            board_ids.update(goal.category.board_id for goal in instances)
+            deltas.update(goal.category_id for goal in instances if is_active(goal.status))
+            Goal.objects.bulk_update(instances, fields)
+            adjust_active_goals(deltas)
+            send_bulk_write(Goal, board_ids)
+        return Response(batch_results(errors, self.get_serializer(instances, many=True).data))
+
+
+class GoalBatchStatusView(generics.GenericAPIView):
+    """
+    Переводит пакет целей в новый статус одним UPDATE
+    """
+    model = Goal
+    permission_classes = (GoalPermissions,)
+    serializer_class = GoalBatchStatusSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids, status = serializer.validated_data['ids'], serializer.validated_data['status']
+
+        goals = Goal.objects.visible_to(request.user, min_role=BoardParticipant.Role.writer).filter(
+            pk__in=ids,
+        ).exclude(status=Goal.Status.archived)
+        with transaction.atomic():
+            # строки блокируются до подсчета: параллельный запрос дождется фиксации и прочитает новый статус,
+            # поэтому одна цель не уменьшит счетчик категории дважды
+            lock_goals(ids)
+            goal_rows = list(goals.values_list('id', 'category_id', 'category__board_id'))
+            goal_boards = {pk: board_id for pk, _, board_id in goal_rows}
+            updated_ids = set(goal_boards)
+            Goal.objects.filter(pk__in=updated_ids).update(status=status, updated=timezone.now())
+            if not is_active(status):
+                deltas = Counter()
+                deltas.subtract(category_id for _, category_id, _ in goal_rows)
+                adjust_active_goals(deltas)
+            send_bulk_write(Goal, goal_boards.values())
+        return Response([
+            {'id': pk, 'status': status} if pk in updated_ids
+            else {'id': pk, 'error': 'Цель не найдена или недостаточно прав'}
+            for pk in dict.fromkeys(ids)
+        ])
 
 
 class GoalCommentCreateView(generics.CreateAPIView):
@@ -159,11 +467,12 @@ class GoalCommentCreateView(generics.CreateAPIView):
     serializer_class = GoalCommentCreateSerializer
 
 
-class GoalCommentListView(generics.ListAPIView):
+class GoalCommentListView(ConditionalGetMixin, BoardVersionCacheMixin, AsyncListMixin, generics.ListAPIView):
     """
     Возвращает список комментариев
     """
     model = GoalComment
+    list_cache_name = 'comment-list'
     permission_classes = (CommentsPermissions,)
     serializer_class = GoalCommentSerializer
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter,)
@@ -171,9 +480,7 @@ class GoalCommentListView(generics.ListAPIView):
     ordering = ('-created',)
 
     def get_queryset(self):
-        return GoalComment.objects.filter(
-            goal__category__board__participants__user_id=self.request.user.id,
-        )
+        return GoalComment.objects.visible_to(self.request.user).select_related('user')
 
 
 class GoalCommentView(generics.RetrieveUpdateDestroyAPIView):
@@ -185,6 +492,82 @@ class GoalCommentView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = GoalCommentSerializer
 
     def get_queryset(self):
-        return GoalComment.objects.filter(
+        return GoalComment.objects.visible_to(self.request.user).filter(
             user_id=self.request.user.id,
-        )
+        ).select_related('user')
+
+
+class ArchivedGoalListView(generics.ListAPIView):
+    """
+    Цели в архиве на досках пользователя, сначала перенесенные последними. Только чтение.
+    Поиск тот же, что у рабочих целей, но вектор строится при запросе: хранимый tsvector с индексом
+    утяжелил бы перенос в архив ради редкого поиска по нему.
+    """
+    model = ArchivedGoal
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = ArchivedGoalSerializer
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter)
+    filterset_fields = ('category', 'category__board')
+    ordering_fields = ('archived', 'created', 'title', 'due_date', 'priority')
+    ordering = ('-archived', '-id')
+    search_fields = ('title', 'description')
+
+    def get_queryset(self):
+        return ArchivedGoal.objects.visible_to(self.request.user)
+
+
+class ArchivedGoalView(generics.RetrieveAPIView):
+    """
+    Просмотр цели в архиве
+    """
+    model = ArchivedGoal
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = ArchivedGoalSerializer
+
+    def get_queryset(self):
+        return ArchivedGoal.objects.visible_to(self.request.user)
+
+
+class ArchivedCommentListView(generics.ListAPIView):
+    """
+    Комментарии в архиве: архивных целей (goal) и старые комментарии рабочих целей (active_goal)
+    """
+    model = ArchivedComment
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = ArchivedCommentSerializer
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
+    filterset_fields = ('goal', 'active_goal')
+    ordering = ('-created',)
+
+    def get_queryset(self):
+        return ArchivedComment.objects.visible_to(self.request.user).select_related('user')
+
+
+class SyncView(generics.GenericAPIView):
+    """
+    Изменения на всех досках пользователя после курсора cursor, без курсора - полный снимок.
+    Ответ содержит новый курсор; при has_more остаток снимка или изменений забирается следующим запросом.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    # граница курсора берется из снимка основной базы, журнал читается с нее же
+    use_replica = False
+
+    def get(self, request, *args, **kwargs):
+        cursor = request.query_params.get('cursor')
+        try:
+            limit = _positive_int(request.query_params.get('limit', 0), cutoff=settings.GOALS_SYNC_PAGE_SIZE)
+        except ValueError:
+            raise ValidationError({'limit': 'Ожидается положительное число'})
+        sync = BoardSync(request.user, self.get_serializer_context(), limit)
+        return Response(sync.run(SyncCursor.decode(cursor) if cursor else None))
+
+
+class ListCacheStatsView(generics.GenericAPIView):
+    """
+    Счетчики попаданий и промахов кеша списков
+    """
+    permission_classes = (permissions.IsAdminUser,)
+    cached_views = (BoardListView, GoalCategoryListView, GoalListView, GoalCommentListView)
+
+    def get(self, request, *args, **kwargs):
+        return Response(list_cache_stats(view.list_cache_name for view in self.cached_views))
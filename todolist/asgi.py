@@ -9,8 +9,22 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+from core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todolist.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# импорт после настройки Django: модули приложений обращаются к моделям
+from goals.events import BoardEventsApp  # noqa: E402
+
+board_events = BoardEventsApp()
+
+
+async def application(scope, receive, send):
+    """
+    Поток событий досок обслуживается отдельно от Django, остальные запросы - Django
+    """
+    if scope['type'] == 'http' and scope['path'] == '/goals/events':
+        return await board_events(scope, receive, send)
+    return await django_application(scope, receive, send)
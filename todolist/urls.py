@@ -3,7 +3,10 @@ from django.urls import path, include
 
 from django.conf import settings
 
+from core.views import MetricsView
+
 urlpatterns = [
+    path('metrics', MetricsView.as_view(), name='metrics'),
     path('admin/', admin.site.urls),
     path('core/', include('core.urls')),
     path('oauth/', include('social_django.urls', namespace='social')),